@@ -0,0 +1,80 @@
+"""Microbenchmark for date and amount formatting in OfxWriter
+
+Compares formatting with the per-writer caches to formatting every value from
+scratch, the way OfxWriter did before the caches were introduced.
+
+Run with: python benchmarks/bench_ofx_format.py [number-of-lines]
+"""
+
+import sys
+import random
+import timeit
+from datetime import datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import Optional
+
+from ofxstatement.ofx import OfxWriter
+from ofxstatement.statement import Statement, StatementLine
+
+
+class UncachedOfxWriter(OfxWriter):
+    def formatDateTime(self, dt: datetime, omitEmptyTime: bool = False) -> str:
+        utc_offset = dt.utcoffset()
+
+        format = "%Y%m%d"
+        if dt.time() != time.min or utc_offset or not omitEmptyTime:
+            format += "%H%M%S"
+        if dt.microsecond or utc_offset:
+            format += f".{(dt.microsecond // 1000):03d}"
+        if utc_offset is not None:
+            format += f"[{utc_offset.total_seconds() / 3600}]"
+        return dt.strftime(format)
+
+    def formatAmount(self, amount: Decimal, precision: Optional[int] = None) -> str:
+        if precision is None:
+            precision = self.default_float_precision
+        return "{0:.{precision}f}".format(amount, precision=precision)
+
+
+def make_statement(nlines: int) -> Statement:
+    rnd = random.Random(0)
+    tz = timezone(timedelta(hours=2))
+    statement = Statement("BANK", "ACCOUNT", "EUR")
+    for n in range(nlines):
+        # about a year worth of business days
+        day = datetime(2024, 1, 1, tzinfo=tz) + timedelta(days=rnd.randrange(250))
+        amount = Decimal(rnd.randrange(-100000, 100000)) / 100
+        statement.lines.append(StatementLine(str(n), day, "Memo", amount))
+    return statement
+
+
+def format_columns(writer: OfxWriter) -> None:
+    for line in writer.statement.lines:
+        assert line.date is not None and line.amount is not None
+        writer.formatDateTime(line.date, omitEmptyTime=True)
+        writer.formatAmount(line.amount)
+
+
+def bench(title: str, statement: Statement, func, repeat: int = 5) -> None:
+    results = {}
+    for cls in (UncachedOfxWriter, OfxWriter):
+        results[cls] = min(
+            timeit.repeat(lambda: func(cls(statement)), number=1, repeat=repeat)
+        )
+    before, after = results[UncachedOfxWriter], results[OfxWriter]
+    print(
+        f"{title:<20} uncached: {before:8.3f}s  cached: {after:8.3f}s  "
+        f"speedup: {before / after:5.2f}x"
+    )
+
+
+def main() -> None:
+    nlines = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    statement = make_statement(nlines)
+    print(f"{nlines} statement lines")
+    bench("format columns", statement, format_columns)
+    bench("toxml", statement, lambda w: w.toxml())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark for StatementParser.parse_datetime()
+
+Parses date column of a synthetic export with and without the date cache
+and fast date parsers.
+
+Run with: python benchmarks/bench_parse_datetime.py [number-of-rows]
+"""
+
+import sys
+import random
+import time
+from datetime import date, timedelta
+
+from ofxstatement.parser import StatementParser
+
+FORMATS = ["%Y-%m-%d", "%d.%m.%Y", "%m/%d/%Y"]
+
+
+def make_column(nrows: int, date_format: str) -> list:
+    # Bank exports repeat a few hundred distinct dates
+    rnd = random.Random(0)
+    dates = [date(2023, 1, 1) + timedelta(days=n) for n in range(500)]
+    return [rnd.choice(dates).strftime(date_format) for n in range(nrows)]
+
+
+def bench(column: list, date_format: str, cache: bool, fast: bool) -> float:
+    parser: StatementParser = StatementParser()
+    parser.date_format = date_format
+    parser.date_cache_size = 1024 if cache else 0
+    parser.fast_date_parsing = fast
+    parse_datetime = parser.parse_datetime
+    start = time.perf_counter()
+    for value in column:
+        parse_datetime(value)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    nrows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print(f"{nrows} rows")
+    for date_format in FORMATS:
+        column = make_column(nrows, date_format)
+        baseline = bench(column, date_format, cache=False, fast=False)
+        print(f"{date_format:<10} strptime:    {baseline:7.3f}s")
+        for cache, fast, title in [
+            (False, True, "fast path"),
+            (True, False, "cache"),
+            (True, True, "cache+fast"),
+        ]:
+            elapsed = bench(column, date_format, cache, fast)
+            print(
+                f"{'':<10} {title + ':':<12} {elapsed:7.3f}s  "
+                f"speedup: {baseline / elapsed:6.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
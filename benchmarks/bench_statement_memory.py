@@ -0,0 +1,73 @@
+"""Memory benchmark for statement line classes
+
+Reports how many bytes a statement line takes with the regular and the
+compact (slotted) record classes.
+
+Run with: python benchmarks/bench_statement_memory.py [number-of-lines]
+"""
+
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import List
+
+from ofxstatement.statement import (
+    StatementLine,
+    CompactStatementLine,
+    InvestStatementLine,
+    CompactInvestStatementLine,
+)
+
+
+def make_lines(cls, nlines: int) -> List:
+    # Values are shared between the lines, so only the line objects themselves
+    # are measured
+    date = datetime(2024, 1, 1) + timedelta(days=1)
+    amount = Decimal("12.34")
+    lines = []
+    for n in range(nlines):
+        line = cls("id", date, "Memo", amount)
+        line.payee = "Payee"
+        lines.append(line)
+    return lines
+
+
+def make_invest_lines(cls, nlines: int) -> List:
+    date = datetime(2024, 1, 1)
+    amount = Decimal("12.34")
+    lines = []
+    for n in range(nlines):
+        line = cls("id", date, "Memo", "BUYSTOCK", "BUY", "AAPL", amount)
+        line.units = amount
+        line.unit_price = amount
+        lines.append(line)
+    return lines
+
+
+def measure(factory, cls, nlines: int) -> float:
+    tracemalloc.start()
+    lines = factory(cls, nlines)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del lines
+    return size / nlines
+
+
+def main() -> None:
+    nlines = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print(f"{nlines} statement lines, bytes per line:")
+    for factory, regular, compact in [
+        (make_lines, StatementLine, CompactStatementLine),
+        (make_invest_lines, InvestStatementLine, CompactInvestStatementLine),
+    ]:
+        before = measure(factory, regular, nlines)
+        after = measure(factory, compact, nlines)
+        print(
+            f"{regular.__name__:<22} regular: {before:7.1f}  "
+            f"compact: {after:7.1f}  saved: {1 - after / before:6.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
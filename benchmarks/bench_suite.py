@@ -0,0 +1,236 @@
+"""Scaling benchmark for parsing, validation, id generation and OFX output
+
+Every case is a synthetic statement (see synthetic.py) of each requested
+size. For every stage the best of several runs is reported along with the
+throughput in lines per second and peak memory, allocated by the stage
+(measured with tracemalloc in a separate run, so it doesn't slow down the
+timed ones).
+
+Results are written as JSON, so that versions can be compared:
+
+    python benchmarks/bench_suite.py --output before.json
+    (switch to another version)
+    python benchmarks/bench_suite.py --output after.json --compare before.json
+
+Run with: python benchmarks/bench_suite.py [--sizes 1000,10000,1000000]
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ofxstatement.ofx import OfxWriter
+from ofxstatement.statement import Statement, generate_unique_transaction_id
+
+import synthetic
+
+CASES: Dict[str, Dict[str, bool]] = {
+    "bank": {},
+    "bank-tz": {"tz": True},
+    "bank-currency": {"currency": True},
+    "bank-account-to": {"account_to": True},
+    "bank-all": {"tz": True, "currency": True, "account_to": True},
+    "invest": {"invest": True},
+    "invest-tz": {"invest": True, "tz": True},
+}
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def make_stages(
+    case: Dict[str, bool], size: int, seed: int
+) -> List[Tuple[str, Callable[[], Any]]]:
+    """Return (name, function) pairs of the stages to measure for the case"""
+    options = {key: value for key, value in case.items() if key != "invest"}
+    stages: List[Tuple[str, Callable[[], Any]]] = []
+    statement: Statement
+    if case.get("invest"):
+        # Investment lines are not produced by CsvStatementParser
+        statement = synthetic.make_invest_statement(size, seed, **options)
+        lines: List[Any] = statement.invest_lines
+    else:
+        document = synthetic.make_csv(size, seed, **options)
+        stages.append(
+            ("parse", lambda: synthetic.make_parser(document, **options).parse())
+        )
+        statement = synthetic.make_statement(size, seed, **options)
+        lines = statement.lines
+
+    def generate_ids() -> None:
+        ids: set = set()
+        for line in lines:
+            generate_unique_transaction_id(line, ids)
+
+    stages += [
+        ("assert_valid", statement.assert_valid),
+        ("generate_ids", generate_ids),
+        ("toxml", lambda: OfxWriter(statement).toxml()),
+        ("toxml_pretty", lambda: OfxWriter(statement).toxml(pretty=True)),
+    ]
+    return stages
+
+
+def measure_time(func: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure_memory(func: Callable[[], Any]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(
+    cases: List[str],
+    sizes: List[int],
+    repeat: int,
+    seed: int,
+    memory: bool,
+) -> List[Dict[str, Any]]:
+    results = []
+    for name in cases:
+        for size in sizes:
+            for stage, func in make_stages(CASES[name], size, seed):
+                seconds = measure_time(func, repeat)
+                result: Dict[str, Any] = {
+                    "case": name,
+                    "size": size,
+                    "stage": stage,
+                    "seconds": seconds,
+                    "lines_per_second": size / seconds if seconds else None,
+                    "peak_bytes": measure_memory(func) if memory else None,
+                }
+                results.append(result)
+                print(format_result(result), file=sys.stderr)
+    return results
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    peak = result["peak_bytes"]
+    return "%-16s %8d  %-13s %9.4fs %12.0f lines/s %10s" % (
+        result["case"],
+        result["size"],
+        result["stage"],
+        result["seconds"],
+        result["lines_per_second"] or 0,
+        "%.1f MiB" % (peak / 2**20) if peak is not None else "-",
+    )
+
+
+def compare(
+    results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float
+) -> int:
+    """Print time and memory ratios to baseline, return number of regressions"""
+    previous = {(r["case"], r["size"], r["stage"]): r for r in baseline["results"]}
+    regressions = 0
+    print(
+        "\nCompared to %s (ratio > 1 is slower or bigger):" % baseline["version"],
+        file=sys.stderr,
+    )
+    for result in results:
+        old = previous.get((result["case"], result["size"], result["stage"]))
+        if old is None:
+            continue
+        ratios = [result["seconds"] / old["seconds"]]
+        if result["peak_bytes"] and old["peak_bytes"]:
+            ratios.append(result["peak_bytes"] / old["peak_bytes"])
+        regressed = any(ratio > 1 + threshold for ratio in ratios)
+        regressions += regressed
+        print(
+            "%-16s %8d  %-13s time %5.2fx  memory %s%s"
+            % (
+                result["case"],
+                result["size"],
+                result["stage"],
+                ratios[0],
+                "%5.2fx" % ratios[1] if len(ratios) > 1 else "    -",
+                "  REGRESSION" if regressed else "",
+            ),
+            file=sys.stderr,
+        )
+    return regressions
+
+
+def get_version() -> str:
+    from importlib.metadata import version
+
+    return version("ofxstatement")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="comma separated numbers of statement lines (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cases",
+        default=",".join(CASES),
+        help="comma separated cases to run (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="timed runs per stage (default: 3)"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument(
+        "--no-memory", action="store_true", help="don't measure peak memory"
+    )
+    parser.add_argument("--output", help="JSON file to write results to")
+    parser.add_argument("--compare", help="JSON file with results to compare to")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help=(
+            "relative increase of time or memory, reported as regression "
+            "(default: %(default)s)"
+        ),
+    )
+    args = parser.parse_args(argv)
+
+    results = run(
+        args.cases.split(","),
+        [int(size) for size in args.sizes.split(",")],
+        args.repeat,
+        args.seed,
+        not args.no_memory,
+    )
+    report = {
+        "version": get_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
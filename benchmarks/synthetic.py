@@ -0,0 +1,158 @@
+"""Seeded generators of synthetic statements for benchmarks
+
+The same seed and options always produce the same statement, so results of
+different versions are comparable.
+"""
+
+import csv
+import io
+import random
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Iterator, List, Optional
+
+from ofxstatement.parser import CsvStatementParser
+from ofxstatement.statement import (
+    BankAccount,
+    Currency,
+    InvestStatementLine,
+    Statement,
+    StatementLine,
+)
+
+START = datetime(2024, 1, 1, 9, 30)
+TZ = timezone(timedelta(hours=2))
+MEMOS = ["Card payment", "Transfer", "Salary", "Utilities", "Groceries", "ATM"]
+PAYEES = ["ACME Ltd", "City Utilities", "Grocer", "Employer Inc", ""]
+CURRENCIES = ["USD", "GBP", "SEK"]
+SECURITIES = ["AAPL", "MSFT", "VWCE", "IE00B4L5Y983", "US0378331005"]
+
+
+def iter_rows(
+    nrows: int,
+    seed: int = 0,
+    tz: bool = False,
+    currency: bool = False,
+    account_to: bool = False,
+) -> Iterator[List[str]]:
+    """Generate CSV rows of a bank export
+
+    Columns are date, id, memo, payee and amount, followed by currency
+    symbol, rate and original amount if currency is requested, and by bank
+    and account id of the counterparty if account_to is requested. Every
+    third row has those columns empty.
+    """
+    rnd = random.Random(seed)
+    for n in range(nrows):
+        date = START + timedelta(minutes=rnd.randrange(365 * 24 * 60))
+        if tz:
+            date = date.replace(tzinfo=TZ)
+        cents = rnd.randrange(-200000, 200000) or 1
+        row = [
+            date.strftime("%Y-%m-%d %H:%M:%S%z" if tz else "%Y-%m-%d"),
+            "T%08d" % n,
+            rnd.choice(MEMOS),
+            rnd.choice(PAYEES),
+            str(Decimal(cents) / 100),
+        ]
+        foreign = n % 3 != 0
+        if currency:
+            if foreign:
+                rate = Decimal(rnd.randrange(5000, 20000)) / 10000
+                orig = (Decimal(cents) / 100 / rate).quantize(Decimal("0.01"))
+                row += [rnd.choice(CURRENCIES), str(rate), str(orig)]
+            else:
+                row += ["", "", ""]
+        if account_to:
+            if foreign:
+                row += [
+                    "BANK%03d" % rnd.randrange(100),
+                    "%012d" % rnd.randrange(10**12),
+                ]
+            else:
+                row += ["", ""]
+        yield row
+
+
+def make_csv(nrows: int, seed: int = 0, **options: bool) -> str:
+    """Return CSV document, see iter_rows() for the options"""
+    out = io.StringIO()
+    csv.writer(out).writerows(iter_rows(nrows, seed, **options))
+    return out.getvalue()
+
+
+class SyntheticCsvParser(CsvStatementParser):
+    """Parser of make_csv() output, the way a typical plugin parser looks"""
+
+    mappings = {"date": 0, "id": 1, "memo": 2, "payee": 3, "amount": 4}
+
+    def __init__(
+        self, fin: io.StringIO, currency: bool = False, account_to: bool = False
+    ) -> None:
+        super().__init__(fin)
+        self.statement = Statement("BANK", "ACCOUNT", "EUR")
+        self.currency = currency
+        self.account_to = account_to
+        self.account_column = 8 if currency else 5
+
+    def parse_record(self, line: List[str]) -> Optional[StatementLine]:
+        stmt_line = super().parse_record(line)
+        assert stmt_line is not None
+        if self.currency and line[5]:
+            stmt_line.orig_currency = Currency(line[5], Decimal(line[6]))
+        if self.account_to and line[self.account_column]:
+            stmt_line.bank_account_to = BankAccount(
+                line[self.account_column], line[self.account_column + 1]
+            )
+        return stmt_line
+
+
+def make_parser(document: str, tz: bool = False, **options: bool) -> SyntheticCsvParser:
+    parser = SyntheticCsvParser(io.StringIO(document), **options)
+    parser.date_format = "%Y-%m-%d %H:%M:%S%z" if tz else "%Y-%m-%d"
+    return parser
+
+
+def make_statement(nrows: int, seed: int = 0, **options: bool) -> Statement:
+    """Return bank statement with balances, parsed from make_csv() output"""
+    statement = make_parser(make_csv(nrows, seed, **options), **options).parse()
+    total = sum((line.amount or Decimal(0) for line in statement.lines), Decimal(0))
+    statement.start_balance = Decimal(1000)
+    statement.end_balance = statement.start_balance + total
+    return statement
+
+
+def make_invest_statement(nrows: int, seed: int = 0, tz: bool = False) -> Statement:
+    """Return investment statement with trades, income and cash lines"""
+    rnd = random.Random(seed)
+    statement = Statement(currency="USD")
+    statement.broker_id = "BROKER"
+    statement.account_id = "INVEST"
+    for n in range(nrows):
+        date = START + timedelta(minutes=rnd.randrange(365 * 24 * 60))
+        if tz:
+            date = date.replace(tzinfo=TZ)
+        line = InvestStatementLine("I%08d" % n, date, rnd.choice(MEMOS))
+        line.security_id = rnd.choice(SECURITIES)
+        kind = rnd.randrange(4)
+        if kind < 2:
+            line.trntype = "BUYSTOCK" if kind == 0 else "SELLSTOCK"
+            line.trntype_detailed = "BUY" if kind == 0 else "SELL"
+            line.units = Decimal(rnd.randrange(1, 10000)) / 100
+            line.unit_price = Decimal(rnd.randrange(100, 100000)) / 100
+            line.fees = Decimal(rnd.randrange(0, 1000)) / 100
+            sign = -1 if kind == 0 else 1
+            line.amount = sign * (line.units * line.unit_price).quantize(
+                Decimal("0.01")
+            )
+        elif kind == 2:
+            line.trntype = "INCOME"
+            line.trntype_detailed = "DIV"
+            line.amount = Decimal(rnd.randrange(1, 100000)) / 100
+        else:
+            line.trntype = "INVBANKTRAN"
+            line.trntype_detailed = "CREDIT"
+            line.security_id = None
+            line.amount = Decimal(rnd.randrange(1, 1000000)) / 100
+        statement.invest_lines.append(line)
+    return statement
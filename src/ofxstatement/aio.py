@@ -0,0 +1,142 @@
+"""Asyncio API for converting statements
+
+Parsing and OFX generation are CPU bound, so they run in a bounded pool of
+threads, shared by all conversions of AsyncConverter. OFX is generated
+chunk by chunk and the next chunk is only generated when the consumer asks
+for it, so slow consumers don't make converted documents pile up in memory:
+
+    async for chunk in convert_stream("mybank", request.content):
+        await response.write(chunk.encode("utf-8"))
+"""
+
+from typing import AsyncIterable, AsyncIterator, Iterator, Optional, Union
+from concurrent.futures import Executor, ThreadPoolExecutor
+import asyncio
+import os
+import tempfile
+
+from ofxstatement.conversion import Converter
+from ofxstatement.statement import Statement
+
+# Statement file name, contents or async iterable of the contents blocks
+Source = Union[str, bytes, AsyncIterable[bytes]]
+
+DEFAULT_WORKERS = 4
+
+_default: Optional["AsyncConverter"] = None
+
+
+class AsyncConverter:
+    """Converts statements in a bounded pool of threads
+
+    Configuration is read once and plugins are loaded on first use, the same
+    way Converter does it. Conversion errors are raised as ConvertError.
+    """
+
+    def __init__(
+        self,
+        converter: Optional[Converter] = None,
+        executor: Optional[Executor] = None,
+        workers: int = DEFAULT_WORKERS,
+    ) -> None:
+        self.converter = converter or Converter()
+        self._own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(
+            workers, thread_name_prefix="ofxstatement"
+        )
+
+    async def __aenter__(self) -> "AsyncConverter":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Shut down the executor, unless it was passed to the constructor"""
+        if self._own_executor:
+            self.executor.shutdown(wait=False)
+
+    async def parse(self, type: str, source: Source) -> Statement:
+        """Parse and validate the statement"""
+        loop = asyncio.get_running_loop()
+        if isinstance(source, str):
+            return await loop.run_in_executor(
+                self.executor, self.converter.parse, type, source
+            )
+
+        filename = await _spool(source)
+        try:
+            return await loop.run_in_executor(
+                self.executor, self.converter.parse, type, filename
+            )
+        finally:
+            os.remove(filename)
+
+    async def convert_stream(
+        self, type: str, source: Source, pretty: bool = False
+    ) -> AsyncIterator[str]:
+        """Convert statement, yielding OFX document in chunks"""
+        statement = await self.parse(type, source)
+
+        from ofxstatement.ofx import OfxWriter
+
+        _, settings = self.converter.get_settings(type)
+        writer = OfxWriter(statement)
+        chunks = writer.iter_chunks(
+            pretty=pretty, encoding=settings.get("encoding", "utf-8")
+        )
+        loop = asyncio.get_running_loop()
+        while True:
+            chunk = await loop.run_in_executor(self.executor, _next, chunks)
+            if chunk is None:
+                break
+            yield chunk
+
+    async def convert(self, type: str, source: Source, pretty: bool = False) -> str:
+        """Convert statement, return OFX document"""
+        return "".join(
+            [chunk async for chunk in self.convert_stream(type, source, pretty)]
+        )
+
+
+def get_default() -> AsyncConverter:
+    """Return converter, used by module level functions"""
+    global _default
+    if _default is None:
+        _default = AsyncConverter()
+    return _default
+
+
+async def convert(type: str, source: Source, pretty: bool = False) -> str:
+    """Convert statement with default converter, return OFX document"""
+    return await get_default().convert(type, source, pretty)
+
+
+async def convert_stream(
+    type: str, source: Source, pretty: bool = False
+) -> AsyncIterator[str]:
+    """Convert statement with default converter, yielding OFX in chunks"""
+    async for chunk in get_default().convert_stream(type, source, pretty):
+        yield chunk
+
+
+def _next(chunks: Iterator[str]) -> Optional[str]:
+    # StopIteration can't be raised through a future
+    return next(chunks, None)
+
+
+async def _spool(source: Union[bytes, AsyncIterable[bytes]]) -> str:
+    """Save statement contents to temporary file for plugin to parse"""
+    loop = asyncio.get_running_loop()
+    fd, filename = tempfile.mkstemp(suffix=".statement")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if isinstance(source, bytes):
+                await loop.run_in_executor(None, f.write, source)
+            else:
+                async for block in source:
+                    await loop.run_in_executor(None, f.write, block)
+    except BaseException:
+        os.remove(filename)
+        raise
+    return filename
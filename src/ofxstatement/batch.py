@@ -0,0 +1,224 @@
+"""Conversion of many statement files at once
+
+Files are spread across a pool of processes. Each process reads the
+configuration and loads the plugin once, and converts as many files as it
+gets.
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import glob
+import logging
+import os
+import time
+
+from ofxstatement.conversion import Converter
+from ofxstatement.exceptions import ConvertError
+
+if TYPE_CHECKING:
+    from ofxstatement.metrics import ConversionMetrics, StageTimer
+
+DEFAULT_OUTPUT_TEMPLATE = os.path.join("{dir}", "{stem}.ofx")
+
+# Converter of the worker process
+_converter: Optional[Converter] = None
+# Stage timer of the converter, when metrics are collected, and time the
+# worker started, which is accounted to the first converted file
+_timer: Optional["StageTimer"] = None
+_started: Optional[float] = None
+
+
+class BatchResult:
+    """Outcome of a single file conversion
+
+    Code is the exit status `ofxstatement convert` would have for the file.
+    Metrics are only collected on request.
+    """
+
+    def __init__(
+        self,
+        input: str,
+        output: str,
+        code: int,
+        messages: List[str],
+        lines: int = 0,
+        invest_lines: int = 0,
+        metrics: Optional["ConversionMetrics"] = None,
+    ) -> None:
+        self.input = input
+        self.output = output
+        self.code = code
+        self.messages = messages
+        self.lines = lines
+        self.invest_lines = invest_lines
+        self.metrics = metrics
+
+    def __repr__(self) -> str:
+        return "BatchResult(%r, %r, code=%r)" % (self.input, self.output, self.code)
+
+
+def read_manifest(filename: str) -> List[Tuple[str, Optional[str]]]:
+    """Read list of files to convert
+
+    Every line of the manifest is an input file name, optionally followed by
+    a tab and the output file name. Empty lines and lines, starting with #,
+    are ignored. Relative names are relative to the manifest location.
+    """
+    basedir = os.path.dirname(filename)
+    files: List[Tuple[str, Optional[str]]] = []
+    with open(filename) as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            input, _, output = line.partition("\t")
+            files.append(
+                (
+                    os.path.join(basedir, input.strip()),
+                    os.path.join(basedir, output.strip()) if output.strip() else None,
+                )
+            )
+    return files
+
+
+def expand_inputs(patterns: Iterable[str]) -> List[str]:
+    """Return input file names, expanding glob patterns
+
+    Patterns are expanded here for shells that don't do that. Names without
+    wildcards are kept even if there is no such file, to be reported as
+    conversion error.
+    """
+    inputs: List[str] = []
+    for pattern in patterns:
+        if any(char in pattern for char in "*?["):
+            inputs.extend(sorted(glob.glob(pattern)))
+        else:
+            inputs.append(pattern)
+    return inputs
+
+
+def make_output(template: str, input: str) -> str:
+    """Return output file name for the input
+
+    Template may refer to input file {dir}, {name} and {stem} (the name
+    without extension).
+    """
+    dir, name = os.path.split(input)
+    stem = os.path.splitext(name)[0]
+    return template.format(dir=dir or ".", name=name, stem=stem)
+
+
+def plan(
+    files: Iterable[Tuple[str, Optional[str]]],
+    template: str = DEFAULT_OUTPUT_TEMPLATE,
+) -> List[Tuple[str, str]]:
+    """Return (input, output) pairs, raising ConvertError on conflicts"""
+    jobs: List[Tuple[str, str]] = []
+    outputs: Dict[str, str] = {}
+    for input, output in files:
+        if output is None:
+            output = make_output(template, input)
+        key = os.path.normcase(os.path.abspath(output))
+        if key in outputs:
+            raise ConvertError(
+                1,
+                "Both %s and %s would be converted to %s"
+                % (outputs[key], input, output),
+            )
+        if key == os.path.normcase(os.path.abspath(input)):
+            raise ConvertError(1, "Input %s would be overwritten" % input)
+        outputs[key] = input
+        jobs.append((input, output))
+    return jobs
+
+
+def convert_batch(
+    type: str,
+    jobs: List[Tuple[str, str]],
+    config_location: Optional[str] = None,
+    workers: Optional[int] = None,
+    metrics: bool = False,
+    **options: Any,
+) -> Iterator[BatchResult]:
+    """Convert input files to outputs, yield results in the order of jobs
+
+    Options are passed to Converter.convert(). With a single worker files
+    are converted in this process. With metrics, results have conversion
+    metrics of the files.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(jobs))
+    if workers <= 1:
+        _init_worker(config_location, None, metrics)
+        for input, output in jobs:
+            yield _convert(type, input, output, options)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    level = logging.getLogger().getEffectiveLevel()
+    with ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=(config_location, level, metrics)
+    ) as pool:
+        futures = [
+            pool.submit(_convert, type, input, output, options)
+            for input, output in jobs
+        ]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _init_worker(
+    config_location: Optional[str], level: Optional[int], metrics: bool = False
+) -> None:
+    global _converter, _timer, _started
+    if level is not None:
+        # Worker process, that might not inherit logging configuration
+        logging.basicConfig(format="%(levelname)s: %(message)s", level=level)
+    _timer = None
+    if metrics:
+        from ofxstatement.metrics import StageTimer
+
+        _timer = StageTimer()
+    _started = time.perf_counter()
+    _converter = Converter(config_location, observers=[_timer] if _timer else [])
+
+
+def _convert(
+    type: str, input: str, output: str, options: Dict[str, Any]
+) -> BatchResult:
+    global _started
+    assert _converter is not None
+    start = _started if _started is not None else time.perf_counter()
+    _started = None
+    try:
+        result = _converter.convert(type, input, output, **options)
+    except ConvertError as e:
+        batch_result = BatchResult(input, output, e.code, e.messages)
+    except Exception as e:
+        # Failure of a single file should not stop the whole batch
+        batch_result = BatchResult(
+            input, output, 1, ["%s: %s" % (e.__class__.__name__, e)]
+        )
+    else:
+        batch_result = BatchResult(
+            input, output, 0, [], result.lines, result.invest_lines
+        )
+
+    if _timer is not None:
+        from ofxstatement.metrics import ConversionMetrics, get_plugin_info
+
+        batch_result.metrics = ConversionMetrics(
+            input,
+            output,
+            batch_result.code,
+            time.perf_counter() - start,
+            _timer.pop(),
+            result if not batch_result.code else None,
+            *get_plugin_info(_converter, type),
+        )
+    return batch_result
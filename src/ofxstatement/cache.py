@@ -0,0 +1,161 @@
+"""Cache of converted statements
+
+Converted OFX files are stored under a key, calculated from the input file
+contents and everything else that affects the conversion, so unchanged inputs
+don't have to be parsed again.
+
+Cache is best-effort: failures to store, evict or touch entries are logged
+and ignored, as the output is written by then anyway.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+import platformdirs
+
+from ofxstatement.configuration import APP_NAME, APP_AUTHOR
+
+DEFAULT_MAX_SIZE = 512 * 2**20
+
+# ioctl request to share data blocks of files on Linux (btrfs, xfs)
+FICLONE = 0x40049409
+
+log = logging.getLogger(__name__)
+
+
+def get_default_location() -> str:
+    cdir = platformdirs.user_cache_dir(APP_NAME, APP_AUTHOR)
+    return os.path.join(cdir, "output")
+
+
+def copy_file(src: str, dst: str) -> None:
+    """Copy file contents, sharing data blocks if file system supports it"""
+    if sys.platform.startswith("linux"):
+        import fcntl
+
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                return
+            except OSError:
+                pass
+    shutil.copyfile(src, dst)
+
+
+def hash_file(filename: str) -> str:
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(2**20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class OutputCache:
+    """Directory of converted files with least recently used eviction
+
+    Every entry consists of the output file and the json file with metadata.
+    Entries are evicted when total size of outputs exceeds max_size.
+    """
+
+    def __init__(
+        self, location: Optional[str] = None, max_size: int = DEFAULT_MAX_SIZE
+    ) -> None:
+        self.location = location or get_default_location()
+        self.max_size = max_size
+
+    def make_key(self, input: str, params: Dict[str, Any]) -> str:
+        """Return key for the input file, converted with given parameters"""
+        h = hashlib.sha256(hash_file(input).encode("ascii"))
+        h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str, output: str) -> Optional[Dict[str, Any]]:
+        """Copy cached output to given file name
+
+        Return entry metadata or None if there is no such entry.
+        """
+        datafname, metafname = self._paths(key)
+        try:
+            with open(metafname) as f:
+                meta = json.load(f)
+            copy_file(datafname, output)
+        except (OSError, ValueError):
+            return None
+        try:
+            # Mark entry as recently used
+            os.utime(datafname)
+        except OSError as e:
+            log.debug("Cannot update cache entry %s: %s" % (datafname, e))
+        return meta
+
+    def put(self, key: str, output: str, meta: Dict[str, Any]) -> None:
+        """Store converted file with given metadata"""
+        datafname, metafname = self._paths(key)
+
+        def write_meta(tmpname: str) -> None:
+            with open(tmpname, "w") as f:
+                json.dump(meta, f)
+
+        try:
+            os.makedirs(self.location, mode=0o700, exist_ok=True)
+            self._write(datafname, lambda tmpname: copy_file(output, tmpname))
+            self._write(metafname, write_meta)
+        except OSError as e:
+            log.debug("Cannot store %s in cache: %s" % (output, e))
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries, that don't fit into max_size"""
+        entries: List[Tuple[float, int, str]] = []
+        try:
+            with os.scandir(self.location) as it:
+                for entry in it:
+                    if not entry.name.endswith(".ofx"):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        # Evicted by another process
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.name[:-4]))
+        except OSError as e:
+            log.debug("Cannot list cache entries: %s" % e)
+            return
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_size:
+                break
+            for fname in self._paths(key):
+                try:
+                    os.remove(fname)
+                except FileNotFoundError:  # pragma: no cover
+                    pass
+                except OSError as e:
+                    log.debug("Cannot evict cache entry %s: %s" % (fname, e))
+            total -= size
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.location, key)
+        return base + ".ofx", base + ".json"
+
+    def _write(self, fname: str, write: Callable[[str], None]) -> None:
+        # Write to temporary file first, so concurrent readers never see
+        # partial entries
+        fd, tmpname = tempfile.mkstemp(dir=self.location, suffix=".tmp")
+        os.close(fd)
+        try:
+            write(tmpname)
+            os.replace(tmpname, fname)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmpname)
+            raise
@@ -0,0 +1,263 @@
+"""Conversion of statement files to OFX
+
+Converter is what `ofxstatement convert` does for a single file, packaged
+to be reused for many files by long running processes: configuration is
+read once and plugins are loaded on first use.
+
+Conversion runs in stages: "config", "cache", "plugin", "parse",
+"validate", "serialize" and "write". Observers, passed to Converter, are
+notified of every stage by their `stage(name)` method, which should return
+a context manager, wrapping the stage. Serialization and writing alternate
+for every chunk of the output, so these stages are entered many times.
+"""
+
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    Union,
+)
+import contextlib
+import logging
+import os
+
+from ofxstatement import configuration, plugin
+from ofxstatement.exceptions import ConvertError, ParseError, ValidationError
+from ofxstatement.statement import Statement
+from ofxstatement.ui import UI
+from ofxstatement.util import get_version, smart_open
+
+if TYPE_CHECKING:
+    from ofxstatement.ofx import OfxWriter
+
+log = logging.getLogger(__name__)
+
+
+class ConvertResult:
+    """Number of converted lines and whether the output was cached"""
+
+    def __init__(self, lines: int, invest_lines: int, cached: bool = False) -> None:
+        self.lines = lines
+        self.invest_lines = invest_lines
+        self.cached = cached
+
+    def __repr__(self) -> str:
+        return "ConvertResult(lines=%r, invest_lines=%r, cached=%r)" % (
+            self.lines,
+            self.invest_lines,
+            self.cached,
+        )
+
+
+class Converter:
+    """Converts statement files of types, configured in config file
+
+    Type is a config file section or, when there is no config file, a
+    plugin name. Errors are raised as ConvertError with the exit code of
+    `ofxstatement convert`.
+    """
+
+    def __init__(
+        self,
+        config_location: Optional[str] = None,
+        ui: Optional[UI] = None,
+        observers: Sequence[Any] = (),
+    ) -> None:
+        self.ui = ui or UI()
+        self.observers = list(observers)
+        self._plugins: Dict[str, plugin.Plugin] = {}
+        with self.stage("config"):
+            self.config = configuration.read(config_location)
+
+    def stage(self, name: str) -> ContextManager[Any]:
+        """Return context manager for a stage of conversion
+
+        Stage is wrapped by context managers of all observers.
+        """
+        if not self.observers:
+            return contextlib.nullcontext()
+        if len(self.observers) == 1:
+            return self.observers[0].stage(name)
+        return _nested([observer.stage(name) for observer in self.observers])
+
+    def get_settings(self, type: str) -> Tuple[str, Dict[str, str]]:
+        """Return plugin name and its settings for the input type"""
+        if self.config is None:
+            # No configuration mode
+            return type, {}
+
+        if type not in self.config:
+            raise ConvertError(
+                1,
+                "No section '%s' in config file." % type,
+                "Edit configuration using ofxstatement edit-config and "
+                "add section [%s]." % type,
+            )
+
+        settings = dict(self.config[type])
+        pname = settings.get("plugin", None)
+        if not pname:
+            raise ConvertError(1, "Specify 'plugin' setting for section [%s]" % type)
+        return pname, settings
+
+    def get_plugin(self, type: str) -> plugin.Plugin:
+        """Return configured plugin for the input type, loading it once"""
+        p = self._plugins.get(type)
+        if p is None:
+            pname, settings = self.get_settings(type)
+            try:
+                p = plugin.get_plugin(pname, self.ui, settings)
+            except plugin.PluginNotRegistered:
+                raise ConvertError(1, "No plugin named '%s' is found" % pname)
+            self._plugins[type] = p
+        return p
+
+    def parse(self, type: str, input: str) -> Statement:
+        """Parse and validate the statement file"""
+        with self.stage("plugin"):
+            parser = self.get_plugin(type).get_parser(input)
+        try:
+            with self.stage("parse"):
+                statement = parser.parse()
+        except ParseError as e:
+            raise ConvertError(2, "Parse error on line %s: %s" % (e.lineno, e.message))
+
+        try:
+            with self.stage("validate"):
+                statement.assert_valid()
+        except ValidationError as e:
+            raise ConvertError(2, "Statement validation error: %s" % (e.message))
+        return statement
+
+    def convert(
+        self,
+        type: str,
+        input: str,
+        output: Union[str, TextIO],
+        pretty: bool = False,
+        only_new: bool = False,
+        use_cache: bool = True,
+    ) -> ConvertResult:
+        """Convert input file to OFX
+
+        Output is a file name, where a minus (-) means standard output, or a
+        text stream. Converted files are cached, unless the output is a
+        stream or only new transactions are requested.
+        """
+        pname, settings = self.get_settings(type)
+        encoding = settings.get("encoding", "utf-8")
+
+        # Skip conversion, if the same input was converted before
+        output_cache = None
+        if (
+            use_cache
+            and not only_new
+            and isinstance(output, str)
+            and output != "-"
+            and os.path.isfile(input)
+        ):
+            from ofxstatement import cache
+
+            with self.stage("cache"):
+                output_cache = cache.OutputCache()
+                cache_key = output_cache.make_key(
+                    input,
+                    {
+                        "plugin": pname,
+                        "plugin_version": plugin.get_plugin_version(pname),
+                        "settings": settings,
+                        "version": get_version(),
+                        "pretty": pretty,
+                        "encoding": encoding,
+                    },
+                )
+                cached = output_cache.get(cache_key, output)
+            if cached is not None:
+                log.debug("Using cached output for %s" % input)
+                return ConvertResult(
+                    cached["lines"], cached["invest_lines"], cached=True
+                )
+
+        statement = self.parse(type, input)
+
+        if only_new:
+            from ofxstatement import txnstore
+
+            # Store is closed even if writing the output fails
+            with txnstore.TransactionStore() as store:
+                n_total = len(statement.lines) + len(statement.invest_lines)
+                new_keys = txnstore.remove_exported(statement, store)
+                log.info(
+                    "Skipping %d already exported transactions"
+                    % (n_total - len(new_keys))
+                )
+                self.write_output(statement, output, pretty, encoding)
+                store.add(txnstore.get_account_key(statement), new_keys)
+        else:
+            self.write_output(statement, output, pretty, encoding)
+
+        result = ConvertResult(len(statement.lines), len(statement.invest_lines))
+        if output_cache is not None and isinstance(output, str):
+            with self.stage("cache"):
+                output_cache.put(
+                    cache_key,
+                    output,
+                    {"lines": result.lines, "invest_lines": result.invest_lines},
+                )
+        return result
+
+    def write_output(
+        self,
+        statement: Statement,
+        output: Union[str, TextIO],
+        pretty: bool,
+        encoding: str,
+    ) -> None:
+        """Write statement as OFX to the file or the text stream"""
+        from ofxstatement import ofx
+
+        writer = ofx.OfxWriter(statement)
+        if isinstance(output, str):
+            with smart_open(output, encoding) as out:
+                try:
+                    self.write(writer, out, pretty, encoding)
+                except BaseException:
+                    # Don't leave partially written output behind
+                    if output and output != "-":
+                        out.close()
+                        os.remove(output)
+                    raise
+        else:
+            self.write(writer, output, pretty, encoding)
+
+    def write(
+        self, writer: "OfxWriter", out: TextIO, pretty: bool, encoding: str
+    ) -> None:
+        """Write OFX document, generated by the writer, to the stream"""
+        if not self.observers:
+            writer.write(out, pretty=pretty, encoding=encoding)
+            return
+
+        chunks = writer.iter_chunks(pretty=pretty, encoding=encoding)
+        while True:
+            with self.stage("serialize"):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            with self.stage("write"):
+                out.write(chunk)
+
+
+@contextlib.contextmanager
+def _nested(managers: List[ContextManager[Any]]) -> Iterator[None]:
+    with contextlib.ExitStack() as stack:
+        for manager in managers:
+            stack.enter_context(manager)
+        yield
@@ -19,3 +19,19 @@ class ValidationError(Exception):  # pragma: no cover
 
     def __str__(self) -> str:
         return "message: %s; object:\n%r" % (self.message, self.obj)
+
+
+class ConvertError(Exception):
+    """Raised when statement cannot be converted
+
+    Code is the exit status of `ofxstatement convert`: 1 for configuration
+    errors, 2 for malformed or invalid statements and 3 for conversions,
+    exceeding memory budget.
+    """
+
+    def __init__(self, code: int, *messages: str) -> None:
+        self.code = code
+        self.messages = list(messages)
+
+    def __str__(self) -> str:
+        return " ".join(self.messages)
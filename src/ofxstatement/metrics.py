@@ -0,0 +1,285 @@
+"""Machine readable metrics of conversions
+
+StageTimer is a Converter observer, that measures wall time of every stage
+of conversion. Metrics of converted files are collected into a
+MetricsReport, which is formatted as JSON or in Prometheus text format,
+suitable for node exporter textfile collector.
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import contextlib
+import json
+import os
+import tempfile
+import time
+
+from ofxstatement import plugin
+from ofxstatement.conversion import Converter, ConvertResult
+from ofxstatement.exceptions import ConvertError
+from ofxstatement.util import get_version
+
+FORMATS = ["json", "prometheus"]
+
+
+class StageTimer:
+    def __init__(self) -> None:
+        self.seconds: Dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.seconds[name] = self.seconds.get(name, 0.0) + elapsed
+
+    def pop(self) -> Dict[str, float]:
+        """Return time of stages, measured so far, and start over"""
+        seconds, self.seconds = self.seconds, {}
+        return seconds
+
+
+class ConversionMetrics:
+    """Metrics of a single file conversion
+
+    Code is the exit status of `ofxstatement convert`. Output size is only
+    known for successful conversions to a file.
+    """
+
+    def __init__(
+        self,
+        input: str,
+        output: str,
+        code: int,
+        seconds: float,
+        stages: Dict[str, float],
+        result: Optional[ConvertResult] = None,
+        plugin: Optional[str] = None,
+        plugin_version: Optional[str] = None,
+    ) -> None:
+        self.input = input
+        self.output = output
+        self.code = code
+        self.seconds = seconds
+        self.stages = stages
+        self.lines = result.lines if result else 0
+        self.invest_lines = result.invest_lines if result else 0
+        self.cached = result.cached if result else False
+        self.plugin = plugin
+        self.plugin_version = plugin_version
+        self.input_bytes = file_size(input)
+        self.output_bytes = file_size(output) if result else None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "input": self.input,
+            "output": self.output,
+            "code": self.code,
+            "cached": self.cached,
+            "seconds": self.seconds,
+            "stages": self.stages,
+            "lines": self.lines,
+            "invest_lines": self.invest_lines,
+            "lines_per_second": rate(self.lines + self.invest_lines, self.seconds),
+            "input_bytes": self.input_bytes,
+            "output_bytes": self.output_bytes,
+        }
+
+
+class MetricsReport:
+    """Metrics of converting one or more files of the same type
+
+    Seconds is wall time of the whole run, which is less than total time of
+    the files, when they are converted in parallel.
+    """
+
+    def __init__(
+        self,
+        type: str,
+        files: List[ConversionMetrics],
+        seconds: float,
+        timestamp: Optional[float] = None,
+    ) -> None:
+        self.type = type
+        self.files = files
+        self.seconds = seconds
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    @property
+    def plugin(self) -> Tuple[Optional[str], Optional[str]]:
+        """Plugin name and version"""
+        for file in self.files:
+            if file.plugin is not None:
+                return file.plugin, file.plugin_version
+        return None, None
+
+    def get_totals(self) -> Dict[str, Any]:
+        stages: Dict[str, float] = {}
+        for file in self.files:
+            for name, seconds in file.stages.items():
+                stages[name] = stages.get(name, 0.0) + seconds
+        lines = sum(file.lines for file in self.files)
+        invest_lines = sum(file.invest_lines for file in self.files)
+        return {
+            "converted": sum(1 for file in self.files if not file.code),
+            "failed": sum(1 for file in self.files if file.code),
+            "stages": stages,
+            "lines": lines,
+            "invest_lines": invest_lines,
+            "lines_per_second": rate(lines + invest_lines, self.seconds),
+            "input_bytes": _sum(file.input_bytes for file in self.files),
+            "output_bytes": _sum(file.output_bytes for file in self.files),
+        }
+
+    def to_json(self) -> str:
+        pname, pversion = self.plugin
+        report: Dict[str, Any] = {
+            "version": get_version(),
+            "type": self.type,
+            "plugin": pname,
+            "plugin_version": pversion,
+            "timestamp": self.timestamp,
+            "seconds": self.seconds,
+        }
+        report.update(self.get_totals())
+        report["files"] = [file.as_dict() for file in self.files]
+        return json.dumps(report, indent=2) + "\n"
+
+    def to_prometheus(self) -> str:
+        totals = self.get_totals()
+        pname, pversion = self.plugin
+        labels = {"type": self.type}
+        out = _PrometheusWriter()
+        out.metric(
+            "plugin_info",
+            "Plugin, converting the files.",
+            [(dict(labels, plugin=pname or "", version=pversion or ""), 1)],
+        )
+        out.metric(
+            "conversion_files",
+            "Number of converted files by status.",
+            [
+                (dict(labels, status="ok"), totals["converted"]),
+                (dict(labels, status="failed"), totals["failed"]),
+            ],
+        )
+        out.metric(
+            "conversion_seconds",
+            "Wall time of the conversion run.",
+            [(labels, self.seconds)],
+        )
+        out.metric(
+            "conversion_stage_seconds",
+            "Time spent in conversion stage, summed over the files.",
+            [
+                (dict(labels, stage=name), seconds)
+                for name, seconds in totals["stages"].items()
+            ],
+        )
+        for name, help in [
+            ("lines", "Number of converted statement lines."),
+            ("invest_lines", "Number of converted investment statement lines."),
+            ("lines_per_second", "Converted lines of both kinds per second."),
+            ("input_bytes", "Size of converted input files."),
+            ("output_bytes", "Size of produced output files."),
+        ]:
+            value = totals[name]
+            out.metric(
+                "conversion_" + name,
+                help,
+                [(labels, value)] if value is not None else [],
+            )
+        out.metric(
+            "conversion_timestamp_seconds",
+            "Time the conversion run finished, in seconds since epoch.",
+            [(labels, self.timestamp)],
+        )
+        return out.getvalue()
+
+    def format(self, format: str) -> str:
+        if format == "json":
+            return self.to_json()
+        return self.to_prometheus()
+
+
+class _PrometheusWriter:
+    """Writer of metrics in Prometheus text exposition format"""
+
+    prefix = "ofxstatement_"
+
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+
+    def metric(
+        self, name: str, help: str, samples: List[Tuple[Dict[str, str], Any]]
+    ) -> None:
+        if not samples:
+            return
+        name = self.prefix + name
+        self.lines.append("# HELP %s %s" % (name, help))
+        self.lines.append("# TYPE %s gauge" % name)
+        for labels, value in samples:
+            self.lines.append(
+                "%s{%s} %s"
+                % (
+                    name,
+                    ",".join(
+                        '%s="%s"' % (key, _escape(label))
+                        for key, label in labels.items()
+                    ),
+                    repr(float(value)),
+                )
+            )
+
+    def getvalue(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def get_plugin_info(
+    converter: Optional[Converter], type: str
+) -> Tuple[Optional[str], Optional[str]]:
+    """Return name and version of the plugin, converting the type"""
+    if converter is None:
+        return None, None
+    try:
+        pname, _ = converter.get_settings(type)
+    except ConvertError:
+        return None, None
+    return pname, plugin.get_plugin_version(pname)
+
+
+def file_size(filename: str) -> Optional[int]:
+    if filename == "-" or not os.path.isfile(filename):
+        return None
+    return os.path.getsize(filename)
+
+
+def rate(count: int, seconds: float) -> Optional[float]:
+    return count / seconds if seconds else None
+
+
+def write_atomic(filename: str, text: str) -> None:
+    """Write the file, so that readers never see it partially written
+
+    That is required by node exporter textfile collector.
+    """
+    dirname, basename = os.path.split(os.path.abspath(filename))
+    fd, tmpname = tempfile.mkstemp(dir=dirname, prefix="." + basename)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.chmod(tmpname, 0o644)
+        os.replace(tmpname, filename)
+    except BaseException:
+        os.remove(tmpname)
+        raise
+
+
+def _sum(values: Iterator[Optional[int]]) -> Optional[int]:
+    known = [value for value in values if value is not None]
+    return sum(known) if known else None
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,155 @@
+"""Memory-mapped input files
+
+Plugins can read large statements without buffering them in Python's text
+layer, by opening the input in ``get_parser()`` with::
+
+    f = open_mapped(filename, encoding="utf-8")
+
+instead of the built-in ``open()``.
+"""
+
+from typing import Iterator, Optional, TextIO, Union, cast
+import codecs
+import io
+import itertools
+import locale
+import mmap
+import re
+
+DEFAULT_BLOCK_SIZE = 4 * 2**20
+
+# Splits text after "\n", "\r\n" and "\r", keeping line endings
+LINE_END = re.compile(r"(?<=\n)|(?<=\r)(?!\n)")
+# Characters, that str.splitlines() treats as line boundaries, but files don't
+OTHER_LINE_BREAKS = "\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+
+class MappedTextFile:
+    """Read-only text file, decoded lazily from the memory-mapped input
+
+    Mapped bytes are decoded in blocks of block_size bytes and split into
+    lines. With newline=None (the default) "\\r\\n" and "\\r" are translated to
+    "\\n", like in text files opened with open(). With newline="" line endings
+    are kept as they are, which is what csv module expects.
+
+    Raw bytes are available in the ``mapping`` attribute, so fixed width
+    formats can slice columns without decoding whole lines.
+    """
+
+    mapping: Union[mmap.mmap, bytes]
+
+    def __init__(
+        self,
+        filename: str,
+        encoding: Optional[str] = None,
+        errors: str = "strict",
+        newline: Optional[str] = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+    ) -> None:
+        if newline not in (None, ""):
+            raise ValueError("Unsupported newline: %r" % newline)
+        self.name = filename
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.errors = errors
+        self.newline = newline
+        self.block_size = block_size
+        self.closed = False
+
+        with open(filename, "rb") as f:
+            try:
+                self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                self.mapping = b""
+
+        self._lines = self._iter_lines()
+        # Part of the line, left by read(size)
+        self._rest = ""
+
+    def __enter__(self) -> "MappedTextFile":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __iter__(self) -> Iterator[str]:
+        if self._rest:
+            rest, self._rest = self._rest, ""
+            self._lines = itertools.chain([rest], self._lines)
+        return self._lines
+
+    def __next__(self) -> str:
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def readable(self) -> bool:
+        return True
+
+    def readline(self) -> str:
+        if self._rest:
+            line, self._rest = self._rest, ""
+            return line
+        return next(self._lines, "")
+
+    def read(self, size: int = -1) -> str:
+        if size < 0:
+            text = self._rest + "".join(self._lines)
+            self._rest = ""
+            return text
+
+        chunks = [self._rest]
+        length = len(self._rest)
+        while length < size:
+            line = next(self._lines, "")
+            if not line:
+                break
+            chunks.append(line)
+            length += len(line)
+        text = "".join(chunks)
+        self._rest = text[size:]
+        return text[:size]
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            if isinstance(self.mapping, mmap.mmap):
+                self.mapping.close()
+
+    def _iter_lines(self) -> Iterator[str]:
+        decoder: Union[codecs.IncrementalDecoder, io.IncrementalNewlineDecoder]
+        decoder = codecs.getincrementaldecoder(self.encoding)(self.errors)
+        if self.newline is None:
+            decoder = io.IncrementalNewlineDecoder(decoder, translate=True)
+
+        size = len(self.mapping)
+        pending = ""
+        for start in range(0, size, self.block_size):
+            end = start + self.block_size
+            final = end >= size
+            text = pending + decoder.decode(self.mapping[start:end], final)
+            if not any(char in text for char in OTHER_LINE_BREAKS):
+                lines = text.splitlines(True)
+            else:
+                lines = [line for line in LINE_END.split(text) if line]
+            pending = ""
+            if lines and (
+                not lines[-1].endswith(("\n", "\r"))
+                # "\r" may be followed by "\n" in the next block
+                or (not final and lines[-1].endswith("\r"))
+            ):
+                pending = lines.pop()
+            yield from lines
+        if pending:
+            yield pending
+
+
+def open_mapped(
+    filename: str,
+    encoding: Optional[str] = None,
+    errors: str = "strict",
+    newline: Optional[str] = None,
+) -> TextIO:
+    """Open file for reading through memory map, see MappedTextFile"""
+    return cast(TextIO, MappedTextFile(filename, encoding, errors, newline))
@@ -0,0 +1,127 @@
+"""Parsing of localised numbers"""
+
+from typing import Any, Callable, Dict, Iterable, Optional
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+import re
+
+# Characters accepted in place of space, when it is used as grouping mark
+SPACES = " \u00a0\u202f"
+
+
+class NumberFormat:
+    """Number format, used in the statement
+
+    Describes how amounts are written, for example European amounts like
+    "-1.234,56 €" can be parsed with::
+
+        NumberFormat(decimal_mark=",", grouping_mark=".", currency_symbols=["€"])
+
+    The format is compiled once, so parsing each value takes a single regular
+    expression match. Results for repeated strings are cached.
+    """
+
+    def __init__(
+        self,
+        decimal_mark: str = ".",
+        grouping_mark: str = "",
+        currency_symbols: Iterable[str] = (),
+        negative_parentheses: bool = False,
+        trailing_minus: bool = False,
+        cache_size: int = 1024,
+    ) -> None:
+        # Character, separating fractional part
+        self.decimal_mark = decimal_mark
+        # Characters, separating groups of thousands
+        self.grouping_mark = grouping_mark
+        # Currency symbols or codes, that may precede or follow the number. A
+        # single string is one symbol, not a set of characters.
+        if isinstance(currency_symbols, str):
+            currency_symbols = [currency_symbols]
+        self.currency_symbols = list(currency_symbols)
+        # Whether negative numbers may be written in parentheses: "(12.00)"
+        self.negative_parentheses = negative_parentheses
+        # Whether negative numbers may be written with trailing minus: "12.00-"
+        self.trailing_minus = trailing_minus
+
+        # Number of distinct strings parse() remembers, 0 disables the cache
+        self.cache_size = cache_size
+
+        self._compile()
+        self._init_cache()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Cached bound method cannot be pickled, e.g. to send the format to
+        # worker processes, so it is created again when unpickled
+        state = self.__dict__.copy()
+        del state["parse"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._init_cache()
+
+    def _init_cache(self) -> None:
+        self.parse: Callable[[str], Decimal] = self._parse
+        if self.cache_size:
+            self.parse = lru_cache(self.cache_size)(self._parse)
+
+    def _compile(self) -> None:
+        grouping = self.grouping_mark
+        if any(c in SPACES for c in grouping):
+            grouping += SPACES
+        if self.decimal_mark in grouping:
+            raise ValueError("Decimal mark cannot be used as grouping mark")
+
+        symbols = sorted(self.currency_symbols, key=len, reverse=True)
+        symbol = "|".join(map(re.escape, symbols))
+        # Grouping marks are allowed only between digits of the integer part
+        integer = "[0-9]+"
+        if grouping:
+            integer += "(?:[%s][0-9]+)*" % re.escape(grouping)
+        number = r"(?P<number>(?:%s)?(?:%s[0-9]*)?)" % (
+            integer,
+            re.escape(self.decimal_mark),
+        )
+        open_paren = r"(?P<open>\()?" if self.negative_parentheses else ""
+        close_paren = r"(?P<close>\))?" if self.negative_parentheses else ""
+        trailing = r"(?P<trailing>-)?" if self.trailing_minus else ""
+        parts = [
+            open_paren,
+            r"(?P<sign>[-+])?",
+            "(?P<prefix>%s)?" % symbol if symbols else "",
+            r"(?P<sign2>[-+])?",
+            number,
+            "(?P<suffix>%s)?" % symbol if symbols else "",
+            trailing,
+            close_paren,
+        ]
+        pattern = r"\s*%s\s*" % r"\s*".join(part for part in parts if part)
+        self._regex = re.compile(pattern)
+
+        table: Dict[int, Optional[str]] = dict.fromkeys(map(ord, grouping))
+        table[ord(self.decimal_mark)] = "."
+        self._table = table
+
+    def _parse(self, value: str) -> Decimal:
+        match = self._regex.fullmatch(value)
+        if match is None:
+            raise ValueError("Cannot parse number %r" % value)
+        groups = match.groupdict()
+        if groups.get("prefix") is not None and groups.get("suffix") is not None:
+            raise ValueError("Cannot parse number %r" % value)
+        number = groups["number"].translate(self._table)
+        if (groups.get("open") is None) != (groups.get("close") is None):
+            raise ValueError("Unbalanced parentheses in number %r" % value)
+
+        negative = (
+            groups["sign"] == "-"
+            or groups["sign2"] == "-"
+            or groups.get("trailing") is not None
+            or groups.get("open") is not None
+        )
+        try:
+            amount = Decimal(number)
+        except InvalidOperation:
+            raise ValueError("Cannot parse number %r" % value) from None
+        return -amount if negative else amount
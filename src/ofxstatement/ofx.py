@@ -1,10 +1,9 @@
 import codecs
-from typing import Optional, Union
-from datetime import datetime, date, time
+from typing import Callable, Dict, Iterator, List, Optional, TextIO, Tuple, Union
+from datetime import datetime, date, time, timedelta, tzinfo
 from decimal import Decimal
 
 from xml.etree import ElementTree as etree
-from xml.dom import minidom
 
 from ofxstatement.statement import (
     Statement,
@@ -15,24 +14,166 @@ from ofxstatement.statement import (
 )
 
 
+def _escape(text: str) -> str:
+    # Same escaping as xml.etree.ElementTree applies to text content
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+class StreamBuilder:
+    """Serialize elements as soon as they are built
+
+    Implements the part of the ``xml.etree.ElementTree.TreeBuilder`` interface
+    OfxWriter uses and produces the same markup as ``etree.tostring()``. Only
+    the output produced since the last ``flush()`` is kept in memory.
+    """
+
+    def __init__(self) -> None:
+        self.pieces: List[str] = []
+        # Element, which start tag is not written yet, because we don't know
+        # whether it is empty
+        self.pending: Optional[str] = None
+
+    def start(self, tag: str, attrs: Dict[str, str]) -> None:
+        # OFX elements never have attributes, so attrs are ignored
+        if self.pending is not None:
+            self.pieces.append(f"<{self.pending}>")
+        self.pending = tag
+
+    def data(self, text: str) -> None:
+        if not text:
+            return
+        if self.pending is not None:
+            self.pieces.append(f"<{self.pending}>")
+            self.pending = None
+        self.pieces.append(_escape(text))
+
+    def end(self, tag: str) -> None:
+        if self.pending is not None:
+            self.pieces.append(f"<{tag} />")
+            self.pending = None
+        else:
+            self.pieces.append(f"</{tag}>")
+
+    def close(self) -> None:
+        pass
+
+    def flush(self) -> str:
+        """Return the output produced so far and forget it"""
+        chunk = "".join(self.pieces)
+        self.pieces.clear()
+        return chunk
+
+
+class PrettyStreamBuilder(StreamBuilder):
+    """Serialize elements with nested tags indented
+
+    Produces the same output as ``xml.dom.minidom``'s ``toprettyxml()`` with
+    two space indentation and CRLF line endings, without reparsing the
+    document.
+    """
+
+    indent = "  "
+    newl = "\r\n"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.depth = 0
+        # Whether the current element contains text and should be closed on
+        # the same line
+        self.inline = False
+
+    def start(self, tag: str, attrs: Dict[str, str]) -> None:
+        if self.pending is not None:
+            self.pieces.append(f"{self.indent * self.depth}<{self.pending}>{self.newl}")
+            self.depth += 1
+        self.pending = tag
+
+    def data(self, text: str) -> None:
+        if not text:
+            return
+        if self.pending is not None:
+            self.pieces.append(f"{self.indent * self.depth}<{self.pending}>")
+            self.depth += 1
+            self.pending = None
+        # Reparsed document would have line endings normalized and quotes
+        # escaped by minidom
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        text = _escape(text)
+        if '"' in text:
+            text = text.replace('"', "&quot;")
+        self.pieces.append(text)
+        self.inline = True
+
+    def end(self, tag: str) -> None:
+        if self.pending is not None:
+            self.pieces.append(f"{self.indent * self.depth}<{tag}/>{self.newl}")
+            self.pending = None
+            return
+        self.depth -= 1
+        if self.inline:
+            self.pieces.append(f"</{tag}>{self.newl}")
+            self.inline = False
+        else:
+            self.pieces.append(f"{self.indent * self.depth}</{tag}>{self.newl}")
+
+
 class OfxWriter(object):
+    # Number of output pieces to collect before yielding the chunk
+    chunk_pieces = 4096
+    # Number of formatted dates to remember
+    date_cache_size = 4096
+
+    tb: Union[etree.TreeBuilder, StreamBuilder]
+
     def __init__(self, statement: Statement) -> None:
         self.statement = statement
         self.genTime = datetime.now()
         self.tb = etree.TreeBuilder()
         self.default_float_precision = 2
         self.invest_transactions_float_precision = 5
+        self._dateCache: Dict[Tuple[datetime, Optional[tzinfo], int, bool], str] = {}
+        self._tzCache: Dict[timedelta, str] = {}
+        self._amountSpecs: Dict[int, str] = {}
+        self._investEmitters: Dict[str, Callable[[InvestStatementLine], None]] = {}
 
     def toxml(self, pretty: bool = False, encoding: str = "utf-8") -> str:
-        et = self.buildDocument()
-        root = et.getroot()
-        assert root is not None
-        xmlstring = etree.tostring(root, "unicode")
-        if pretty:
-            dom = minidom.parseString(xmlstring)
-            xmlstring = dom.toprettyxml(indent="  ", newl="\r\n")
-            xmlstring = xmlstring.replace('<?xml version="1.0" ?>', "").lstrip()
-
+        return "".join(self.iter_chunks(pretty=pretty, encoding=encoding))
+
+    def write(self, fh: TextIO, pretty: bool = False, encoding: str = "utf-8") -> None:
+        """Write OFX document to the text stream as it is being generated"""
+        for chunk in self.iter_chunks(pretty=pretty, encoding=encoding):
+            fh.write(chunk)
+
+    def iter_chunks(
+        self, pretty: bool = False, encoding: str = "utf-8"
+    ) -> Iterator[str]:
+        """Generate OFX document as a sequence of text chunks
+
+        Only the chunk being built is kept in memory, so memory usage does not
+        depend on the number of transactions in the statement.
+        """
+        yield self.buildHeader(encoding)
+
+        out = PrettyStreamBuilder() if pretty else StreamBuilder()
+        # Builder methods write to self.tb, which is restored afterwards, so
+        # buildDocument() still builds the tree
+        tb, self.tb = self.tb, out
+        try:
+            for _ in self.iterDocument():
+                if len(out.pieces) >= self.chunk_pieces:
+                    yield out.flush()
+            yield out.flush()
+        finally:
+            self.tb = tb
+
+    def buildHeader(self, encoding: str) -> str:
         codec = codecs.lookup(encoding)
         if codec.name == "utf-8":
             encoding_name = "UNICODE"
@@ -47,7 +188,7 @@ class OfxWriter(object):
             encoding_name = "USASCII"
             charset_name = codec.name.upper()
 
-        header = (
+        return (
             "OFXHEADER:100\r\n"
             "DATA:OFXSGML\r\n"
             "VERSION:102\r\n"
@@ -60,18 +201,21 @@ class OfxWriter(object):
             "\r\n"
         )
 
-        return header + xmlstring
-
     def buildDocument(self) -> etree.ElementTree:
+        for _ in self.iterDocument():
+            pass
+        return etree.ElementTree(self.tb.close())
+
+    def iterDocument(self) -> Iterator[None]:
+        """Build the document, yielding after each transaction"""
         tb = self.tb
         tb.start("OFX", {})
 
         self.buildSignon()
 
-        self.buildTransactionList()
+        yield from self.iterTransactionList()
 
         tb.end("OFX")
-        return etree.ElementTree(tb.close())
 
     def buildSignon(self) -> None:
         tb = self.tb
@@ -88,14 +232,14 @@ class OfxWriter(object):
         tb.end("SONRS")
         tb.end("SIGNONMSGSRSV1")
 
-    def buildTransactionList(self) -> None:
+    def iterTransactionList(self) -> Iterator[None]:
         if self.statement.lines:
-            self.buildBankTransactionList()
+            yield from self.iterBankTransactionList()
 
         if self.statement.invest_lines:
-            self.buildInvestTransactionList()
+            yield from self.iterInvestTransactionList()
 
-    def buildBankTransactionList(self) -> None:
+    def iterBankTransactionList(self) -> Iterator[None]:
         tb = self.tb
         tb.start("BANKMSGSRSV1", {})
         tb.start("STMTTRNRS", {})
@@ -121,6 +265,7 @@ class OfxWriter(object):
 
         for line in self.statement.lines:
             self.buildBankTransaction(line)
+            yield
 
         tb.end("BANKTRANLIST")
 
@@ -163,7 +308,7 @@ class OfxWriter(object):
         self.buildAmount("CURRATE", currency.rate, precision=4)
         self.tb.end(tag)
 
-    def buildInvestTransactionList(self) -> None:
+    def iterInvestTransactionList(self) -> Iterator[None]:
         tb = self.tb
         tb.start("SECLISTMSGSRSV1", {})
         tb.start("SECLIST", {})
@@ -211,6 +356,7 @@ class OfxWriter(object):
 
         for line in self.statement.invest_lines:
             self.buildInvestTransaction(line)
+            yield
 
         tb.end("INVTRANLIST")
 
@@ -232,94 +378,109 @@ class OfxWriter(object):
         if line.trntype is None:
             return
 
-        tb = self.tb
+        emit = self._investEmitters.get(line.trntype)
+        if emit is None:
+            emit = self._investEmitters[line.trntype] = self.compileInvestEmitter(
+                line.trntype
+            )
+        emit(line)
 
-        if line.trntype == "INVBANKTRAN":
-            tb.start(line.trntype, {})
-            bankTran = StatementLine(line.id, line.date, line.memo, line.amount)
-            bankTran.trntype = line.trntype_detailed
-            self.buildBankTransaction(bankTran)
-            self.buildText("SUBACCTFUND", "OTHER")
-            tb.end(line.trntype)
-            return
+    def compileInvestEmitter(
+        self, trntype: str
+    ) -> Callable[[InvestStatementLine], None]:
+        """Return function, writing investment transactions of given type
+
+        Envelope elements are picked once per transaction type, so the
+        returned function only has to write the line itself.
+        """
+        if trntype == "INVBANKTRAN":
+            return self.buildInvestBankTransaction
 
         tran_type_detailed_tag_name = None
         inner_tran_type_tag_name = None
-        if line.trntype.startswith("BUY"):
+        if trntype.startswith("BUY"):
             inner_tran_type_tag_name = "INVBUY"
-            if line.trntype == "BUYMF" or line.trntype == "BUYSTOCK":
+            if trntype == "BUYMF" or trntype == "BUYSTOCK":
                 tran_type_detailed_tag_name = "BUYTYPE"
-        elif line.trntype.startswith("SELL"):
+        elif trntype.startswith("SELL"):
             inner_tran_type_tag_name = "INVSELL"
-            if line.trntype == "SELLMF" or line.trntype == "SELLSTOCK":
+            if trntype == "SELLMF" or trntype == "SELLSTOCK":
                 tran_type_detailed_tag_name = "SELLTYPE"
-        elif line.trntype == "INCOME":
+        elif trntype == "INCOME":
+            # income transactions don't have an envelope element
             tran_type_detailed_tag_name = "INCOMETYPE"
-            inner_tran_type_tag_name = (
-                None  # income transactions don't have an envelope element
-            )
-        elif line.trntype == "TRANSFER":
+        elif trntype == "TRANSFER":
             tran_type_detailed_tag_name = "TFERACTION"
-            inner_tran_type_tag_name = None
-        else:
-            # INVEXPENSE transactions don't have details or an envelope
-            tran_type_detailed_tag_name = None
-            inner_tran_type_tag_name = None
+        # INVEXPENSE transactions don't have details or an envelope
 
-        tb.start(line.trntype, {})
-        if tran_type_detailed_tag_name:
-            self.buildText(tran_type_detailed_tag_name, line.trntype_detailed, False)
+        fees_tag_name = "WITHHOLDING" if trntype == "INCOME" else "FEES"
+        has_subacctfund = trntype != "TRANSFER"
+        buildText = self.buildText
+        buildDateTime = self.buildDateTime
+        buildAmount = self.buildAmount
 
-        if inner_tran_type_tag_name:
-            tb.start(inner_tran_type_tag_name, {})
+        def emit(line: InvestStatementLine) -> None:
+            tb = self.tb
+            tb.start(trntype, {})
+            if tran_type_detailed_tag_name:
+                buildText(tran_type_detailed_tag_name, line.trntype_detailed, False)
 
-        tb.start("INVTRAN", {})
-        self.buildText("FITID", line.id)
-        self.buildDateTime("DTTRADE", line.date, False, True)
-        self.buildText("MEMO", line.memo)
-        tb.end("INVTRAN")
-
-        tb.start("SECID", {})
-        self.buildText("UNIQUEID", line.security_id, False)
-        self.buildText("UNIQUEIDTYPE", "TICKER")
-        tb.end("SECID")
-
-        self.buildText("SUBACCTSEC", "OTHER")
-        if line.trntype != "TRANSFER":
-            self.buildText("SUBACCTFUND", "OTHER")
-
-        if line.fees:
-            if line.trntype == "INCOME":
-                self.buildAmount(
-                    "WITHHOLDING",
-                    line.fees,
-                    False,
-                    precision=self.invest_transactions_float_precision,
-                )
-            else:
-                self.buildAmount(
-                    "FEES",
-                    line.fees,
-                    False,
-                    precision=self.invest_transactions_float_precision,
-                )
+            if inner_tran_type_tag_name:
+                tb.start(inner_tran_type_tag_name, {})
 
-        self.buildAmount(
-            "UNITPRICE",
-            line.unit_price,
-            precision=self.invest_transactions_float_precision,
-        )
-        self.buildAmount(
-            "UNITS",
-            line.units,
-            precision=self.invest_transactions_float_precision,
-        )
+            tb.start("INVTRAN", {})
+            buildText("FITID", line.id)
+            buildDateTime("DTTRADE", line.date, False, True)
+            buildText("MEMO", line.memo)
+            tb.end("INVTRAN")
+
+            tb.start("SECID", {})
+            buildText("UNIQUEID", line.security_id, False)
+            buildText("UNIQUEIDTYPE", "TICKER")
+            tb.end("SECID")
 
-        self.buildAmount("TOTAL", line.amount)
+            buildText("SUBACCTSEC", "OTHER")
+            if has_subacctfund:
+                buildText("SUBACCTFUND", "OTHER")
 
-        if inner_tran_type_tag_name:
-            tb.end(inner_tran_type_tag_name)
-        tb.end(line.trntype)
+            # Precision may be changed after the emitter is compiled
+            precision = self.invest_transactions_float_precision
+            if line.fees:
+                buildAmount(fees_tag_name, line.fees, False, precision=precision)
+
+            buildAmount("UNITPRICE", line.unit_price, precision=precision)
+            buildAmount("UNITS", line.units, precision=precision)
+
+            buildAmount("TOTAL", line.amount)
+
+            if inner_tran_type_tag_name:
+                tb.end(inner_tran_type_tag_name)
+            tb.end(trntype)
+
+        return emit
+
+    def buildInvestBankTransaction(self, line: InvestStatementLine) -> None:
+        tb = self.tb
+        tb.start("INVBANKTRAN", {})
+
+        if type(self).buildBankTransaction is not OfxWriter.buildBankTransaction:
+            # Bank transactions are customised by the subclass
+            bankTran = StatementLine(line.id, line.date, line.memo, line.amount)
+            bankTran.trntype = line.trntype_detailed
+            self.buildBankTransaction(bankTran)
+        else:
+            # Same as buildBankTransaction() would produce for the
+            # StatementLine with the line's id, date, memo and amount
+            tb.start("STMTTRN", {})
+            self.buildText("TRNTYPE", line.trntype_detailed)
+            self.buildDateTime("DTPOSTED", line.date, omitEmptyTime=True)
+            self.buildAmount("TRNAMT", line.amount)
+            self.buildText("FITID", line.id)
+            self.buildText("MEMO", line.memo)
+            tb.end("STMTTRN")
+
+        self.buildText("SUBACCTFUND", "OTHER")
+        tb.end("INVBANKTRAN")
 
     def buildBankAccount(self, account: BankAccount) -> None:
         self.buildText("BANKID", account.bank_id)
@@ -347,16 +508,36 @@ class OfxWriter(object):
         if dt is None:
             self.buildText(tag, "", skipEmpty)
         else:
-            utc_offset = dt.utcoffset()
-
-            format = "%Y%m%d"
-            if dt.time() != time.min or utc_offset or not omitEmptyTime:
-                format += "%H%M%S"
-            if dt.microsecond or utc_offset:
-                format += f".{(dt.microsecond // 1000):03d}"
-            if utc_offset is not None:
-                format += f"[{utc_offset.total_seconds() / 3600}]"
-            self.buildText(tag, dt.strftime(format))
+            self.buildText(tag, self.formatDateTime(dt, omitEmptyTime))
+
+    def formatDateTime(self, dt: datetime, omitEmptyTime: bool = False) -> str:
+        # Statements usually have lots of transactions on the same dates, so
+        # formatted values are remembered. Aware datetimes in different
+        # timezones may compare equal, so tzinfo and fold are part of the key.
+        key = (dt, dt.tzinfo, dt.fold, omitEmptyTime)
+        formatted = self._dateCache.get(key)
+        if formatted is None:
+            if len(self._dateCache) >= self.date_cache_size:
+                self._dateCache.clear()
+            formatted = self._dateCache[key] = self._formatDateTime(dt, omitEmptyTime)
+        return formatted
+
+    def _formatDateTime(self, dt: datetime, omitEmptyTime: bool) -> str:
+        utc_offset = dt.utcoffset()
+
+        format = "%Y%m%d"
+        if dt.time() != time.min or utc_offset or not omitEmptyTime:
+            format += "%H%M%S"
+        if dt.microsecond or utc_offset:
+            format += f".{(dt.microsecond // 1000):03d}"
+        if utc_offset is not None:
+            tz = self._tzCache.get(utc_offset)
+            if tz is None:
+                tz = self._tzCache[utc_offset] = (
+                    f"[{utc_offset.total_seconds() / 3600}]"
+                )
+            format += tz
+        return dt.strftime(format)
 
     def buildAmount(
         self,
@@ -370,7 +551,12 @@ class OfxWriter(object):
         if amount is None:
             self.buildText(tag, "", skipEmpty)
         else:
-            if precision is None:
-                precision = self.default_float_precision
-
-            self.buildText(tag, "{0:.{precision}f}".format(amount, precision=precision))
+            self.buildText(tag, self.formatAmount(amount, precision))
+
+    def formatAmount(self, amount: Decimal, precision: Optional[int] = None) -> str:
+        if precision is None:
+            precision = self.default_float_precision
+        spec = self._amountSpecs.get(precision)
+        if spec is None:
+            spec = self._amountSpecs[precision] = f".{precision}f"
+        return format(amount, spec)
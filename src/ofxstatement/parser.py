@@ -1,13 +1,165 @@
-from typing import Dict, Optional, Any, Iterable, List, TextIO, TypeVar, Generic
+from typing import (
+    BinaryIO,
+    Callable,
+    Dict,
+    Optional,
+    Any,
+    Iterable,
+    Iterator,
+    List,
+    TextIO,
+    Tuple,
+    TypeVar,
+    Generic,
+)
 from abc import abstractmethod
 import csv
+import io
+import locale
+import os
+import pickle
+import re
 from decimal import Decimal, Decimal as D
 from datetime import datetime
+from functools import lru_cache
 
+from ofxstatement.exceptions import ParseError
+from ofxstatement.numberformat import NumberFormat
 from ofxstatement.statement import Statement, StatementLine
 
 LT = TypeVar("LT")
 
+FastDateParser = Callable[[str], Optional[datetime]]
+
+
+def compile_fast_date_parser(date_format: str) -> Optional[FastDateParser]:
+    """Return hand-written parser for the date format, if possible
+
+    Supported formats consist of zero-padded %d, %m and %Y directives with
+    literal separators, like "%Y-%m-%d", "%d.%m.%Y" or "%m/%d/%Y". The
+    returned function gives None for values it cannot handle, so they can be
+    passed to strptime() instead.
+    """
+    parts = re.split("(%[dmY])", date_format)
+    if sorted(parts[1::2]) != ["%Y", "%d", "%m"] or "%" in "".join(parts[::2]):
+        return None
+
+    slices = {}
+    literals = []
+    pos = 0
+    for n, part in enumerate(parts):
+        if n % 2:
+            width = 4 if part == "%Y" else 2
+            slices[part] = slice(pos, pos + width)
+            pos += width
+        else:
+            literals.append((pos, part))
+            pos += len(part)
+    length = pos
+    year, month, day = slices["%Y"], slices["%m"], slices["%d"]
+    separators = [(p, lit) for p, lit in literals if lit]
+
+    def parse(value: str) -> Optional[datetime]:
+        if len(value) != length or not value.isascii():
+            return None
+        for p, lit in separators:
+            if not value.startswith(lit, p):
+                return None
+        y, m, d = value[year], value[month], value[day]
+        if not (y + m + d).isdigit():
+            return None
+        try:
+            return datetime(int(y), int(m), int(d))
+        except ValueError:
+            return None
+
+    return parse
+
+
+# Fast date parsers by date format, None for unsupported formats
+_fast_date_parsers: Dict[str, Optional[FastDateParser]] = {}
+
+
+def find_record_boundaries(
+    fin: BinaryIO, chunk_size: int, quotechar: bytes = b'"', block_size: int = 2**20
+) -> List[int]:
+    """Return offsets, splitting csv input into chunks of whole records
+
+    Chunks are at least chunk_size bytes long (except the last one) and end
+    with a newline, that is not a part of quoted value. The first offset is
+    always 0.
+    """
+    boundaries = [0]
+    offset = 0  # offset of the block start
+    quoted = False  # whether the scanned part ends inside quoted value
+    target = chunk_size  # look for the next boundary from here
+    while True:
+        block = fin.read(block_size)
+        if not block:
+            break
+        pos = 0  # quotes are counted up to this position in the block
+        while offset + len(block) > target:
+            skip = max(pos, target - offset)
+            quoted ^= block.count(quotechar, pos, skip) % 2 == 1
+            pos = skip
+            found = False
+            while not found:
+                newline = block.find(b"\n", pos)
+                if newline == -1:
+                    break
+                quoted ^= block.count(quotechar, pos, newline) % 2 == 1
+                pos = newline + 1
+                found = not quoted
+            if not found:
+                # continue with the next block
+                break
+            boundaries.append(offset + pos)
+            target = offset + pos + chunk_size
+        quoted ^= block.count(quotechar, pos) % 2 == 1
+        offset += len(block)
+    return boundaries
+
+
+# Parser attributes, that are not copied to parse_parallel() workers
+_WORKER_EXCLUDED = {
+    "fin",
+    "_cached_parse_datetime",
+    "_compiled_mappings",
+    "_converters",
+    "_min_columns",
+}
+
+
+def _parse_chunk(
+    pickled: bytes,
+    filename: str,
+    encoding: str,
+    errors: Optional[str],
+    newline: Optional[str],
+    start: int,
+    end: int,
+) -> Tuple[List[StatementLine], int, Optional[Tuple[int, str]]]:
+    """Parse records between given offsets in a worker process
+
+    Pickled is the parser type and its attributes. Return parsed lines,
+    number of records and the (lineno, message) of ParseError, if any.
+    """
+    parser_type, state = pickle.loads(pickled)
+    parser = parser_type.__new__(parser_type)
+    parser.__dict__.update(state)
+    with open(filename, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    parser.fin = io.TextIOWrapper(
+        io.BytesIO(data), encoding=encoding, errors=errors, newline=newline
+    )
+    parser.cur_record = 0
+    try:
+        lines = list(parser.iter_lines(update_header=False))
+    except ParseError as e:
+        return [], parser.cur_record, (e.lineno, e.message)
+    return lines, parser.cur_record, None
+
 
 class AbstractStatementParser:
     @abstractmethod
@@ -24,8 +176,19 @@ class StatementParser(AbstractStatementParser, Generic[LT]):
     statement: Statement
 
     date_format: str = "%Y-%m-%d"
+    # Number of distinct date strings parse_datetime() remembers, 0 disables
+    # the cache
+    date_cache_size: int = 1024
+    # Parse common date formats without strptime(), see
+    # compile_fast_date_parser()
+    fast_date_parsing: bool = True
+    # Format of amounts in the statement. When not set, parse_decimal()
+    # accepts both "." and "," as decimal mark.
+    number_format: Optional[NumberFormat] = None
     cur_record: int = 0
 
+    _cached_parse_datetime: Optional[Callable[[str, str], datetime]] = None
+
     def __init__(self) -> None:
         self.statement = Statement()
 
@@ -34,10 +197,31 @@ class StatementParser(AbstractStatementParser, Generic[LT]):
 
         Return Statement object
 
+        May raise exceptions.ParseException on malformed input.
+        """
+        for stmt_line in self.iter_lines(update_header=False):
+            self.statement.lines.append(stmt_line)
+        return self.statement
+
+    def iter_lines(self, update_header: bool = True) -> Iterator[StatementLine]:
+        """Read and parse statement lazily
+
+        Yield validated StatementLine objects one by one, without adding them
+        to the statement, so statements of any size can be processed in
+        constant memory.
+
+        When all the lines are consumed and update_header is set, missing
+        statement start and end dates are set from the line dates, and
+        missing end balance is calculated from the start balance.
+
         May raise exceptions.ParseException on malformed input.
         """
         assert hasattr(self, "statement"), "StatementParser.__init__() not called"
 
+        total_amount = D(0)
+        min_date: Optional[datetime] = None
+        max_date: Optional[datetime] = None
+
         reader = self.split_records()
         for line in reader:
             self.cur_record += 1
@@ -46,8 +230,24 @@ class StatementParser(AbstractStatementParser, Generic[LT]):
             stmt_line = self.parse_record(line)
             if stmt_line:
                 stmt_line.assert_valid()
-                self.statement.lines.append(stmt_line)
-        return self.statement
+                if update_header:
+                    if stmt_line.amount is not None:
+                        total_amount += stmt_line.amount
+                    if stmt_line.date is not None:
+                        if min_date is None or stmt_line.date < min_date:
+                            min_date = stmt_line.date
+                        if max_date is None or stmt_line.date > max_date:
+                            max_date = stmt_line.date
+                yield stmt_line
+
+        if update_header:
+            statement = self.statement
+            if statement.start_date is None:
+                statement.start_date = min_date
+            if statement.end_date is None:
+                statement.end_date = max_date
+            if statement.end_balance is None and statement.start_balance is not None:
+                statement.end_balance = statement.start_balance + total_amount
 
     def split_records(self) -> Iterable[LT]:  # pragma: no cover
         """Return iterable object consisting of a line per transaction"""
@@ -69,14 +269,52 @@ class StatementParser(AbstractStatementParser, Generic[LT]):
         else:
             return value
 
+    def get_value_converter(self, field: str) -> Optional[Callable[[str], Any]]:
+        """Return function, converting raw values of given StatementLine field
+
+        Does the same as parse_value() for the field, but resolves the field
+        type only once. Returns None if values should be used as is.
+        """
+        if type(self).parse_value is not StatementParser.parse_value:
+            # Overridden parse_value() has to be called for every value
+            return lambda value: self.parse_value(value, field)
+
+        tp = StatementLine.__annotations__.get(field)
+        if tp in (datetime, Optional[datetime]):
+            return self.parse_datetime
+        elif tp in (Decimal, Optional[Decimal]):
+            return self.parse_decimal
+        else:
+            return None
+
     def parse_datetime(self, value: str) -> datetime:
-        return datetime.strptime(value, self.date_format)
+        if not self.date_cache_size:
+            return self._parse_datetime(value, self.date_format)
+
+        if self._cached_parse_datetime is None:
+            self._cached_parse_datetime = lru_cache(self.date_cache_size)(
+                self._parse_datetime
+            )
+        return self._cached_parse_datetime(value, self.date_format)
+
+    def _parse_datetime(self, value: str, date_format: str) -> datetime:
+        if self.fast_date_parsing:
+            if date_format not in _fast_date_parsers:
+                _fast_date_parsers[date_format] = compile_fast_date_parser(date_format)
+            fast_parser = _fast_date_parsers[date_format]
+            if fast_parser is not None:
+                dt = fast_parser(value)
+                if dt is not None:
+                    return dt
+        return datetime.strptime(value, date_format)
 
     def parse_float(self, value: str) -> D:  # pragma: no cover
         # compatibility wrapper for old plugins
         return self.parse_decimal(value)
 
     def parse_decimal(self, value: str) -> D:
+        if self.number_format is not None:
+            return self.number_format.parse(value)
         # some plugins pass localised numbers, clean them up
         return D(value.replace(",", ".").replace(" ", ""))
 
@@ -89,6 +327,11 @@ class CsvStatementParser(StatementParser[List[str]]):
     # 0-based csv column mapping to StatementLine field
     mappings: Dict[str, int] = {}
 
+    # copy of mappings compiled into (column, converter, field) tuples
+    _compiled_mappings: Optional[Dict[str, int]] = None
+    _converters: List[Tuple[int, Optional[Callable[[str], Any]], str]] = []
+    _min_columns = 0
+
     def __init__(self, fin: TextIO) -> None:
         super().__init__()
         self.fin = fin
@@ -96,14 +339,118 @@ class CsvStatementParser(StatementParser[List[str]]):
     def split_records(self) -> Iterable[List[str]]:
         return csv.reader(self.fin)
 
+    def parse_parallel(
+        self,
+        workers: Optional[int] = None,
+        chunk_size: int = 64 * 2**20,
+        newline: Optional[str] = None,
+    ) -> Statement:
+        """Read and parse statement using a pool of worker processes
+
+        The input file is split into chunks of about chunk_size bytes at
+        record boundaries and every chunk is parsed with split_records() and
+        parse_record() in a separate process. Lines are added to the
+        statement in the original order.
+
+        Parser is copied to the workers, so split_records() and
+        parse_record() have to produce the same result for each record
+        regardless of the chunk it is in (e.g. header rows should be
+        recognised by content, not by cur_record), and changes they make to
+        the parser or statement are lost. Input must be a file in ASCII
+        compatible encoding, quoted with double quotes, and the parser must
+        be picklable; otherwise parse() is used.
+
+        Workers decode the chunks with encoding and errors of the input
+        file. Newline is the mode the file was opened with, which text files
+        don't expose, e.g. "" for csv files opened as csv module recommends.
+        """
+        filename = getattr(self.fin, "name", None)
+        if not isinstance(filename, str) or not os.path.isfile(filename):
+            return self.parse()
+        encoding = getattr(self.fin, "encoding", None)
+        if encoding is None:
+            encoding = locale.getpreferredencoding(False)
+        if not '"\n'.encode(encoding).endswith(b'"\n'):
+            return self.parse()
+
+        with open(filename, "rb") as f:
+            boundaries = find_record_boundaries(f, chunk_size)
+        boundaries.append(os.path.getsize(filename))
+        chunks = [(s, e) for s, e in zip(boundaries, boundaries[1:]) if s < e]
+        if len(chunks) < 2:
+            return self.parse()
+
+        # Caches are rebuilt in the workers, as they may hold unpicklable
+        # callables. Failure to pickle the rest is detected here, as the
+        # pool would hang when pickling the tasks fails.
+        state = {
+            name: value
+            for name, value in self.__dict__.items()
+            if name not in _WORKER_EXCLUDED
+        }
+        try:
+            pickled = pickle.dumps((type(self), state))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return self.parse()
+        errors = getattr(self.fin, "errors", None)
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        pool = ProcessPoolExecutor(workers)
+        try:
+            futures = [
+                pool.submit(
+                    _parse_chunk,
+                    pickled,
+                    filename,
+                    encoding,
+                    errors,
+                    newline,
+                    start,
+                    end,
+                )
+                for start, end in chunks
+            ]
+            for future in futures:
+                lines, records, error = future.result()
+                if error is not None:
+                    lineno, message = error
+                    raise ParseError(self.cur_record + lineno, message)
+                self.cur_record += records
+                self.statement.lines.extend(lines)
+        finally:
+            pool.shutdown(cancel_futures=True)
+        return self.statement
+
+    def compile_mappings(self) -> None:
+        """Prepare value converters for the columns in mappings
+
+        Called automatically when the first record is parsed and whenever
+        mappings change, either replaced with another dict or modified in
+        place.
+        """
+        self._compiled_mappings = dict(self.mappings)
+        self._converters = [
+            (col, self.get_value_converter(field), field)
+            for field, col in self.mappings.items()
+        ]
+        self._min_columns = max(self.mappings.values(), default=-1) + 1
+
     def parse_record(self, line: List[str]) -> Optional[StatementLine]:
+        # Comparing a few items is much cheaper than compiling the converters
+        if self._compiled_mappings != self.mappings:
+            self.compile_mappings()
+
+        if len(line) < self._min_columns:
+            col = next(col for col in self.mappings.values() if col >= len(line))
+            raise ValueError(
+                "Cannot find column %s in line of %s items " % (col, len(line))
+            )
+
         stmt_line = StatementLine()
-        for field, col in self.mappings.items():
-            if col >= len(line):
-                raise ValueError(
-                    "Cannot find column %s in line of %s items " % (col, len(line))
-                )
-            rawvalue = line[col]
-            value = self.parse_value(rawvalue, field)
+        for col, convert, field in self._converters:
+            value = line[col]
+            if convert is not None and value is not None:
+                value = convert(value)
             setattr(stmt_line, field, value)
         return stmt_line
@@ -3,20 +3,38 @@
 Plugins are objects that configures and coordinates conversion machinery.
 """
 
-from typing import List, Tuple, Type
+from typing import Any, Dict, List, Optional, Tuple, Type
 from collections.abc import MutableMapping
+import json
+import os
 import sys
+import tempfile
 
 if sys.version_info < (3, 10):
-    from importlib_metadata import entry_points
+    from importlib_metadata import EntryPoint, entry_points
 else:
-    from importlib.metadata import entry_points
+    from importlib.metadata import EntryPoint, entry_points
 
+import platformdirs
+
+from ofxstatement.configuration import APP_NAME, APP_AUTHOR
 from ofxstatement.ui import UI
 from ofxstatement.parser import AbstractStatementParser
 
+ENTRY_POINT_GROUP = "ofxstatement"
+
 
 def get_plugin(name: str, ui: UI, settings: MutableMapping) -> "Plugin":
+    entry = load_registry().get(name)
+    if entry is not None and len(entry["values"]) == 1:
+        try:
+            plugin = _load(name, entry["values"][0])
+        except ImportError:
+            # Registry is stale, look the plugin up again
+            pass
+        else:
+            return plugin(ui, settings)
+
     plugins = entry_points(name=name)
     if not plugins:
         raise PluginNotRegistered(name)
@@ -26,15 +44,118 @@ def get_plugin(name: str, ui: UI, settings: MutableMapping) -> "Plugin":
     return plugin(ui, settings)
 
 
+def get_plugin_version(name: str) -> Optional[str]:
+    """Return version of the distribution, providing the plugin
+
+    Plugin is not loaded. Return None if plugin or its distribution is not
+    found.
+    """
+    entry = load_registry().get(name)
+    if entry is None:
+        return None
+    return entry["version"]
+
+
 def list_plugins() -> List[Tuple[str, Type["Plugin"]]]:
     """Return list of all plugin classes registered as a list of tuples:
 
     [(name, plugin_class)]
     """
-    plugin_eps = entry_points(group="ofxstatement")
+    plugin_eps = entry_points(group=ENTRY_POINT_GROUP)
     return sorted((ep.name, ep.load()) for ep in plugin_eps)
 
 
+def list_plugin_titles() -> List[Tuple[str, str]]:
+    """Return list of all plugin names with the first lines of their docs
+
+    Titles are remembered in the plugin registry, so plugins are only
+    imported the first time they are listed.
+    """
+    registry = load_registry()
+    missing = [name for name, entry in registry.items() if entry["title"] is None]
+    for name in missing:
+        plclass = _load(name, registry[name]["values"][0])
+        doc = plclass.__doc__
+        registry[name]["title"] = doc.splitlines()[0] if doc else ""
+    if missing:
+        _save_registry(registry)
+    return sorted((name, entry["title"]) for name, entry in registry.items())
+
+
+def get_registry_location() -> str:
+    cdir = platformdirs.user_cache_dir(APP_NAME, APP_AUTHOR)
+    return os.path.join(cdir, "plugins.json")
+
+
+def load_registry() -> Dict[str, Dict[str, Any]]:
+    """Return registered plugins from the registry cache
+
+    The result maps plugin names to dicts with entry point "values"
+    ("module:attr" strings, more than one on conflict), distribution
+    "version" and doc "title" (None until the plugin is listed).
+
+    Registry is rebuilt from the installed distributions metadata when any
+    directory on sys.path is modified, e.g. when packages are installed or
+    removed.
+    """
+    stamp = _get_path_stamp()
+    try:
+        with open(get_registry_location()) as f:
+            data = json.load(f)
+        if data["stamp"] == stamp:
+            return data["plugins"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    registry: Dict[str, Dict[str, Any]] = {}
+    for ep in entry_points(group=ENTRY_POINT_GROUP):
+        entry = registry.setdefault(
+            ep.name, {"values": [], "version": None, "title": None}
+        )
+        entry["values"].append(ep.value)
+        dist = getattr(ep, "dist", None)
+        if dist is not None:
+            entry["version"] = dist.version
+    _save_registry(registry, stamp)
+    return registry
+
+
+def _save_registry(
+    registry: Dict[str, Dict[str, Any]], stamp: Optional[List[Any]] = None
+) -> None:
+    location = get_registry_location()
+    cdir = os.path.dirname(location)
+    try:
+        os.makedirs(cdir, mode=0o700, exist_ok=True)
+        fd, tmpname = tempfile.mkstemp(dir=cdir, suffix=".tmp")
+    except OSError:
+        # Registry is just a cache, so it is fine to rebuild it next time
+        return
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"stamp": stamp or _get_path_stamp(), "plugins": registry}, f)
+        os.replace(tmpname, location)
+    except OSError:
+        os.remove(tmpname)
+
+
+def _get_path_stamp() -> List[Any]:
+    stamp: List[Any] = []
+    for path in sys.path:
+        if not path:
+            # Current directory changes too often to be taken into account
+            continue
+        try:
+            stamp.append([path, os.stat(path).st_mtime_ns])
+        except OSError:
+            stamp.append([path, None])
+    return stamp
+
+
+def _load(name: str, value: str) -> Type["Plugin"]:
+    return EntryPoint(name=name, value=value, group=ENTRY_POINT_GROUP).load()
+
+
 class PluginNotRegistered(Exception):
     """Raised on attempt to get plugin, missing from the registry."""
 
@@ -0,0 +1,172 @@
+"""Profiling of conversion stages
+
+StageProfiler is a Converter observer, that runs every stage of conversion
+under its own cProfile profiler, so time spent loading the plugin, parsing,
+validating and writing the statement can be told apart. MemoryTracker does
+the same for memory, allocated by the stages, using tracemalloc.
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+import contextlib
+import cProfile
+import os
+import pstats
+import tracemalloc
+
+from ofxstatement.exceptions import ConvertError
+
+# Exit status of conversions, stopped by MemoryTracker
+MEMORY_EXCEEDED = 3
+
+SIZE_UNITS = {"": 1, "K": 2**10, "M": 2**20, "G": 2**30}
+
+
+class StageProfiler:
+    def __init__(self) -> None:
+        self.profiles: Dict[str, cProfile.Profile] = {}
+
+    def stage(self, name: str) -> cProfile.Profile:
+        # Profile is a context manager, enabling it for the block
+        profile = self.profiles.get(name)
+        if profile is None:
+            profile = self.profiles[name] = cProfile.Profile()
+        return profile
+
+    def get_stats(self, name: str) -> pstats.Stats:
+        return pstats.Stats(self.profiles[name])
+
+    def dump(self, filename: str, per_stage: bool = False) -> List[str]:
+        """Save stats of all stages to the file, loadable by pstats
+
+        With per_stage, stats of every stage are saved to separate files,
+        named by inserting the stage name before the file extension, e.g.
+        "out.parse.prof". Return names of written files.
+        """
+        if not self.profiles:
+            return []
+        if not per_stage:
+            pstats.Stats(*self.profiles.values()).dump_stats(filename)
+            return [filename]
+
+        base, ext = os.path.splitext(filename)
+        filenames = []
+        for name in self.profiles:
+            stagefname = "%s.%s%s" % (base, name, ext)
+            self.get_stats(name).dump_stats(stagefname)
+            filenames.append(stagefname)
+        return filenames
+
+    def print_summary(self, out: TextIO, limit: int = 10) -> None:
+        """Print time of every stage and its most expensive functions"""
+        print(
+            "Conversion profile (cumulative time, own time, calls, function):",
+            file=out,
+        )
+        for name in self.profiles:
+            profile = self.get_stats(name).get_stats_profile()
+            print("%s: %.3fs" % (name, profile.total_tt), file=out)
+            functions = profile.func_profiles.items()
+            top = sorted(functions, key=lambda item: item[1].cumtime, reverse=True)
+            for func, fp in top[:limit]:
+                if fp.file_name != "~":
+                    func = "%s:%d(%s)" % (
+                        os.path.basename(fp.file_name),
+                        fp.line_number,
+                        func,
+                    )
+                print(
+                    "  %9.3fs %9.3fs %9s  %s"
+                    % (fp.cumtime, fp.tottime, fp.ncalls, func),
+                    file=out,
+                )
+
+
+class MemoryTracker:
+    """Tracks peak memory, allocated by Python during every stage
+
+    Memory is traced while the tracker is used as a context manager. When
+    the budget (in bytes) is exceeded, conversion is stopped with
+    ConvertError. Budget is checked when every stage ends, so a stage is
+    never stopped half way. Writing is checked after every chunk of the
+    output, and the partially written output is removed by the converter.
+    """
+
+    def __init__(self, budget: Optional[int] = None, frames: int = 1) -> None:
+        self.budget = budget
+        self.frames = frames
+        self.peaks: Dict[str, int] = {}
+        self.snapshot: Optional[tracemalloc.Snapshot] = None
+        self.snapshot_stage: Optional[str] = None
+        self.exceeded: Optional[str] = None
+        self._snapshot_size = 0
+
+    def __enter__(self) -> "MemoryTracker":
+        tracemalloc.start(self.frames)
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            self.peaks[name] = max(self.peaks.get(name, 0), peak)
+            # Snapshots are expensive, so they are only taken when memory in
+            # use grows noticeably
+            if self.snapshot is None or current > self._snapshot_size * 1.1:
+                self.snapshot = tracemalloc.take_snapshot()
+                self.snapshot_stage = name
+                self._snapshot_size = current
+        # Only the first stage, exceeding the budget, stops conversion
+        if self.budget and peak > self.budget and self.exceeded is None:
+            self.exceeded = name
+            raise self.get_error()
+
+    def get_error(self) -> ConvertError:
+        assert self.budget is not None
+        return ConvertError(
+            MEMORY_EXCEEDED,
+            "Memory budget of %s exceeded in %s stage"
+            % (format_size(self.budget), self.exceeded),
+        )
+
+    def print_summary(self, out: TextIO, limit: int = 10) -> None:
+        """Print peak memory of every stage and top allocation sites"""
+        print("Conversion memory (peak traced memory by stage):", file=out)
+        for name, peak in self.peaks.items():
+            print("%s: %s" % (name, format_size(peak)), file=out)
+        if self.snapshot is None:
+            return
+        print(
+            "Top allocation sites of memory in use after %s stage (size, blocks):"
+            % self.snapshot_stage,
+            file=out,
+        )
+        for stat in self.snapshot.statistics("lineno")[:limit]:
+            frame = stat.traceback[0]
+            print(
+                "  %10s %9d  %s:%d"
+                % (format_size(stat.size), stat.count, frame.filename, frame.lineno),
+                file=out,
+            )
+
+
+def parse_size(size: str) -> int:
+    """Parse number of bytes with optional K, M or G suffix, like 512M"""
+    size = size.strip().upper()
+    unit = size[-1:] if size[-1:] in SIZE_UNITS else ""
+    try:
+        number = float(size[: len(size) - len(unit)])
+    except ValueError:
+        raise ValueError("Invalid size: %s" % size)
+    return int(number * SIZE_UNITS[unit])
+
+
+def format_size(size: int) -> str:
+    if size < 2**20:
+        return "%.1f KiB" % (size / 2**10)
+    return "%.1f MiB" % (size / 2**20)
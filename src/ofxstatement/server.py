@@ -0,0 +1,314 @@
+"""Conversion server
+
+`ofxstatement serve` keeps configuration and plugins loaded and converts
+statements, posted over HTTP on a localhost port or a Unix domain socket:
+
+    POST /convert?type=<type>[&pretty=1][&only_new=1][&path=<input file>]
+        [&filename=<input file name>]
+
+Input is either a file on the server machine, given by `path` parameter, or
+the request body of at most `max_body_size` bytes. The body is converted from
+a temporary file with the extension of `filename`, if given. Converted OFX document is returned with "200 OK" status.
+Failed conversions are reported as JSON object with "code", which is the
+exit status of `ofxstatement convert`, and the error "messages".
+
+Any local user can connect to the TCP port, so `path` and `only_new`, which
+read files and update transaction store of the server owner, are only
+accepted over TCP when allowed explicitly. Requests from web pages (with
+Origin header) and to other host names (DNS rebinding) are rejected.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+import io
+import errno
+import json
+import logging
+import os
+import re
+import socket
+import socketserver
+import stat
+import tempfile
+
+from ofxstatement.conversion import Converter
+from ofxstatement.exceptions import ConvertError
+
+log = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# HTTP status of failed conversions by ConvertError code
+ERROR_STATUS = {1: HTTPStatus.BAD_REQUEST, 2: HTTPStatus.UNPROCESSABLE_ENTITY}
+
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "[::1]"}
+
+
+class ConvertHandler(BaseHTTPRequestHandler):
+    server: Union["HTTPConvertServer", "UnixConvertServer"]
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        if url.path != "/convert":
+            self.send_json(HTTPStatus.NOT_FOUND, {"code": 1, "messages": ["Not found"]})
+            return
+
+        if not self.server.is_allowed(self.headers):
+            self.send_json(HTTPStatus.FORBIDDEN, {"code": 1, "messages": ["Forbidden"]})
+            return
+
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        value = (self.headers.get("Content-Length") or "0").strip()
+        if not (value.isascii() and value.isdigit()):
+            self.close_connection = True
+            self.send_json(
+                HTTPStatus.BAD_REQUEST,
+                {"code": 1, "messages": ["Invalid Content-Length"]},
+            )
+            return
+        length = int(value)
+        if length > self.server.max_body_size:
+            # Body is not read, so the connection can't be reused
+            self.close_connection = True
+            self.send_json(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                {
+                    "code": 1,
+                    "messages": [
+                        "Request body is larger than %d bytes"
+                        % self.server.max_body_size
+                    ],
+                },
+            )
+            return
+        body = self.rfile.read(length)
+
+        status, content, meta = self.server.convert(params, body)
+        if status != HTTPStatus.OK:
+            self.send_json(status, meta)
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/x-ofx")
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("X-Ofxstatement-Lines", str(meta["lines"]))
+        self.send_header("X-Ofxstatement-Invest-Lines", str(meta["invest_lines"]))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_json(self, status: int, data: Dict[str, Any]) -> None:
+        content = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def address_string(self) -> str:
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return "unix"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        log.debug(format % args)
+
+
+class ConvertServerMixIn:
+    """Server, handling requests with a fixed number of worker threads
+
+    All workers share the converter, so configuration is read and every
+    plugin is loaded only once. Unless files are allowed, clients may only
+    convert posted statements.
+    """
+
+    converter: Converter
+    allow_files = True
+    # Largest accepted request body, in bytes
+    max_body_size = 256 * 2**20
+    # Not set, if the server fails to bind
+    executor: Optional[ThreadPoolExecutor] = None
+
+    def setup_workers(self, converter: Converter, workers: Optional[int]) -> None:
+        self.converter = converter
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="convert")
+
+    def is_allowed(self, headers: Any) -> bool:
+        """Return whether request with the headers may be handled"""
+        if "Origin" in headers:
+            # Browsers send simple cross-origin requests without preflight
+            return False
+        host = headers.get("Host")
+        if host is None:
+            return True
+        # Other host names might resolve to this server (DNS rebinding)
+        if not host.endswith("]"):
+            host = host.rsplit(":", 1)[0]
+        address = self.server_address  # type: ignore
+        hosts = (
+            LOCAL_HOSTS | {address[0]} if isinstance(address, tuple) else LOCAL_HOSTS
+        )
+        return host.lower() in hosts
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        assert self.executor is not None
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request: Any, client_address: Any) -> None:
+        try:
+            self.finish_request(request, client_address)  # type: ignore
+        except Exception:
+            self.handle_error(request, client_address)  # type: ignore
+        finally:
+            self.shutdown_request(request)  # type: ignore
+
+    def server_close(self) -> None:
+        super().server_close()  # type: ignore
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    def convert(
+        self, params: Dict[str, str], body: bytes
+    ) -> Tuple[int, bytes, Dict[str, Any]]:
+        """Convert posted statement, return HTTP status, content and metadata"""
+        type = params.get("type")
+        if not type:
+            return error(1, "Specify input 'type' parameter")
+        pretty = params.get("pretty", "") not in ("", "0")
+        only_new = params.get("only_new", "") not in ("", "0")
+        if (only_new or "path" in params) and not self.allow_files:
+            return error(
+                1,
+                "Parameters 'path' and 'only_new' are not allowed",
+                status=HTTPStatus.FORBIDDEN,
+            )
+
+        tmpname = None
+        input = params.get("path")
+        if input is None:
+            # Parsers may check extension of the input file
+            ext = os.path.splitext(params.get("filename", ""))[1]
+            if not re.fullmatch(r"\.\w{1,16}", ext):
+                ext = ".statement"
+            fd, tmpname = tempfile.mkstemp(suffix=ext)
+            with os.fdopen(fd, "wb") as f:
+                f.write(body)
+            input = tmpname
+
+        output = io.StringIO()
+        try:
+            result = self.converter.convert(
+                type, input, output, pretty=pretty, only_new=only_new
+            )
+        except ConvertError as e:
+            return error(e.code, *e.messages)
+        except Exception as e:
+            # Plugin failure, that would abort the command line tool
+            log.exception("Error converting %s" % input)
+            return error(
+                1,
+                "%s: %s" % (e.__class__.__name__, e),
+                status=HTTPStatus.INTERNAL_SERVER_ERROR,
+            )
+        finally:
+            if tmpname is not None:
+                os.remove(tmpname)
+
+        _, settings = self.converter.get_settings(type)
+        content = output.getvalue().encode(settings.get("encoding", "utf-8"))
+        meta = {"lines": result.lines, "invest_lines": result.invest_lines}
+        return HTTPStatus.OK, content, meta
+
+
+class HTTPConvertServer(ConvertServerMixIn, HTTPServer):
+    pass
+
+
+if hasattr(socket, "AF_UNIX"):
+
+    class UnixConvertServer(ConvertServerMixIn, socketserver.UnixStreamServer):
+        def __init__(self, socket_path: str, handler: Any) -> None:
+            self.socket_path = socket_path
+            self.bound = False
+            super().__init__(socket_path, handler)
+
+        def server_bind(self) -> None:
+            try:
+                mode = os.lstat(self.socket_path).st_mode
+            except FileNotFoundError:
+                pass
+            else:
+                if not stat.S_ISSOCK(mode):
+                    raise FileExistsError(
+                        errno.EEXIST, "Not a socket", self.socket_path
+                    )
+                # Socket, left by previous server
+                os.remove(self.socket_path)
+            # Only the owner may convert files via the socket, so it is
+            # created with restrictive permissions right away
+            umask = os.umask(0o177)
+            try:
+                super().server_bind()
+            finally:
+                os.umask(umask)
+            self.bound = True
+
+        def server_close(self) -> None:
+            super().server_close()
+            if self.bound and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+def error(
+    code: int, *messages: str, status: Optional[int] = None
+) -> Tuple[int, bytes, Dict[str, Any]]:
+    if status is None:
+        status = ERROR_STATUS[code]
+    return status, b"", {"code": code, "messages": list(messages)}
+
+
+def make_server(
+    converter: Converter,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    socket_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    allow_files: bool = False,
+) -> Union[HTTPConvertServer, "UnixConvertServer"]:
+    """Create server, listening on a Unix socket if path is given
+
+    Otherwise server listens to the TCP port on the host, which should be a
+    local address. Clients of the TCP port may only convert files on the
+    server machine and only new transactions, if files are allowed.
+    Unix socket is only accessible by the owner, so files are always allowed
+    there.
+    """
+    server: Union[HTTPConvertServer, "UnixConvertServer"]
+    if socket_path is not None:
+        server = UnixConvertServer(socket_path, ConvertHandler)
+    else:
+        server = HTTPConvertServer((host, port), ConvertHandler)
+        server.allow_files = allow_files
+    server.setup_workers(converter, workers)
+    return server
+
+
+def serve(
+    converter: Converter,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    socket_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    allow_files: bool = False,
+) -> None:
+    """Serve conversion requests until interrupted"""
+    server = make_server(converter, host, port, socket_path, workers, allow_files)
+    address: List[Any] = [socket_path] if socket_path else [host, port]
+    log.info("Serving on %s" % ":".join(str(a) for a in address))
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            log.info("Interrupted, shutting down")
@@ -1,10 +1,23 @@
 """Statement model"""
 
-from typing import List, Optional
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    SupportsIndex,
+    Tuple,
+    Type,
+)
 from datetime import datetime
 from decimal import Decimal as D
-from hashlib import sha1
+from functools import partial
+from hashlib import blake2b, sha1
 from pprint import pformat
+from types import CellType, FunctionType
 from math import isclose
 
 from ofxstatement import exceptions
@@ -78,9 +91,20 @@ ACCOUNT_TYPE = [
 # Inspired by "How to print instances of a class using print()?"
 # on stackoverflow.com
 class Printable:
+    __slots__: Tuple[str, ...] = ()
+
     def __repr__(self) -> str:  # pragma: no cover
+        if hasattr(self, "__dict__"):
+            fields = vars(self)
+        else:
+            fields = {
+                name: getattr(self, name)
+                for klass in reversed(type(self).__mro__)
+                for name in vars(klass).get("__slots__", ())
+                if hasattr(self, name)
+            }
         # do not set width to 1 because that makes the output really ugly
-        return "<" + type(self).__name__ + "> " + pformat(vars(self), indent=4)
+        return "<" + type(self).__name__ + "> " + pformat(fields, indent=4)
 
 
 class Statement(Printable):
@@ -121,9 +145,7 @@ class Statement(Printable):
 
     def assert_valid(self) -> None:  # pragma: no cover
         if not (self.start_balance is None or self.end_balance is None):
-            total_amount = sum(
-                [sl.amount for sl in self.lines if sl.amount is not None], D(0)
-            )
+            total_amount = _total_amount(self.lines)
 
             msg = (
                 "Start balance ({0}) plus the total amount ({1}) "
@@ -434,6 +456,133 @@ class BankAccount(Printable):
         )
 
 
+def make_compact(cls: Type[Printable]) -> Type[Any]:
+    """Return memory-compact version of the statement record class.
+
+    Instances of the returned class keep annotated fields in slots instead of
+    per-instance dictionary, which takes less memory for statements with
+    lots of lines. Class-level field defaults are kept, all the methods of
+    the original class are preserved. Fields that are not annotated in the
+    original class cannot be set.
+
+    The returned class is not a subclass of the original one, as instances
+    of subclasses would still get the dictionary: isinstance() checks against
+    the original class fail for compact instances. Instead, base classes of
+    the original are made compact as well, so methods, calling `super()`,
+    work the same way, and compact version of a plugin specific subclass of
+    `StatementLine` is a subclass of `CompactStatementLine`.
+    """
+    compact = _compact_classes.get(cls)
+    if compact is not None:
+        return compact
+    if cls in Printable.__mro__:
+        return cls
+
+    bases: Tuple[type, ...] = tuple(make_compact(base) for base in cls.__bases__)
+    namespace = dict(vars(cls))
+    annotations = namespace.get("__annotations__", {})
+    for name in ("__dict__", "__weakref__", "__slots__"):
+        namespace.pop(name, None)
+    inherited: Set[str] = set()
+    for base in bases:
+        for klass in base.__mro__:
+            inherited.update(vars(klass).get("__slots__", ()))
+    # Defaults of fields, including the inherited ones, can't be kept in
+    # class attributes, that would conflict with the slots
+    defaults = {
+        name: namespace.pop(name)
+        for name in list(annotations) + sorted(inherited)
+        if name in namespace
+    }
+
+    cname = "Compact" + cls.__name__
+    namespace.update(
+        __slots__=tuple(field for field in annotations if field not in inherited),
+        __qualname__=cname,
+    )
+    compact = type(cname, bases, namespace)
+    for name, default in defaults.items():
+        member = next(vars(k)[name] for k in compact.__mro__ if name in vars(k))
+        if isinstance(member, _SlotDefault):
+            member = member.member
+        setattr(compact, name, _SlotDefault(member, default))
+
+    # Zero-argument super() refers to the original class in a closure cell
+    for attr, value in vars(cls).items():
+        if isinstance(value, property):
+            funcs = [value.fget, value.fset, value.fdel]
+            if any(_uses_class_cell(func) for func in funcs):
+                fget, fset, fdel = [_rebind_class_cell(f, compact) for f in funcs]
+                setattr(compact, attr, property(fget, fset, fdel, value.__doc__))
+            continue
+        func = getattr(value, "__func__", value)
+        if _uses_class_cell(func):
+            rebound = _rebind_class_cell(func, compact)
+            if value is not func:
+                rebound = type(value)(rebound)
+            setattr(compact, attr, rebound)
+
+    _compact_classes[cls] = compact
+    return compact
+
+
+_compact_classes: Dict[type, Any] = {}
+
+
+class _SlotDefault:
+    """Slot of a compact class field with class-level default
+
+    The default is returned for the class and for instances, where the slot
+    is not set, like a class attribute of the original class would be.
+    """
+
+    __slots__ = ("member", "default")
+
+    def __init__(self, member: Any, default: Any) -> None:
+        self.member = member
+        self.default = default
+
+    def __get__(self, instance: Any, owner: Optional[type] = None) -> Any:
+        if instance is None:
+            return self.default
+        try:
+            return self.member.__get__(instance, owner)
+        except AttributeError:
+            return self.default
+
+    def __set__(self, instance: Any, value: Any) -> None:
+        self.member.__set__(instance, value)
+
+    def __delete__(self, instance: Any) -> None:
+        self.member.__delete__(instance)
+
+
+def _uses_class_cell(func: Any) -> bool:
+    code = getattr(func, "__code__", None)
+    return code is not None and "__class__" in code.co_freevars
+
+
+def _rebind_class_cell(func: Any, cls: type) -> Any:
+    """Return copy of the function with __class__ cell referring to cls"""
+    if not _uses_class_cell(func):
+        return func
+    code = func.__code__
+    closure = list(func.__closure__)
+    closure[code.co_freevars.index("__class__")] = CellType(cls)
+    rebound = FunctionType(
+        code, func.__globals__, func.__name__, func.__defaults__, tuple(closure)
+    )
+    rebound.__kwdefaults__ = func.__kwdefaults__
+    rebound.__dict__.update(func.__dict__)
+    return rebound
+
+
+CompactStatementLine = make_compact(StatementLine)
+CompactInvestStatementLine = make_compact(InvestStatementLine)
+CompactCurrency = make_compact(Currency)
+CompactBankAccount = make_compact(BankAccount)
+
+
 def generate_transaction_id(stmt_line: StatementLine) -> str:
     """Generate pseudo-unique id for given statement line.
 
@@ -493,6 +642,47 @@ def generate_unique_transaction_id(stmt_line: StatementLine, unique_id_set: set)
     return id + ("" if counter == 0 else "-" + str(counter))
 
 
+def assign_transaction_ids(stmt: Statement, fast: bool = False) -> None:
+    """Generate ids for all statement lines that don't have one.
+
+    By default ids are the same as generate_unique_transaction_id() would
+    produce for the lines in order, but the dates are formatted once and
+    repeated hashes are numbered with a counter instead of probing the set
+    of used ids.
+
+    With fast=True shorter blake2b digests are used instead of sha1. They are
+    quicker to compute, but differ from the ids generated before, so
+    transactions already imported with old ids would be imported again.
+    """
+    digest: Callable[[bytes], Any] = sha1
+    if fast:
+        digest = partial(blake2b, digest_size=16)
+
+    date_strings: Dict[Tuple[datetime, Any], str] = {}
+    counters: Dict[str, int] = {}
+    for stmt_line in stmt.lines:
+        if stmt_line.id:
+            continue
+        date = stmt_line.date
+        assert date is not None
+        # Equal datetimes in different timezones are formatted differently
+        key = (date, date.tzinfo)
+        date_string = date_strings.get(key)
+        if date_string is None:
+            date_string = date_strings[key] = date.strftime("%Y-%m-%d %H:%M:%S")
+
+        data = date_string
+        if stmt_line.memo is not None:
+            data += stmt_line.memo
+        if stmt_line.amount is not None:
+            data += str(stmt_line.amount)
+        h = digest(data.encode("utf8")).hexdigest()
+
+        counter = counters.get(h, 0)
+        counters[h] = counter + 1
+        stmt_line.id = h if counter == 0 else "%s%d-%d" % (h, counter, counter)
+
+
 def recalculate_balance(stmt: Statement) -> None:
     """Recalculate statement starting and ending dates and balances.
 
@@ -502,9 +692,170 @@ def recalculate_balance(stmt: Statement) -> None:
     not available in source statement.
     """
 
-    total_amount = sum([sl.amount for sl in stmt.lines if sl.amount is not None], D(0))
+    total_amount = _total_amount(stmt.lines)
 
     stmt.start_balance = stmt.start_balance or D(0)
     stmt.end_balance = stmt.start_balance + total_amount
-    stmt.start_date = min(sl.date for sl in stmt.lines if sl.date is not None)
-    stmt.end_date = max(sl.date for sl in stmt.lines if sl.date is not None)
+    stmt.start_date = _min_date(stmt.lines)
+    stmt.end_date = _max_date(stmt.lines)
+
+
+# Line containers, such as StatementTable, may provide faster implementations
+# of aggregates as total_amount(), min_date() and max_date() methods
+
+
+def _total_amount(lines: Iterable[StatementLine]) -> D:
+    if hasattr(lines, "total_amount"):
+        return lines.total_amount()
+    return sum([sl.amount for sl in lines if sl.amount is not None], D(0))
+
+
+def _min_date(lines: Iterable[StatementLine]) -> datetime:
+    if hasattr(lines, "min_date"):
+        return lines.min_date()
+    return min(sl.date for sl in lines if sl.date is not None)
+
+
+def _max_date(lines: Iterable[StatementLine]) -> datetime:
+    if hasattr(lines, "max_date"):
+        return lines.max_date()
+    return max(sl.date for sl in lines if sl.date is not None)
+
+
+class LineList(List[StatementLine]):
+    """List of statement lines, that keeps their aggregates up to date
+
+    Total amount, per-currency totals and date range are updated as lines are
+    added or removed, so balance validation and recalculation of statements
+    using it for ``Statement.lines`` don't need to scan all the lines. Date
+    range is recalculated lazily, when the earliest or the latest line is
+    removed.
+
+    Changes made to the lines in place are not tracked; call refresh() after
+    modifying amounts or dates of lines, that are already in the list.
+    """
+
+    _total: D
+    _currency_totals: Dict[Optional[str], D]
+    _min_date: Optional[datetime]
+    _max_date: Optional[datetime]
+    _dates_dirty: bool
+
+    def __init__(self, lines: Iterable[StatementLine] = ()) -> None:
+        super().__init__(lines)
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Recalculate all the aggregates"""
+        self._total = D(0)
+        self._currency_totals = {}
+        self._min_date = self._max_date = None
+        self._dates_dirty = False
+        for line in self:
+            self._added(line)
+
+    def total_amount(self) -> D:
+        """Return sum of all line amounts"""
+        return self._total
+
+    def currency_totals(self) -> Dict[Optional[str], D]:
+        """Return sums of line amounts by line currency symbol
+
+        Lines without currency (expressed in statement currency) are summed
+        under None key.
+        """
+        return dict(self._currency_totals)
+
+    def min_date(self) -> Optional[datetime]:
+        """Return the earliest line date"""
+        if self._dates_dirty:
+            self._refresh_dates()
+        return self._min_date
+
+    def max_date(self) -> Optional[datetime]:
+        """Return the latest line date"""
+        if self._dates_dirty:
+            self._refresh_dates()
+        return self._max_date
+
+    def append(self, line: StatementLine) -> None:
+        super().append(line)
+        self._added(line)
+
+    def extend(self, lines: Iterable[StatementLine]) -> None:
+        for line in lines:
+            self.append(line)
+
+    def __iadd__(self, lines: Iterable[StatementLine]) -> "LineList":  # type: ignore
+        self.extend(lines)
+        return self
+
+    def insert(self, index: SupportsIndex, line: StatementLine) -> None:
+        super().insert(index, line)
+        self._added(line)
+
+    def pop(self, index: SupportsIndex = -1) -> StatementLine:
+        line = super().pop(index)
+        self._removed(line)
+        return line
+
+    def remove(self, line: StatementLine) -> None:
+        super().remove(line)
+        self._removed(line)
+
+    def clear(self) -> None:
+        super().clear()
+        self.refresh()
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        if isinstance(index, slice):
+            super().__setitem__(index, value)
+            self.refresh()
+        else:
+            self._removed(self[index])
+            super().__setitem__(index, value)
+            self._added(value)
+
+    def __delitem__(self, index: Any) -> None:
+        if isinstance(index, slice):
+            super().__delitem__(index)
+            self.refresh()
+        else:
+            self._removed(self[index])
+            super().__delitem__(index)
+
+    def __imul__(self, n: SupportsIndex) -> "LineList":
+        super().__imul__(n)
+        self.refresh()
+        return self
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return type(self), (list(self),)
+
+    def _added(self, line: StatementLine) -> None:
+        amount = line.amount
+        if amount is not None:
+            self._total += amount
+            key = line.currency.symbol if line.currency is not None else None
+            self._currency_totals[key] = self._currency_totals.get(key, D(0)) + amount
+        date = line.date
+        if date is not None and not self._dates_dirty:
+            if self._min_date is None or date < self._min_date:
+                self._min_date = date
+            if self._max_date is None or date > self._max_date:
+                self._max_date = date
+
+    def _removed(self, line: StatementLine) -> None:
+        amount = line.amount
+        if amount is not None:
+            self._total -= amount
+            key = line.currency.symbol if line.currency is not None else None
+            self._currency_totals[key] = self._currency_totals.get(key, D(0)) - amount
+        if line.date is not None and line.date in (self._min_date, self._max_date):
+            self._dates_dirty = True
+
+    def _refresh_dates(self) -> None:
+        dates = [line.date for line in self if line.date is not None]
+        self._min_date = min(dates, default=None)
+        self._max_date = max(dates, default=None)
+        self._dates_dirty = False
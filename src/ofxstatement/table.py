@@ -0,0 +1,433 @@
+"""Columnar storage for statement lines
+
+StatementTable can be used instead of a list for ``Statement.lines`` when
+statements are too large to be kept as individual StatementLine objects.
+Dates and amounts are stored in typed arrays, so aggregates and filtering are
+done on whole columns, with NumPy if it is installed.
+"""
+
+from array import array
+from datetime import datetime, timedelta, tzinfo as TzInfo
+from decimal import Decimal as D
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+    overload,
+)
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None  # type: ignore
+
+from ofxstatement.statement import StatementLine
+
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+# Marks missing dates in date column
+NULL_DATE = -(2**63)
+# Marks missing amounts in amount exponent column
+NULL_EXPONENT = 127
+
+# Row fields, stored in list columns
+COLUMNS = {
+    "id": "ids",
+    "memo": "memos",
+    "payee": "payees",
+    "trntype": "trntypes",
+}
+
+# Rarely set fields, stored only for rows that have them
+SPARSE_FIELDS = (
+    "date_user",
+    "check_no",
+    "refnum",
+    "bank_account_to",
+    "currency",
+    "orig_currency",
+)
+
+
+class StatementTable:
+    """Statement lines stored column by column
+
+    Dates are kept as microseconds since the epoch and amounts as integer
+    coefficients with decimal exponents, so both round-trip exactly. All
+    dates in the table must have the same tzinfo. Negative zero amounts are
+    stored as zero.
+
+    Rows are accessed as StatementRow views, which can be used in place of
+    StatementLine objects. The table supports list operations, that callers
+    of ``Statement.lines`` use: slicing, concatenation, del, pop() and
+    remove(). Removed rows are returned as StatementLine objects; views of
+    the rows after them refer to the next rows afterwards, as indices of a
+    list would.
+    """
+
+    tzinfo: Optional[TzInfo]
+
+    def __init__(self, lines: Iterable[StatementLine] = ()) -> None:
+        self.tzinfo = None
+        self.dates = array("q")
+        self.amount_coefs = array("q")
+        self.amount_exps = array("b")
+        self.ids: List[Optional[str]] = []
+        self.memos: List[Optional[str]] = []
+        self.payees: List[Optional[str]] = []
+        self.trntypes: List[Optional[str]] = []
+        self.sparse: Dict[str, Dict[int, Any]] = {name: {} for name in SPARSE_FIELDS}
+
+        # Amount exponents in use, to sum amounts without grouping when there
+        # is just one
+        self._exponents: Set[int] = set()
+        self._null_dates = 0
+
+        self.extend(lines)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator["StatementRow"]:
+        for index in range(len(self)):
+            yield StatementRow(self, index)
+
+    @overload
+    def __getitem__(self, index: int) -> "StatementRow": ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "StatementTable": ...
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union["StatementRow", "StatementTable"]:
+        if isinstance(index, slice):
+            return self.take(range(len(self))[index])
+        return StatementRow(self, self._check_index(index))
+
+    def __delitem__(self, index: Union[int, slice]) -> None:
+        if isinstance(index, slice):
+            removed = set(range(len(self))[index])
+        else:
+            removed = {self._check_index(index)}
+        kept = self.take(n for n in range(len(self)) if n not in removed)
+        self.__dict__.update(kept.__dict__)
+
+    def __add__(self, lines: Iterable[StatementLine]) -> "StatementTable":
+        table = self.take(range(len(self)))
+        table.extend(lines)
+        return table
+
+    def __radd__(self, lines: Iterable[Any]) -> List[Any]:
+        # list + table
+        return list(lines) + list(self)
+
+    def __iadd__(self, lines: Iterable[StatementLine]) -> "StatementTable":
+        self.extend(lines)
+        return self
+
+    def index(self, line: Any) -> int:
+        """Return index of the row
+
+        Rows are views, so only rows of this table can be found.
+        """
+        if isinstance(line, StatementRow) and line.table is self:
+            return line.index
+        raise ValueError("Line is not in StatementTable")
+
+    def pop(self, index: int = -1) -> StatementLine:
+        line = self[index].to_line()
+        del self[index]
+        return line
+
+    def remove(self, line: Any) -> None:
+        del self[self.index(line)]
+
+    def clear(self) -> None:
+        del self[:]
+
+    def append(self, line: StatementLine) -> None:
+        self.add(
+            line.id,
+            line.date,
+            line.memo,
+            line.amount,
+            payee=line.payee,
+            trntype=line.trntype,
+            **{name: getattr(line, name, None) for name in SPARSE_FIELDS},
+        )
+
+    def add(
+        self,
+        id: Optional[str] = None,
+        date: Optional[datetime] = None,
+        memo: Optional[str] = None,
+        amount: Optional[D] = None,
+        payee: Optional[str] = None,
+        trntype: Optional[str] = "CHECK",
+        **sparse: Any,
+    ) -> None:
+        """Add row with given field values
+
+        Parsers can use this instead of append() to avoid creating
+        StatementLine objects.
+        """
+        # All fields are checked before any column is changed, so columns
+        # stay the same length when some value is rejected
+        for name in sparse:
+            if name not in self.sparse:
+                raise TypeError("Unknown statement line field: %s" % name)
+        tzinfo = self.tzinfo
+        if date is not None and len(self.dates) == self._null_dates:
+            # The first dated row defines tzinfo of the table
+            tzinfo = date.tzinfo
+        encoded = self._encode_date(date, tzinfo)
+        coef, exp = self._encode_amount(amount)
+
+        self.tzinfo = tzinfo
+        self._null_dates += date is None
+        self.dates.append(encoded)
+        self.amount_coefs.append(coef)
+        self.amount_exps.append(exp)
+        self.ids.append(id)
+        self.memos.append(memo)
+        self.payees.append(payee)
+        self.trntypes.append(trntype)
+
+        index = len(self.ids) - 1
+        for name, value in sparse.items():
+            if value is not None:
+                self.sparse[name][index] = value
+
+    def extend(self, lines: Iterable[StatementLine]) -> None:
+        for line in lines:
+            self.append(line)
+
+    def total_amount(self) -> D:
+        """Return sum of all line amounts"""
+        if numpy is not None:
+            coefs = numpy.frombuffer(self.amount_coefs, dtype=numpy.int64)
+            exps = numpy.frombuffer(self.amount_exps, dtype=numpy.int8)
+            total = D(0)
+            for exp in self._exponents:
+                selected = coefs[exps == exp]
+                if not len(selected):
+                    continue
+                bound = max(int(selected.max()), -int(selected.min()), 1)
+                if bound * len(selected) < 2**63:
+                    subtotal = int(selected.sum())
+                else:
+                    # int64 sum could overflow
+                    subtotal = int(selected.sum(dtype=object))
+                total += D(subtotal).scaleb(exp)
+            return total
+
+        if len(self._exponents) == 1:
+            # Missing amounts have zero coefficients, so all the column can be
+            # summed at once
+            (exp,) = self._exponents
+            return D(sum(self.amount_coefs)).scaleb(exp)
+
+        totals = dict.fromkeys(self._exponents, 0)
+        for coef, exp in zip(self.amount_coefs, self.amount_exps):
+            if exp != NULL_EXPONENT:
+                totals[exp] += coef
+        return sum((D(total).scaleb(exp) for exp, total in totals.items()), D(0))
+
+    def min_date(self) -> Optional[datetime]:
+        """Return the earliest line date"""
+        if len(self.dates) == self._null_dates:
+            return None
+        if numpy is not None:
+            dates = numpy.frombuffer(self.dates, dtype=numpy.int64)
+            return self._decode_date(int(dates[dates != NULL_DATE].min()))
+        if self._null_dates:
+            return self._decode_date(min(d for d in self.dates if d != NULL_DATE))
+        return self._decode_date(min(self.dates))
+
+    def max_date(self) -> Optional[datetime]:
+        """Return the latest line date"""
+        if len(self.dates) == self._null_dates:
+            return None
+        # Missing dates are the smallest possible values
+        if numpy is not None:
+            return self._decode_date(
+                int(numpy.frombuffer(self.dates, numpy.int64).max())
+            )
+        return self._decode_date(max(self.dates))
+
+    def between(
+        self, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> "StatementTable":
+        """Return table of lines dated from start (inclusive) to end (exclusive)
+
+        Lines without date are left out.
+        """
+        low = NULL_DATE + 1 if start is None else self._encode_date(start, self.tzinfo)
+        high = 2**63 - 1 if end is None else self._encode_date(end, self.tzinfo)
+        if numpy is not None:
+            dates = numpy.frombuffer(self.dates, dtype=numpy.int64)
+            indices: Sequence[int] = numpy.flatnonzero(
+                (dates >= low) & (dates < high)
+            ).tolist()
+        else:
+            indices = [n for n, d in enumerate(self.dates) if low <= d < high]
+        return self.take(indices)
+
+    def take(self, indices: Iterable[int]) -> "StatementTable":
+        """Return table of rows with given indices"""
+        indices = list(indices)
+        table = StatementTable()
+        table.tzinfo = self.tzinfo
+        for name in ("dates", "amount_coefs", "amount_exps"):
+            column = getattr(self, name)
+            setattr(table, name, array(column.typecode, [column[i] for i in indices]))
+        for name in COLUMNS.values():
+            column = getattr(self, name)
+            setattr(table, name, [column[i] for i in indices])
+        positions = None
+        for name, column in self.sparse.items():
+            if column:
+                if positions is None:
+                    positions = {old: new for new, old in enumerate(indices)}
+                table.sparse[name] = {
+                    positions[old]: value
+                    for old, value in column.items()
+                    if old in positions
+                }
+        table._recount()
+        return table
+
+    def get(self, index: int, field: str) -> Any:
+        """Return field value of the row with given index"""
+        if field == "date":
+            return self._decode_date(self.dates[index])
+        if field == "amount":
+            return self._decode_amount(
+                self.amount_coefs[index], self.amount_exps[index]
+            )
+        if field in COLUMNS:
+            return getattr(self, COLUMNS[field])[index]
+        if field in self.sparse:
+            return self.sparse[field].get(index)
+        raise AttributeError(field)
+
+    def set(self, index: int, field: str, value: Any) -> None:
+        """Set field value of the row with given index"""
+        if field == "date":
+            dated = len(self.dates) - self._null_dates
+            if value is not None and dated == (self.dates[index] != NULL_DATE):
+                # The only dated row defines tzinfo of the table
+                self.tzinfo = value.tzinfo
+            encoded = self._encode_date(value, self.tzinfo)
+            self._null_dates += (encoded == NULL_DATE) - (
+                self.dates[index] == NULL_DATE
+            )
+            self.dates[index] = encoded
+        elif field == "amount":
+            coef, exp = self._encode_amount(value)
+            self.amount_coefs[index] = coef
+            self.amount_exps[index] = exp
+        elif field in COLUMNS:
+            getattr(self, COLUMNS[field])[index] = value
+        elif field in self.sparse:
+            if value is None:
+                self.sparse[field].pop(index, None)
+            else:
+                self.sparse[field][index] = value
+        else:
+            raise AttributeError(field)
+
+    def _recount(self) -> None:
+        self._exponents = set(self.amount_exps) - {NULL_EXPONENT}
+        self._null_dates = self.dates.count(NULL_DATE)
+
+    def _check_index(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("StatementTable index out of range")
+        return index
+
+    def _encode_date(self, date: Optional[datetime], tzinfo: Optional[TzInfo]) -> int:
+        if date is None:
+            return NULL_DATE
+        if date.tzinfo != tzinfo:
+            raise ValueError(
+                "All dates in StatementTable must have the same tzinfo (%s), "
+                "got %s" % (tzinfo, date)
+            )
+        return (date.replace(tzinfo=None) - EPOCH) // ONE_MICROSECOND
+
+    def _decode_date(self, value: int) -> Optional[datetime]:
+        if value == NULL_DATE:
+            return None
+        return (EPOCH + value * ONE_MICROSECOND).replace(tzinfo=self.tzinfo)
+
+    def _encode_amount(self, amount: Union[D, int, None]) -> Tuple[int, int]:
+        if amount is None:
+            return 0, NULL_EXPONENT
+        amount = D(amount)
+        exp = amount.as_tuple().exponent
+        if isinstance(exp, int) and -128 <= exp < NULL_EXPONENT:
+            coef = int(amount.scaleb(-exp))
+            if -(2**63) <= coef < 2**63:
+                self._exponents.add(exp)
+                return coef, exp
+        raise ValueError("Amount %s cannot be stored in StatementTable" % amount)
+
+    def _decode_amount(self, coef: int, exp: int) -> Optional[D]:
+        if exp == NULL_EXPONENT:
+            return None
+        return D(coef).scaleb(exp)
+
+
+class StatementRow:
+    """View of the StatementTable row, that behaves like StatementLine"""
+
+    __slots__ = ("table", "index")
+
+    table: StatementTable
+    index: int
+
+    def __init__(self, table: StatementTable, index: int) -> None:
+        object.__setattr__(self, "table", table)
+        object.__setattr__(self, "index", index)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            # Not a field, e.g. lookup of special methods by copy or pickle
+            raise AttributeError(name)
+        return self.table.get(self.index, name)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return StatementRow, (self.table, self.index)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        self.table.set(self.index, name, value)
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return "<StatementRow %d> %r" % (self.index, self.to_line())
+
+    def __str__(self) -> str:  # pragma: no cover
+        return str(self.to_line())
+
+    def to_line(self) -> StatementLine:
+        """Return StatementLine object with row data"""
+        line = StatementLine(self.id, self.date, self.memo, self.amount)
+        line.payee = self.payee
+        line.trntype = self.trntype
+        for name in SPARSE_FIELDS:
+            setattr(line, name, self.table.sparse[name].get(self.index))
+        return line
+
+    def assert_valid(self) -> None:
+        self.to_line().assert_valid()
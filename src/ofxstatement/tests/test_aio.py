@@ -0,0 +1,107 @@
+import asyncio
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from typing import Any, AsyncIterator, List
+from unittest import mock
+
+from ofxstatement import aio, conversion, ofx, plugin
+from ofxstatement.exceptions import ConvertError
+from ofxstatement.tests.test_server import LinePlugin
+
+
+async def blocks(*contents: bytes) -> AsyncIterator[bytes]:
+    for block in contents:
+        await asyncio.sleep(0)
+        yield block
+
+
+def strip_time(document: str) -> str:
+    return re.sub("<DTSERVER>[^<]*", "", document)
+
+
+class AsyncConverterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_convert(self) -> None:
+        inputfname = os.path.join(self.tmpdir, "input")
+        with open(inputfname, "w") as f:
+            f.write("1 10\n")
+
+        async with aio.AsyncConverter(self.converter) as converter:
+            from_path = await converter.convert("lines", inputfname)
+            from_bytes = await converter.convert("lines", b"1 10\n")
+            from_blocks = await converter.convert("lines", blocks(b"1 1", b"0\n"))
+
+        self.assertIn("<FITID>1</FITID>", from_path)
+        self.assertIn("<TRNAMT>10.00</TRNAMT>", from_path)
+        self.assertEqual(strip_time(from_bytes), strip_time(from_path))
+        self.assertEqual(strip_time(from_blocks), strip_time(from_path))
+        # Temporary files are removed
+        self.assertEqual(os.listdir(self.tmpdir), ["input"])
+
+    async def test_convert_stream(self) -> None:
+        chunks = []
+        with mock.patch.object(ofx.OfxWriter, "chunk_pieces", 10):
+            async with aio.AsyncConverter(self.converter) as converter:
+                async for chunk in converter.convert_stream("lines", b"1 10\n2 5\n"):
+                    chunks.append(chunk)
+
+        self.assertGreater(len(chunks), 2)
+        document = "".join(chunks)
+        self.assertIn("<FITID>2</FITID>", document)
+        self.assertTrue(document.rstrip().endswith("</OFX>"))
+
+    async def test_concurrent(self) -> None:
+        async with aio.AsyncConverter(self.converter, workers=2) as converter:
+            documents = await asyncio.gather(
+                *(converter.convert("lines", b"%d 1\n" % i) for i in range(10))
+            )
+
+        for i, document in enumerate(documents):
+            self.assertIn("<FITID>%d</FITID>" % i, document)
+        # Plugin is loaded once
+        self.assertEqual(self.get_plugin.call_count, 1)
+
+    async def test_errors(self) -> None:
+        async with aio.AsyncConverter(self.converter) as converter:
+            with self.assertRaises(ConvertError) as cm:
+                await converter.convert("lines", b"1 10\nbad\n")
+
+        self.assertEqual(cm.exception.code, 2)
+        self.assertEqual(
+            cm.exception.messages, ["Parse error on line 2: Malformed line"]
+        )
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+    async def test_module_functions(self) -> None:
+        with mock.patch.object(aio, "_default", None):
+            document = await aio.convert("lines", b"1 10\n")
+            chunks = [chunk async for chunk in aio.convert_stream("lines", b"1 10\n")]
+            aio.get_default().close()
+
+        self.assertIn("<FITID>1</FITID>", document)
+        self.assertEqual(strip_time("".join(chunks)), strip_time(document))
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.mkdtemp(suffix="ofxstatement")
+        self.get_plugin = mock.Mock(
+            side_effect=lambda name, ui, settings: LinePlugin(ui, settings)
+        )
+        patches: List[Any] = [
+            mock.patch("ofxstatement.configuration.read", return_value=None),
+            mock.patch("ofxstatement.plugin.get_plugin", self.get_plugin),
+            mock.patch.object(tempfile, "tempdir", self.tmpdir),
+            mock.patch.object(
+                plugin,
+                "get_registry_location",
+                return_value=os.path.join(self.tmpdir, "plugins.json"),
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.converter = conversion.Converter()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmpdir)
@@ -0,0 +1,141 @@
+import io
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from typing import Any, List
+from unittest import mock
+
+from ofxstatement import batch, cache, plugin, tool
+from ofxstatement.exceptions import ConvertError
+from ofxstatement.tests.test_server import LinePlugin
+
+
+class BatchTest(unittest.TestCase):
+    def test_convert_batch(self) -> None:
+        self.write("a.txt", "1 10\n")
+        self.write("b.txt", "2 5\nbad\n")
+        self.write("c.txt", "3 1\n4 2\n")
+        outdir = os.path.join(self.tmpdir, "out")
+        os.mkdir(outdir)
+
+        ret = tool.run(
+            [
+                "convert-batch",
+                "-t",
+                "lines",
+                "-j",
+                "1",
+                "-o",
+                os.path.join(outdir, "{stem}.ofx"),
+                os.path.join(self.tmpdir, "*.txt"),
+                os.path.join(self.tmpdir, "missing.txt"),
+            ]
+        )
+
+        self.assertEqual(ret, 2)
+        self.assertEqual(sorted(os.listdir(outdir)), ["a.ofx", "c.ofx"])
+        with open(os.path.join(outdir, "c.ofx")) as f:
+            self.assertIn("<FITID>4</FITID>", f.read())
+        self.assertEqual(
+            self.log.getvalue().splitlines(),
+            [
+                "INFO: Conversion completed: (1 line, 0 invest-lines) %s"
+                % self.path("a.txt"),
+                "ERROR: %s: Parse error on line 2: Malformed line" % self.path("b.txt"),
+                "INFO: Conversion completed: (2 lines, 0 invest-lines) %s"
+                % self.path("c.txt"),
+                "ERROR: %s: FileNotFoundError: [Errno 2] No such file or directory: %r"
+                % (self.path("missing.txt"), self.path("missing.txt")),
+                "INFO: Converted 2 of 4 files",
+            ],
+        )
+        # Plugin is loaded once for all files
+        self.assertEqual(self.get_plugin.call_count, 1)
+
+    @unittest.skipUnless(
+        multiprocessing.get_start_method() == "fork",
+        "Worker processes don't inherit mocked plugin",
+    )
+    def test_convert_batch_processes(self) -> None:
+        manifest = self.write(
+            "manifest",
+            "# statements\n\n%s\n%s\tsecond.ofx\n"
+            % (self.write("a.txt", "1 10\n"), self.write("b.txt", "2 5\n")),
+        )
+
+        ret = tool.run(["convert-batch", "-t", "lines", "-j", "2", "-m", manifest])
+
+        self.assertEqual(ret, 0)
+        self.assertTrue(os.path.exists(self.path("a.ofx")))
+        self.assertTrue(os.path.exists(self.path("second.ofx")))
+        self.assertEqual(
+            self.log.getvalue().splitlines()[-1], "INFO: Converted 2 of 2 files"
+        )
+
+    def test_no_inputs(self) -> None:
+        ret = tool.run(["convert-batch", "-t", "lines", self.path("*.csv")])
+        self.assertEqual(ret, 1)
+        self.assertEqual(
+            self.log.getvalue().splitlines(), ["ERROR: No input files to convert"]
+        )
+
+    def test_plan(self) -> None:
+        files: List[Any] = [("in/a.csv", None), ("b.csv", "out.ofx")]
+        self.assertEqual(
+            batch.plan(files, "{dir}/{stem}-{name}.ofx"),
+            [("in/a.csv", "in/a-a.csv.ofx"), ("b.csv", "out.ofx")],
+        )
+
+        with self.assertRaises(ConvertError) as cm:
+            batch.plan([("in/a.csv", None), ("in/a.txt", None)], "{stem}.ofx")
+        self.assertEqual(
+            cm.exception.messages,
+            ["Both in/a.csv and in/a.txt would be converted to a.ofx"],
+        )
+
+        with self.assertRaises(ConvertError):
+            batch.plan([("a.ofx", None)], "{name}")
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.tmpdir, name)
+
+    def write(self, name: str, content: str) -> str:
+        with open(self.path(name), "w") as f:
+            f.write(content)
+        return self.path(name)
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.mkdtemp(suffix="ofxstatement")
+        self.get_plugin = mock.Mock(
+            side_effect=lambda name, ui, settings: LinePlugin(ui, settings)
+        )
+        patches: List[Any] = [
+            mock.patch("ofxstatement.configuration.read", return_value=None),
+            mock.patch("ofxstatement.plugin.get_plugin", self.get_plugin),
+            mock.patch.object(
+                cache,
+                "get_default_location",
+                return_value=os.path.join(self.tmpdir, "cache"),
+            ),
+            mock.patch.object(
+                plugin,
+                "get_registry_location",
+                return_value=os.path.join(self.tmpdir, "plugins.json"),
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.log = io.StringIO()
+        self.loghandler = logging.StreamHandler(self.log)
+        self.loghandler.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+        logging.root.addHandler(self.loghandler)
+        logging.root.setLevel(logging.INFO)
+
+    def tearDown(self) -> None:
+        logging.root.removeHandler(self.loghandler)
+        shutil.rmtree(self.tmpdir)
@@ -0,0 +1,140 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from typing import Any, List
+from unittest import mock
+
+from ofxstatement import cache, metrics, tool
+from ofxstatement.tests.test_server import LinePlugin
+
+
+class MetricsTest(unittest.TestCase):
+    def test_convert_json(self) -> None:
+        input = self.write("a.txt", "1 10\n2 5\n")
+        output = self.path("a.ofx")
+        metricsfname = self.path("metrics.json")
+
+        ret = tool.run(
+            ["convert", "-t", "lines", "--metrics", "json"]
+            + ["--metrics-file", metricsfname, input, output]
+        )
+
+        self.assertEqual(ret, 0)
+        with open(metricsfname) as f:
+            report = json.load(f)
+        self.assertEqual(report["type"], "lines")
+        self.assertEqual(report["plugin"], "lines")
+        self.assertEqual(report["plugin_version"], "1.0")
+        self.assertEqual((report["converted"], report["failed"]), (1, 0))
+        self.assertEqual(report["lines"], 2)
+        self.assertEqual(report["input_bytes"], 9)
+        self.assertEqual(report["output_bytes"], os.path.getsize(output))
+        self.assertGreater(report["lines_per_second"], 0)
+        self.assertEqual(
+            sorted(report["stages"]),
+            ["cache", "config", "parse", "plugin", "serialize", "validate", "write"],
+        )
+        [file] = report["files"]
+        self.assertEqual((file["input"], file["output"]), (input, output))
+        self.assertEqual((file["code"], file["cached"]), (0, False))
+
+    def test_convert_error(self) -> None:
+        input = self.write("a.txt", "bad\n")
+        metricsfname = self.path("ofxstatement.prom")
+
+        ret = tool.run(
+            ["convert", "-t", "lines", "--metrics", "prometheus"]
+            + ["--metrics-file", metricsfname, input, self.path("a.ofx")]
+        )
+
+        self.assertEqual(ret, 2)
+        with open(metricsfname) as f:
+            samples = self.parse_prometheus(f.read())
+        self.assertEqual(samples['ofxstatement_conversion_files{status="failed"}'], 1)
+        self.assertEqual(samples['ofxstatement_conversion_files{status="ok"}'], 0)
+        self.assertEqual(samples["ofxstatement_conversion_lines"], 0)
+        self.assertNotIn("ofxstatement_conversion_output_bytes", samples)
+
+    def test_convert_batch_prometheus(self) -> None:
+        self.write("a.txt", "1 10\n")
+        self.write("b.txt", "2 5\nbad\n")
+        self.write("c.txt", "3 1\n4 2\n")
+        metricsfname = self.path("ofxstatement.prom")
+
+        ret = tool.run(
+            ["convert-batch", "-t", "lines", "-j", "1", "--metrics", "prometheus"]
+            + ["--metrics-file", metricsfname, self.path("*.txt")]
+        )
+
+        self.assertEqual(ret, 2)
+        with open(metricsfname) as f:
+            text = f.read()
+        self.assertIn(
+            "# TYPE ofxstatement_conversion_stage_seconds gauge\n"
+            'ofxstatement_conversion_stage_seconds{type="lines",stage="config"} ',
+            text,
+        )
+        samples = self.parse_prometheus(text)
+        self.assertEqual(
+            samples['ofxstatement_plugin_info{plugin="lines",version="1.0"}'], 1
+        )
+        self.assertEqual(samples['ofxstatement_conversion_files{status="ok"}'], 2)
+        self.assertEqual(samples['ofxstatement_conversion_files{status="failed"}'], 1)
+        self.assertEqual(samples["ofxstatement_conversion_lines"], 3)
+        self.assertEqual(samples["ofxstatement_conversion_input_bytes"], 21)
+        self.assertGreater(samples["ofxstatement_conversion_output_bytes"], 0)
+        # Temporary file is replaced
+        self.assertEqual(
+            sorted(os.listdir(self.tmpdir)),
+            ["a.ofx", "a.txt", "b.txt", "c.ofx", "c.txt", "cache", "ofxstatement.prom"],
+        )
+
+    def test_escape_labels(self) -> None:
+        report = metrics.MetricsReport('my "bank"\\eur', [], 0.0, timestamp=0)
+        self.assertIn(
+            'ofxstatement_conversion_seconds{type="my \\"bank\\"\\\\eur"} 0.0\n',
+            report.to_prometheus(),
+        )
+
+    def parse_prometheus(self, text: str) -> dict:
+        """Return sample values by name and labels, except type label"""
+        samples = {}
+        for line in text.splitlines():
+            if line.startswith("#"):
+                continue
+            sample, value = line.rsplit(" ", 1)
+            sample = sample.replace('type="lines",', "").replace('{type="lines"}', "")
+            samples[sample] = float(value)
+        return samples
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.tmpdir, name)
+
+    def write(self, name: str, content: str) -> str:
+        with open(self.path(name), "w") as f:
+            f.write(content)
+        return self.path(name)
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.mkdtemp(suffix="ofxstatement")
+        patches: List[Any] = [
+            mock.patch("ofxstatement.configuration.read", return_value=None),
+            mock.patch(
+                "ofxstatement.plugin.get_plugin",
+                side_effect=lambda name, ui, settings: LinePlugin(ui, settings),
+            ),
+            mock.patch("ofxstatement.plugin.get_plugin_version", return_value="1.0"),
+            mock.patch.object(
+                cache,
+                "get_default_location",
+                return_value=os.path.join(self.tmpdir, "cache"),
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmpdir)
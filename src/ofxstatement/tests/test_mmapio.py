@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from decimal import Decimal
+
+from ofxstatement.mmapio import MappedTextFile, open_mapped
+from ofxstatement.parser import CsvStatementParser
+
+CONTENT = 'ąčę,"multi\r\nline",1.5\r\nšų,te\x0cxt,2\rlast,line,3'
+
+
+class MappedTextFileTest(TestCase):
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.mkdtemp(suffix="ofxstatement")
+        self.filename = os.path.join(self.tmpdir, "input.csv")
+        with open(self.filename, "w", encoding="utf-8", newline="") as f:
+            f.write(CONTENT)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmpdir)
+
+    def test_lines(self) -> None:
+        for newline in (None, ""):
+            with open(self.filename, encoding="utf-8", newline=newline) as f:
+                expected = list(f)
+            # Small blocks split multibyte characters and line endings
+            for block_size in (1, 2, 3, 1024):
+                with MappedTextFile(
+                    self.filename, "utf-8", newline=newline, block_size=block_size
+                ) as mapped:
+                    self.assertEqual(list(mapped), expected)
+                    self.assertEqual(mapped.readline(), "")
+                self.assertTrue(mapped.closed)
+
+    def test_read(self) -> None:
+        with open_mapped(self.filename, encoding="utf-8") as f:
+            self.assertEqual(f.read(2), "ąč")
+            self.assertEqual(f.readline(), 'ę,"multi\n')
+            self.assertEqual(f.read(8), 'line",1.')
+            self.assertEqual(f.read(), "5\nšų,te\x0cxt,2\nlast,line,3")
+            self.assertEqual(f.read(), "")
+
+    def test_empty(self) -> None:
+        open(self.filename, "w").close()
+        with open_mapped(self.filename, encoding="utf-8") as f:
+            self.assertEqual(list(f), [])
+            self.assertEqual(f.read(), "")
+
+    def test_parser(self) -> None:
+        with open_mapped(self.filename, encoding="utf-8", newline="") as f:
+            parser = CsvStatementParser(f)
+            parser.mappings = {"memo": 0, "id": 1, "amount": 2}
+            statement = parser.parse()
+        self.assertEqual(
+            [line.amount for line in statement.lines],
+            [Decimal("1.5"), Decimal("2"), Decimal("3")],
+        )
+        self.assertEqual(statement.lines[0].id, "multi\r\nline")
@@ -0,0 +1,96 @@
+import io
+import pickle
+from textwrap import dedent
+from unittest import TestCase
+from decimal import Decimal
+
+from ofxstatement.numberformat import NumberFormat
+from ofxstatement.parser import CsvStatementParser
+
+
+class NumberFormatTest(TestCase):
+    def test_european(self) -> None:
+        fmt = NumberFormat(decimal_mark=",", grouping_mark=".", currency_symbols="€")
+        self.assertEqual(fmt.parse("1.234,56"), Decimal("1234.56"))
+        self.assertEqual(fmt.parse("-1.234,56 €"), Decimal("-1234.56"))
+        self.assertEqual(fmt.parse("€ -0,5"), Decimal("-0.5"))
+        self.assertEqual(fmt.parse("+12"), Decimal("12"))
+
+        with self.assertRaisesRegex(ValueError, "Cannot parse number"):
+            fmt.parse("1,234.56")
+        with self.assertRaisesRegex(ValueError, "Cannot parse number"):
+            fmt.parse("$12")
+        with self.assertRaisesRegex(ValueError, "Cannot parse number"):
+            fmt.parse("")
+        # Grouping marks are not allowed in fractional part
+        with self.assertRaisesRegex(ValueError, "Cannot parse number"):
+            fmt.parse("1.234,56.7")
+        with self.assertRaisesRegex(ValueError, "Cannot parse number"):
+            fmt.parse("1..234")
+        # Currency symbol is written on one side of the number
+        with self.assertRaisesRegex(ValueError, "Cannot parse number"):
+            fmt.parse("€ 12 €")
+
+    def test_currency_code(self) -> None:
+        fmt = NumberFormat(currency_symbols="EUR")
+        self.assertEqual(fmt.currency_symbols, ["EUR"])
+        self.assertEqual(fmt.parse("12.50 EUR"), Decimal("12.50"))
+        with self.assertRaisesRegex(ValueError, "Cannot parse number"):
+            fmt.parse("12.50 E")
+
+    def test_pickle(self) -> None:
+        fmt = NumberFormat(decimal_mark=",", currency_symbols="€")
+        fmt.parse("1,5 €")
+
+        copy = pickle.loads(pickle.dumps(fmt))
+
+        self.assertEqual(copy.parse("-2,5 €"), Decimal("-2.5"))
+        self.assertEqual(copy.currency_symbols, ["€"])
+
+    def test_space_grouping(self) -> None:
+        fmt = NumberFormat(decimal_mark=",", grouping_mark=" ")
+        self.assertEqual(fmt.parse("1 234 567,8"), Decimal("1234567.8"))
+        self.assertEqual(fmt.parse("1 234,00"), Decimal("1234.00"))
+        self.assertEqual(fmt.parse("1 234"), Decimal("1234"))
+
+    def test_negatives(self) -> None:
+        fmt = NumberFormat(
+            grouping_mark=",",
+            currency_symbols=["USD", "$"],
+            negative_parentheses=True,
+            trailing_minus=True,
+        )
+        self.assertEqual(fmt.parse("($1,234.56)"), Decimal("-1234.56"))
+        self.assertEqual(fmt.parse("1,234.56 USD-"), Decimal("-1234.56"))
+        self.assertEqual(fmt.parse("$-3"), Decimal("-3"))
+        self.assertEqual(fmt.parse("3.00"), Decimal("3.00"))
+
+        with self.assertRaisesRegex(ValueError, "Unbalanced parentheses"):
+            fmt.parse("(12.00")
+
+        # Negative formats are accepted only when enabled
+        with self.assertRaises(ValueError):
+            NumberFormat().parse("(12.00)")
+        with self.assertRaises(ValueError):
+            NumberFormat().parse("12.00-")
+
+    def test_invalid_format(self) -> None:
+        with self.assertRaises(ValueError):
+            NumberFormat(decimal_mark=",", grouping_mark=",")
+
+    def test_parser(self) -> None:
+        csv = dedent("""
+            "2012-01-18","1.243,32 €","1001"
+            "2012-02-14","-23,5 €","1002"
+            """)
+        parser = CsvStatementParser(io.StringIO(csv))
+        parser.mappings = {"date": 0, "amount": 1, "id": 2}
+        parser.number_format = NumberFormat(
+            decimal_mark=",", grouping_mark=".", currency_symbols="€"
+        )
+
+        statement = parser.parse()
+        self.assertEqual(
+            [line.amount for line in statement.lines],
+            [Decimal("1243.32"), Decimal("-23.5")],
+        )
@@ -1,3 +1,4 @@
+import io
 from unittest import TestCase
 import xml.dom.minidom
 from decimal import Decimal
@@ -166,3 +167,99 @@ class OfxWriterTest(TestCase):
         ]
 
         assert xml.split("\r\n") == expected
+
+    def test_ofxWriter_write(self) -> None:
+        # GIVEN
+        statement = Statement("BID", "ACCID", "LTL")
+        for n in range(10):
+            statement.lines.append(
+                StatementLine(str(n), datetime(2021, 9, 1), "A & <B>", Decimal(n))
+            )
+        expected = ofx.OfxWriter(statement)
+        expected.genTime = datetime(2021, 9, 3, 0, 0, 0)
+
+        writer = ofx.OfxWriter(statement)
+        writer.genTime = datetime(2021, 9, 3, 0, 0, 0)
+        writer.chunk_pieces = 10
+        out = io.StringIO()
+
+        # WHEN
+        writer.write(out)
+
+        # THEN
+        assert out.getvalue() == expected.toxml()
+        assert "<MEMO>A &amp; &lt;B&gt;</MEMO>" in out.getvalue()
+
+    def test_ofxWriter_iter_chunks(self) -> None:
+        # GIVEN
+        statement = Statement("BID", "ACCID", "LTL")
+        for n in range(10):
+            statement.lines.append(
+                StatementLine(str(n), datetime(2021, 9, 1), "Memo", Decimal(n))
+            )
+        writer = ofx.OfxWriter(statement)
+        writer.chunk_pieces = 10
+
+        # WHEN
+        chunks = list(writer.iter_chunks())
+
+        # THEN
+        # header, one chunk per transaction and the closing tags
+        assert len(chunks) == 12
+        assert chunks[0].startswith("OFXHEADER:100")
+        assert chunks[-1].endswith("</OFX>")
+
+    def test_ofxWriter_buildDocument_after_toxml(self) -> None:
+        # GIVEN
+        statement = Statement("BID", "ACCID", "LTL")
+        statement.lines.append(
+            StatementLine("1", datetime(2021, 9, 1), "Memo", Decimal(1))
+        )
+        writer = ofx.OfxWriter(statement)
+        writer.toxml()
+
+        # WHEN
+        tree = writer.buildDocument()
+
+        # THEN
+        root = tree.getroot()
+        assert root is not None
+        assert root.findtext(".//STMTTRN/FITID") == "1"
+
+    def test_ofxWriter_pretty_matches_minidom(self) -> None:
+        # GIVEN
+        statement = Statement("BID", "ACCID", "LTL")
+        line = StatementLine("1", datetime(2021, 9, 1), 'Say "hi" & <bye>', None)
+        line.bank_account_to = BankAccount("SNORAS", "LT1232")
+        statement.lines.append(line)
+        writer = ofx.OfxWriter(statement)
+        writer.genTime = datetime(2021, 9, 3, 0, 0, 0)
+        compact = ofx.OfxWriter(statement)
+        compact.genTime = datetime(2021, 9, 3, 0, 0, 0)
+
+        # WHEN
+        output = writer.toxml(pretty=True)
+
+        # THEN
+        headers, sep, payload = compact.toxml().partition("\r\n\r\n")
+        dom = xml.dom.minidom.parseString(payload)
+        expected = dom.toprettyxml(indent="  ", newl="\r\n")
+        expected = expected.replace('<?xml version="1.0" ?>', "").lstrip()
+        assert output == headers + sep + expected
+
+    def test_formatDateTime_cache_respects_timezone(self) -> None:
+        # GIVEN
+        writer = ofx.OfxWriter(Statement())
+        utc = datetime(2021, 9, 1, 12, 0, 0, tzinfo=timezone.utc)
+        # Same moment in time, compares equal to the utc one
+        local = utc.astimezone(timezone(timedelta(hours=2)))
+
+        # WHEN
+        formatted = [writer.formatDateTime(dt) for dt in (utc, local, utc)]
+
+        # THEN
+        assert formatted == [
+            "20210901120000[0.0]",
+            "20210901140000.000[2.0]",
+            "20210901120000[0.0]",
+        ]
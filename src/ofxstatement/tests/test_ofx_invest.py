@@ -1,10 +1,10 @@
-from unittest import TestCase
+from unittest import TestCase, mock
 import xml.dom.minidom
 from decimal import Decimal
 
 from datetime import datetime
 
-from ofxstatement.statement import Statement, InvestStatementLine
+from ofxstatement.statement import Statement, InvestStatementLine, StatementLine
 from ofxstatement import ofx
 
 SIMPLE_OFX = """
@@ -275,3 +275,71 @@ class OfxInvestLinesWriterTest(TestCase):
         writer.genTime = datetime(2021, 5, 1, 0, 0, 0)
 
         assert prettyPrint(writer.toxml()) == SIMPLE_OFX.lstrip().replace("\n", "\r\n")
+
+    def test_ofxWriter_compiles_emitter_per_trntype(self) -> None:
+        # GIVEN
+        statement = Statement("BID", "ACCID", "LTL")
+        for n in range(4):
+            line = InvestStatementLine(
+                str(n), datetime(2021, 1, 1), "Sample", "INCOME", "DIV", "MSFT"
+            )
+            line.amount = Decimal("0.79")
+            statement.invest_lines.append(line)
+        writer = ofx.OfxWriter(statement)
+
+        # WHEN
+        with mock.patch.object(
+            writer, "compileInvestEmitter", wraps=writer.compileInvestEmitter
+        ) as compile:
+            output = writer.toxml()
+
+        # THEN
+        compile.assert_called_once_with("INCOME")
+        assert output.count("<INCOMETYPE>DIV</INCOMETYPE>") == 4
+
+    def test_ofxWriter_precision_changed(self) -> None:
+        # GIVEN
+        statement = Statement("BID", "ACCID", "LTL")
+        line = InvestStatementLine(
+            "1", datetime(2021, 1, 1), "Sample", "BUYSTOCK", "BUY", "MSFT"
+        )
+        line.units = Decimal("2")
+        line.unit_price = Decimal("10.5")
+        line.amount = Decimal("-21")
+        statement.invest_lines.append(line)
+        writer = ofx.OfxWriter(statement)
+        writer.toxml()
+
+        # WHEN
+        writer.invest_transactions_float_precision = 3
+        output = writer.toxml()
+
+        # THEN
+        assert "<UNITPRICE>10.500</UNITPRICE>" in output
+
+    def test_ofxWriter_custom_bank_transaction(self) -> None:
+        # GIVEN
+        class CustomWriter(ofx.OfxWriter):
+            def buildBankTransaction(self, line: StatementLine) -> None:
+                super().buildBankTransaction(line)
+                self.buildText("CUSTOM", line.id)
+
+        statement = Statement("BID", "ACCID", "LTL")
+        line = InvestStatementLine(
+            "1", datetime(2021, 1, 1), "Sample", "INVBANKTRAN", "DEP"
+        )
+        line.amount = Decimal("100")
+        statement.invest_lines.append(line)
+
+        writer = CustomWriter(statement)
+        writer.genTime = datetime(2021, 5, 1)
+        regular_writer = ofx.OfxWriter(statement)
+        regular_writer.genTime = datetime(2021, 5, 1)
+
+        # WHEN
+        output = writer.toxml()
+        regular = regular_writer.toxml()
+
+        # THEN
+        assert "</STMTTRN><CUSTOM>1</CUSTOM><SUBACCTFUND>" in output
+        assert output.replace("<CUSTOM>1</CUSTOM>", "") == regular
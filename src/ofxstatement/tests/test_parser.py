@@ -1,9 +1,38 @@
 import io
+import os
+import tempfile
+import threading
 from textwrap import dedent
 from unittest import TestCase
 from decimal import Decimal
+from datetime import datetime
 
-from ofxstatement.parser import CsvStatementParser
+from ofxstatement.exceptions import ParseError
+from ofxstatement.parser import (
+    CsvStatementParser,
+    compile_fast_date_parser,
+    find_record_boundaries,
+)
+
+
+class StrictCsvParser(CsvStatementParser):
+    mappings = {"date": 0, "memo": 1, "amount": 2, "id": 3}
+
+    def parse_record(self, line):
+        if line[2] == "bad":
+            raise ParseError(self.cur_record, "Bad amount")
+        return super().parse_record(line)
+
+
+class PrefixedCsvParser(StrictCsvParser):
+    def __init__(self, fin, prefix):
+        super().__init__(fin)
+        self._prefix = prefix
+
+    def parse_record(self, line):
+        stmt_line = super().parse_record(line)
+        stmt_line.memo = self._prefix + stmt_line.memo
+        return stmt_line
 
 
 class CsvStatementParserTest(TestCase):
@@ -11,12 +40,10 @@ class CsvStatementParserTest(TestCase):
         # Test generic CsvStatementParser
 
         # Lets define some sample csv to parse and write it to file-like object
-        csv = dedent(
-            """
+        csv = dedent("""
             "2012-01-18","Microsoft","Windows XP",243.32,"1001"
             "2012-02-14","Google","Adwords",23.54,"1002"
-            """
-        )
+            """)
         f = io.StringIO(csv)
 
         # Create and configure csv parser:
@@ -28,3 +55,214 @@ class CsvStatementParserTest(TestCase):
         self.assertEqual(len(statement.lines), 2)
         self.assertEqual(statement.lines[0].amount, Decimal("243.32"))
         self.assertEqual(statement.lines[1].payee, "Google")
+
+    def test_iter_lines(self) -> None:
+        csv = dedent("""
+            "2012-01-18","Microsoft","Windows XP",243.32,"1001"
+
+            "2012-02-14","Google","Adwords",23.54,"1002"
+            """)
+        parser = CsvStatementParser(io.StringIO(csv))
+        parser.mappings = {"date": 0, "payee": 1, "memo": 2, "amount": 3, "id": 4}
+        parser.statement.start_balance = Decimal("10")
+
+        lines = parser.iter_lines()
+        first = next(lines)
+        self.assertEqual(first.payee, "Microsoft")
+        self.assertEqual(parser.cur_record, 2)
+        # Header is filled in only when the stream ends
+        self.assertIsNone(parser.statement.end_balance)
+
+        rest = list(lines)
+        self.assertEqual([line.id for line in rest], ["1002"])
+        self.assertEqual(parser.cur_record, 4)
+        # Lines are not collected
+        self.assertEqual(parser.statement.lines, [])
+        self.assertEqual(parser.statement.start_date, datetime(2012, 1, 18))
+        self.assertEqual(parser.statement.end_date, datetime(2012, 2, 14))
+        self.assertEqual(parser.statement.end_balance, Decimal("276.86"))
+
+    def test_parse_keeps_header(self) -> None:
+        csv = '"2012-01-18","Microsoft","Windows XP",243.32,"1001"\n'
+        parser = CsvStatementParser(io.StringIO(csv))
+        parser.mappings = {"date": 0, "payee": 1, "memo": 2, "amount": 3, "id": 4}
+
+        statement = parser.parse()
+
+        self.assertEqual(len(statement.lines), 1)
+        self.assertIsNone(statement.start_date)
+        self.assertIsNone(statement.end_balance)
+
+    def test_mappings_changed(self) -> None:
+        record = ["2012-01-18", "Windows XP", "243.32", "1001"]
+        parser = CsvStatementParser(io.StringIO())
+        parser.mappings = {"date": 0, "memo": 1, "amount": 2, "id": 3}
+        line = parser.parse_record(record)
+        assert line is not None
+        self.assertEqual((line.memo, line.payee), ("Windows XP", None))
+
+        # Mappings modified in place are compiled again
+        parser.mappings["payee"] = parser.mappings.pop("memo")
+        line = parser.parse_record(record)
+        assert line is not None
+        self.assertEqual((line.memo, line.payee), (None, "Windows XP"))
+
+    def test_overridden_converters(self) -> None:
+        class DottedDateParser(CsvStatementParser):
+            mappings = {"date": 0, "amount": 1, "memo": 2, "id": 3}
+
+            def parse_datetime(self, value: str) -> datetime:
+                return datetime.strptime(value, "%d.%m.%Y")
+
+        class UppercaseParser(CsvStatementParser):
+            mappings = {"date": 0, "amount": 1, "memo": 2, "id": 3}
+
+            def parse_value(self, value, field):
+                if field == "memo":
+                    return value.upper()
+                return super().parse_value(value, field)
+
+        csv = "18.01.2012,243.32,Windows XP,1\n"
+        statement = DottedDateParser(io.StringIO(csv)).parse()
+        self.assertEqual(statement.lines[0].date, datetime(2012, 1, 18))
+        self.assertEqual(statement.lines[0].memo, "Windows XP")
+
+        csv = "2012-01-18,243.32,Windows XP,1\n"
+        statement = UppercaseParser(io.StringIO(csv)).parse()
+        self.assertEqual(statement.lines[0].date, datetime(2012, 1, 18))
+        self.assertEqual(statement.lines[0].amount, Decimal("243.32"))
+        self.assertEqual(statement.lines[0].memo, "WINDOWS XP")
+
+    def test_missing_column(self) -> None:
+        parser = CsvStatementParser(io.StringIO("2012-01-18,243.32\n"))
+        parser.mappings = {"date": 0, "amount": 1, "memo": 2}
+        with self.assertRaisesRegex(ValueError, "Cannot find column 2 in line of 2"):
+            parser.parse()
+
+    def test_parse_datetime(self) -> None:
+        for cache_size, fast in [(0, False), (0, True), (2, False), (2, True)]:
+            parser = CsvStatementParser(io.StringIO())
+            parser.date_cache_size = cache_size
+            parser.fast_date_parsing = fast
+
+            for value in ["2012-01-18", "2012-1-8", "2012-01-18"]:
+                self.assertEqual(
+                    parser.parse_datetime(value), datetime.strptime(value, "%Y-%m-%d")
+                )
+
+            # date format can be changed in the middle of parsing
+            parser.date_format = "%d.%m.%Y"
+            self.assertEqual(parser.parse_datetime("01.02.2012"), datetime(2012, 2, 1))
+            parser.date_format = "%m.%d.%Y"
+            self.assertEqual(parser.parse_datetime("01.02.2012"), datetime(2012, 1, 2))
+
+            with self.assertRaises(ValueError):
+                parser.parse_datetime("2012-02-30")
+
+    def test_compile_fast_date_parser(self) -> None:
+        parse = compile_fast_date_parser("%m/%d/%Y")
+        assert parse is not None
+        self.assertEqual(parse("01/18/2012"), datetime(2012, 1, 18))
+        # Values, that are not handled, are left for strptime
+        self.assertIsNone(parse("1/18/2012"))
+        self.assertIsNone(parse("13/18/2012"))
+        self.assertIsNone(parse("01-18-2012"))
+
+        self.assertIsNone(compile_fast_date_parser("%d.%m.%Y %H:%M"))
+        self.assertIsNone(compile_fast_date_parser("%b %d, %Y"))
+
+    def test_find_record_boundaries(self) -> None:
+        data = b'1,"a\nb"\n2,"c""\n"\n3,d\n4,e'
+        offsets = find_record_boundaries(io.BytesIO(data), 1, block_size=3)
+        self.assertEqual(offsets, [0, 8, 17, 21])
+        self.assertEqual(find_record_boundaries(io.BytesIO(data), 1000), [0])
+
+    def test_parse_parallel(self) -> None:
+        records = [
+            '2012-01-%02d,"Line %d\nwith ""quoted"" newline",%d.5,%d\n' % (n, n, n, n)
+            for n in range(1, 21)
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "statement.csv")
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write("".join(records))
+
+            with open(filename, encoding="utf-8") as f:
+                expected = StrictCsvParser(f).parse()
+            with open(filename, encoding="utf-8") as f:
+                parser = StrictCsvParser(f)
+                statement = parser.parse_parallel(workers=2, chunk_size=100)
+
+            self.assertEqual(len(statement.lines), 20)
+            self.assertEqual(parser.cur_record, 20)
+            for line, expected_line in zip(statement.lines, expected.lines):
+                self.assertEqual(repr(line), repr(expected_line))
+            self.assertEqual(statement.lines[19].memo, 'Line 20\nwith "quoted" newline')
+
+            # Errors are reported with record numbers in the whole file
+            records[16] = "2012-01-17,Broken,bad,17\n"
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write("".join(records))
+            with open(filename, encoding="utf-8") as f:
+                with self.assertRaises(ParseError) as cm:
+                    StrictCsvParser(f).parse_parallel(workers=2, chunk_size=100)
+            self.assertEqual(cm.exception.lineno, 17)
+
+    def test_parse_parallel_private_state(self) -> None:
+        records = [
+            "2012-01-%02d,Line %d,%d.5,%d\n" % (n, n, n, n) for n in range(1, 21)
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "statement.csv")
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write("".join(records))
+
+            with open(filename, encoding="utf-8") as f:
+                parser = PrefixedCsvParser(f, "Card: ")
+                parser.parse_datetime("2012-01-01")
+                statement = parser.parse_parallel(workers=2, chunk_size=100)
+
+        self.assertEqual(len(statement.lines), 20)
+        self.assertEqual(statement.lines[0].memo, "Card: Line 1")
+        self.assertEqual(statement.lines[19].memo, "Card: Line 20")
+
+    def test_parse_parallel_file_settings(self) -> None:
+        records = [
+            b'2012-01-%02d,"Line\r\n%d \xff",%d.5,%d\r\n' % (n, n, n, n)
+            for n in range(1, 21)
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "statement.csv")
+            with open(filename, "wb") as f:
+                f.write(b"".join(records))
+
+            with open(filename, encoding="utf-8", errors="replace", newline="") as f:
+                parser = StrictCsvParser(f)
+                statement = parser.parse_parallel(workers=2, chunk_size=100, newline="")
+
+        self.assertEqual(len(statement.lines), 20)
+        self.assertEqual(statement.lines[19].memo, "Line\r\n20 \ufffd")
+
+    def test_parse_parallel_unpicklable(self) -> None:
+        records = [
+            "2012-01-%02d,Line %d,%d.5,%d\n" % (n, n, n, n) for n in range(1, 21)
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "statement.csv")
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write("".join(records))
+
+            # Parser, that cannot be copied to workers, parses sequentially
+            with open(filename, encoding="utf-8") as f:
+                parser = PrefixedCsvParser(f, "Card: ")
+                parser.lock = threading.Lock()  # type: ignore[attr-defined]
+                statement = parser.parse_parallel(workers=2, chunk_size=100)
+
+        self.assertEqual(len(statement.lines), 20)
+        self.assertEqual(statement.lines[19].memo, "Card: Line 20")
+
+    def test_parse_parallel_fallback(self) -> None:
+        # Streams without file are parsed sequentially
+        parser = StrictCsvParser(io.StringIO("2012-01-18,Test,1.5,1\n"))
+        statement = parser.parse_parallel()
+        self.assertEqual(len(statement.lines), 1)
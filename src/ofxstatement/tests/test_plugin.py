@@ -1,17 +1,35 @@
+import os
+import shutil
+import tempfile
 import unittest
 from unittest import mock
 
 import sys
 
 if sys.version_info < (3, 10):
-    from importlib_metadata import EntryPoints
+    from importlib_metadata import EntryPoint, EntryPoints
 else:
-    from importlib.metadata import EntryPoints
+    from importlib.metadata import EntryPoint, EntryPoints
 
 from ofxstatement import plugin
 
 
+class SamplePlugin(plugin.Plugin):
+    """Sample plugin
+
+    Used by the registry tests.
+    """
+
+
 class PluginTest(unittest.TestCase):
+    def setUp(self) -> None:
+        # Look plugins up without the registry cache
+        self.registrypatch = mock.patch.object(plugin, "load_registry", return_value={})
+        self.registrypatch.start()
+
+    def tearDown(self) -> None:
+        self.registrypatch.stop()
+
     def test_get_plugin(self) -> None:
         class SamplePlugin(plugin.Plugin):
             def get_parser(self):
@@ -39,3 +57,63 @@ class PluginTest(unittest.TestCase):
     def test_get_plugin_not_found(self) -> None:
         with self.assertRaises(plugin.PluginNotRegistered):
             plugin.get_plugin("not_existing", mock.Mock("UI"), mock.Mock("Settings"))
+
+
+class PluginRegistryTest(unittest.TestCase):
+    def test_registry(self) -> None:
+        ep = EntryPoint(
+            name="sample",
+            value="ofxstatement.tests.test_plugin:SamplePlugin",
+            group="ofxstatement",
+        )
+        entry_points = mock.Mock(return_value=EntryPoints([ep]))
+
+        with mock.patch("ofxstatement.plugin.entry_points", entry_points):
+            # Registry is built once
+            self.assertEqual(
+                plugin.load_registry(),
+                {
+                    "sample": {
+                        "values": ["ofxstatement.tests.test_plugin:SamplePlugin"],
+                        "version": None,
+                        "title": None,
+                    }
+                },
+            )
+            self.assertTrue(os.path.exists(self.location))
+            p = plugin.get_plugin("sample", mock.Mock("UI"), {})
+            self.assertIsInstance(p, SamplePlugin)
+            self.assertEqual(plugin.list_plugin_titles(), [("sample", "Sample plugin")])
+            self.assertEqual(entry_points.call_count, 1)
+
+            # and rebuilt when packages are installed or removed
+            with mock.patch.object(plugin, "_get_path_stamp", return_value=[]):
+                plugin.load_registry()
+            self.assertEqual(entry_points.call_count, 2)
+
+    def test_registry_stale(self) -> None:
+        ep = EntryPoint(
+            name="sample", value="ofxstatement.tests.missing:Plugin", group="g"
+        )
+        with mock.patch("ofxstatement.plugin.entry_points", return_value=[ep]):
+            plugin.load_registry()
+
+        # Plugins, missing from the registry or removed, are looked up again
+        with mock.patch(
+            "ofxstatement.plugin.entry_points", return_value=EntryPoints([])
+        ) as entry_points:
+            with self.assertRaises(plugin.PluginNotRegistered):
+                plugin.get_plugin("sample", mock.Mock("UI"), {})
+        entry_points.assert_called_with(name="sample")
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.mkdtemp(suffix="ofxstatement")
+        self.location = os.path.join(self.tmpdir, "cache", "plugins.json")
+        self.registrypatch = mock.patch.object(
+            plugin, "get_registry_location", return_value=self.location
+        )
+        self.registrypatch.start()
+
+    def tearDown(self) -> None:
+        self.registrypatch.stop()
+        shutil.rmtree(self.tmpdir)
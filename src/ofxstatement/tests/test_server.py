@@ -0,0 +1,285 @@
+import http.client
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+from unittest import mock
+
+from ofxstatement import cache, conversion, plugin, server
+from ofxstatement.exceptions import ParseError
+from ofxstatement.parser import StatementParser
+from ofxstatement.plugin import Plugin
+from ofxstatement.statement import Statement, StatementLine
+
+
+class LineParser(StatementParser):
+    """Parses "id amount" lines of the file"""
+
+    def __init__(self, filename: str) -> None:
+        super().__init__()
+        self.filename = filename
+        self.statement = Statement("BANK", "ACCOUNT", "EUR")
+
+    def split_records(self):
+        with open(self.filename) as f:
+            return [line.split() for line in f]
+
+    def parse_record(self, line):
+        if len(line) != 2:
+            raise ParseError(self.cur_record, "Malformed line")
+        id, amount = line
+        return StatementLine(id, datetime(2021, 1, 1), "", Decimal(amount))
+
+
+class LinePlugin(Plugin):
+    def get_parser(self, filename: str) -> LineParser:
+        return LineParser(filename)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str) -> None:
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+class ServerTest(unittest.TestCase):
+    server: Any
+
+    def test_convert_body(self) -> None:
+        status, headers, body = self.post("/convert?type=lines", b"1 10\n2 -5.5\n")
+
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["Content-Type"], "application/x-ofx")
+        self.assertEqual(headers["X-Ofxstatement-Lines"], "2")
+        self.assertIn(b"<FITID>2</FITID>", body)
+        self.assertIn(b"<TRNAMT>-5.50</TRNAMT>", body)
+        # Temporary input file is removed
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+    def test_convert_path(self) -> None:
+        self.start(allow_files=True)
+        inputfname = os.path.join(self.tmpdir, "input")
+        with open(inputfname, "w") as f:
+            f.write("3 1\n")
+
+        for _ in range(2):
+            status, _, body = self.post(
+                "/convert?type=lines&pretty=1&path=%s" % inputfname
+            )
+            self.assertEqual(status, 200)
+            self.assertIn(b"  <STMTTRN>", body)
+
+        # Plugin is loaded once
+        self.assertEqual(self.get_plugin.call_count, 1)
+
+    def test_errors(self) -> None:
+        self.start(allow_files=True)
+        status, _, body = self.post("/convert?type=lines", b"1 10\nbad\n")
+        self.assertEqual(status, 422)
+        self.assertEqual(
+            json.loads(body),
+            {"code": 2, "messages": ["Parse error on line 2: Malformed line"]},
+        )
+
+        status, _, body = self.post("/convert", b"")
+        self.assertEqual(status, 400)
+        self.assertEqual(json.loads(body)["code"], 1)
+
+        status, _, body = self.post("/convert?type=lines&path=/nonexistent")
+        self.assertEqual(status, 500)
+        self.assertEqual(json.loads(body)["code"], 1)
+
+        status, _, body = self.post("/other", b"")
+        self.assertEqual(status, 404)
+
+    def test_body_size(self) -> None:
+        self.start()
+        self.server.max_body_size = 8
+
+        status, _, body = self.post("/convert?type=lines", b"1 10\n2 -5.5\n")
+        self.assertEqual(status, 413)
+        self.assertEqual(
+            json.loads(body),
+            {"code": 1, "messages": ["Request body is larger than 8 bytes"]},
+        )
+
+        for length in ["abc", "-1", "1_0"]:
+            status, _, body = self.post(
+                "/convert?type=lines", b"1 10\n", {"Content-Length": length}
+            )
+            self.assertEqual(status, 400)
+            self.assertEqual(json.loads(body)["messages"], ["Invalid Content-Length"])
+
+        status, _, _ = self.post("/convert?type=lines", b"1 10\n")
+        self.assertEqual(status, 200)
+
+    def test_filename(self) -> None:
+        filenames = []
+        get_parser = LinePlugin.get_parser
+
+        def record(plugin: LinePlugin, filename: str) -> LineParser:
+            filenames.append(filename)
+            return get_parser(plugin, filename)
+
+        with mock.patch.object(LinePlugin, "get_parser", record):
+            for query in ["&filename=C:%5Cdata%5Cstatement.TXT", "", "&filename=a.%00"]:
+                status, _, _ = self.post("/convert?type=lines" + query, b"1 1\n")
+                self.assertEqual(status, 200)
+
+        self.assertTrue(filenames[0].endswith(".TXT"), filenames[0])
+        for filename in filenames[1:]:
+            self.assertTrue(filename.endswith(".statement"), filename)
+
+    def test_forbidden(self) -> None:
+        inputfname = os.path.join(self.tmpdir, "input")
+        with open(inputfname, "w") as f:
+            f.write("3 1\n")
+
+        # Files of the server owner are not accessible by default
+        for query in ["path=%s" % inputfname, "only_new=1"]:
+            status, _, body = self.post("/convert?type=lines&" + query, b"1 1\n")
+            self.assertEqual(status, 403)
+            self.assertEqual(
+                json.loads(body)["messages"],
+                ["Parameters 'path' and 'only_new' are not allowed"],
+            )
+
+        # Requests from web pages and for other hosts
+        for headers in [
+            {"Origin": "https://example.com"},
+            {"Host": "attacker.example.com:8765"},
+        ]:
+            status, _, body = self.post("/convert?type=lines", b"1 1\n", headers)
+            self.assertEqual(status, 403)
+            self.assertEqual(json.loads(body), {"code": 1, "messages": ["Forbidden"]})
+
+        status, _, _ = self.post(
+            "/convert?type=lines", b"1 1\n", {"Host": "localhost:8765"}
+        )
+        self.assertEqual(status, 200)
+
+    def test_concurrent(self) -> None:
+        results = []
+        self.start()
+
+        def post(i: int) -> None:
+            status, _, body = self.post("/convert?type=lines", b"%d 1\n" % i)
+            results.append((status, b"<FITID>%d</FITID>" % i in body))
+
+        threads = [threading.Thread(target=post, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, [(200, True)] * 8)
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix sockets not supported")
+    def test_unix_socket(self) -> None:
+        socket_path = os.path.join(self.tmpdir, "ofxstatement.sock")
+        self.start(socket_path=socket_path)
+        self.assertEqual(os.stat(socket_path).st_mode & 0o777, 0o600)
+
+        inputfname = os.path.join(self.tmpdir, "input")
+        with open(inputfname, "w") as f:
+            f.write("1 10\n")
+
+        # Only the owner can connect, so files are allowed
+        conn = UnixHTTPConnection(socket_path)
+        conn.request("POST", "/convert?type=lines&path=%s" % inputfname)
+        response = conn.getresponse()
+        self.assertEqual(response.status, 200)
+        self.assertIn(b"<FITID>1</FITID>", response.read())
+        conn.close()
+
+        self.stop()
+        self.assertFalse(os.path.exists(socket_path))
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix sockets not supported")
+    def test_unix_socket_existing_file(self) -> None:
+        socket_path = os.path.join(self.tmpdir, "some.txt")
+        with open(socket_path, "w") as f:
+            f.write("data")
+
+        with self.assertRaises(FileExistsError):
+            self.start(socket_path=socket_path)
+
+        # Regular file is neither replaced nor removed
+        with open(socket_path) as f:
+            self.assertEqual(f.read(), "data")
+
+        # Socket of a previous server is replaced
+        os.remove(socket_path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(socket_path)
+        sock.close()
+        self.start(socket_path=socket_path)
+        self.assertEqual(os.stat(socket_path).st_mode & 0o777, 0o600)
+
+    def post(
+        self,
+        path: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, Dict[str, Any], bytes]:
+        if self.server is None:
+            self.start()
+        host, port = self.server.server_address[:2]
+        conn = http.client.HTTPConnection(str(host), int(port))
+        try:
+            conn.request("POST", path, body, headers or {})
+            response = conn.getresponse()
+            return response.status, dict(response.getheaders()), response.read()
+        finally:
+            conn.close()
+
+    def start(self, **kwargs: Any) -> None:
+        converter = conversion.Converter()
+        self.server = server.make_server(converter, port=0, workers=4, **kwargs)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.01,))
+        self.thread.start()
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.thread.join()
+            self.server.server_close()
+            self.server = None
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.mkdtemp(suffix="ofxstatement")
+        self.server = None
+        self.get_plugin = mock.Mock(
+            side_effect=lambda name, ui, settings: LinePlugin(ui, settings)
+        )
+        patches: List[Any] = [
+            mock.patch("ofxstatement.configuration.read", return_value=None),
+            mock.patch("ofxstatement.plugin.get_plugin", self.get_plugin),
+            mock.patch.object(tempfile, "tempdir", self.tmpdir),
+            mock.patch.object(
+                cache,
+                "get_default_location",
+                return_value=os.path.join(self.tmpdir, "cache"),
+            ),
+            mock.patch.object(
+                plugin,
+                "get_registry_location",
+                return_value=os.path.join(self.tmpdir, "plugins.json"),
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self) -> None:
+        self.stop()
+        shutil.rmtree(self.tmpdir)
@@ -0,0 +1,115 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from typing import Dict, List
+
+# Time (in milliseconds) ofxstatement may spend importing modules on startup,
+# can be overridden with OFXSTATEMENT_IMPORT_BUDGET_MS environment variable
+IMPORT_BUDGET_MS = 250
+
+SCRIPT = "import sys; from ofxstatement import tool; sys.exit(tool.run(sys.argv[1:]))"
+
+
+class StartupTest(unittest.TestCase):
+    def test_help(self) -> None:
+        imported = self.run_tool(["--help"])
+        self.assertNotImported(
+            imported,
+            [
+                "ofxstatement.configuration",
+                "ofxstatement.ofx",
+                "ofxstatement.plugin",
+                "importlib.metadata",
+                "platformdirs",
+                "platform",
+                "shlex",
+                "subprocess",
+                "xml.etree.ElementTree",
+            ],
+        )
+
+    def test_convert_noop(self) -> None:
+        # Conversion stops before the plugin is loaded
+        imported = self.run_tool(["convert", "-t", "missing", "input", "output"])
+        self.assertIn("ofxstatement.plugin", imported)
+        self.assertNotImported(
+            imported,
+            [
+                "ofxstatement.ofx",
+                "concurrent.futures.process",
+                "shlex",
+                "sqlite3",
+                "subprocess",
+                "xml.etree.ElementTree",
+            ],
+        )
+
+    def test_library(self) -> None:
+        # Library modules don't depend on the command line tool
+        script = (
+            "import sys; "
+            "from ofxstatement import aio, batch, conversion, metrics, server; "
+            "print('ofxstatement.tool' in sys.modules)"
+        )
+        proc = subprocess.run(
+            [sys.executable, "-c", script],
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+        self.assertEqual(proc.stdout, "False\n")
+
+    def run_tool(self, argv: List[str]) -> Dict[str, int]:
+        """Run ofxstatement with given arguments in a new interpreter
+
+        Return cumulative import times (in microseconds) of modules imported
+        by ofxstatement, the budget is checked as well.
+        """
+        env = dict(os.environ, XDG_CONFIG_HOME=self.tmpdir, XDG_CACHE_HOME=self.tmpdir)
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", SCRIPT] + argv,
+            env=env,
+            cwd=self.tmpdir,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+
+        imported: Dict[str, int] = {}
+        total = 0
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            _, cumulative, name = line.split("|")
+            if not cumulative.strip().isdigit():
+                continue  # header
+            if name.strip() == "site":
+                # Interpreter startup is over
+                imported.clear()
+                total = 0
+                continue
+            imported[name.strip()] = int(cumulative)
+            if not name.startswith("  "):
+                # top level import
+                total += int(cumulative)
+
+        budget = int(os.environ.get("OFXSTATEMENT_IMPORT_BUDGET_MS", IMPORT_BUDGET_MS))
+        self.assertIn("ofxstatement.tool", imported)
+        self.assertLess(
+            total / 1000,
+            budget,
+            "Imports took %d ms, more than %d ms budget" % (total / 1000, budget),
+        )
+        return imported
+
+    def assertNotImported(self, imported: Dict[str, int], modules: List[str]) -> None:
+        self.assertEqual([name for name in modules if name in imported], [])
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.mkdtemp(suffix="ofxstatement")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmpdir)
@@ -1,9 +1,10 @@
-from typing import Set
+from typing import Optional, Set
+import pickle
 import unittest
 from datetime import datetime
 from decimal import Decimal
 
-from ofxstatement import statement
+from ofxstatement import exceptions, statement
 
 
 class StatementTests(unittest.TestCase):
@@ -51,6 +52,46 @@ class StatementTests(unittest.TestCase):
         self.assertTrue(tid2.endswith("-1"))
         self.assertEqual(len(txnids), 2)
 
+    def test_assign_transaction_ids(self) -> None:
+        # GIVEN
+        def make_statement() -> statement.Statement:
+            stmt = statement.Statement()
+            for n in range(5):
+                stmt.lines.append(
+                    statement.StatementLine(
+                        None, datetime(2020, 3, 25), "memo %d" % (n % 2), Decimal(1)
+                    )
+                )
+            stmt.lines.append(statement.StatementLine(None, datetime(2020, 3, 26)))
+            stmt.lines[1].id = "native"
+            return stmt
+
+        stmt = make_statement()
+        txnids: Set[str] = set()
+        expected = [
+            statement.generate_unique_transaction_id(line, txnids)
+            for line in stmt.lines
+            if not line.id
+        ]
+
+        # WHEN
+        statement.assign_transaction_ids(stmt)
+
+        # THEN
+        # Ids are compatible with generate_unique_transaction_id()
+        ids = [line.id or "" for line in stmt.lines]
+        self.assertEqual(ids[1], "native")
+        self.assertEqual(ids[:1] + ids[2:], expected)
+        self.assertTrue(ids[4].endswith("2-2"))
+
+        # Fast ids are shorter, but unique as well
+        stmt = make_statement()
+        statement.assign_transaction_ids(stmt, fast=True)
+        ids = [line.id or "" for line in stmt.lines]
+        self.assertEqual(len(set(ids)), 6)
+        self.assertEqual(len(ids[0]), 32)
+        self.assertEqual(ids[4], ids[0] + "2-2")
+
     def test_transfer_line_validation(self) -> None:
         line = statement.InvestStatementLine("id", datetime(2020, 3, 25))
         line.trntype = "TRANSFER"
@@ -154,3 +195,146 @@ class StatementTests(unittest.TestCase):
         with self.assertRaises(AssertionError):
             line.security_id = None
             line.assert_valid()
+
+    def test_compact_statement_line(self) -> None:
+        line = statement.CompactStatementLine(
+            "one", datetime(2020, 3, 25), memo="123", amount=Decimal("12.43")
+        )
+        # Class-level defaults are kept
+        self.assertEqual(line.trntype, "CHECK")
+        self.assertEqual(statement.CompactStatementLine.trntype, "CHECK")
+        self.assertIsNone(line.bank_account_to)
+        self.assertIsNone(line.payee)
+        line.bank_account_to = statement.CompactBankAccount("BANK", "ACCT")
+        line.assert_valid()
+
+        # There is no per-instance dictionary, so only known fields can be set
+        self.assertFalse(hasattr(line, "__dict__"))
+        with self.assertRaises(AttributeError):
+            line.unknown = "value"  # type: ignore
+
+        # Compact lines are interchangeable with the regular ones
+        regular = statement.StatementLine(
+            "one", datetime(2020, 3, 25), memo="123", amount=Decimal("12.43")
+        )
+        self.assertEqual(
+            statement.generate_transaction_id(line),
+            statement.generate_transaction_id(regular),
+        )
+        self.assertIn("'memo': '123'", repr(line))
+        # but are not instances of the regular class
+        self.assertNotIsInstance(line, statement.StatementLine)
+
+    def test_compact_invest_line_validation(self) -> None:
+        line = statement.CompactInvestStatementLine(
+            "id", datetime(2020, 3, 25), trntype="INCOME", trntype_detailed="DIV"
+        )
+        self.assertIsNone(line.fees)
+        line.amount = Decimal(1)
+        line.security_id = "AAPL"
+        line.assert_valid()
+        with self.assertRaises(AssertionError):
+            line.security_id = None
+            line.assert_valid()
+
+    def test_make_compact_subclass(self) -> None:
+        class MyLine(statement.StatementLine):
+            fee: Optional[Decimal] = None
+            trntype = "DEBIT"
+
+            def __init__(self, id: str, fee: Decimal) -> None:
+                super().__init__(id, datetime(2020, 3, 25), amount=Decimal(-1))
+                self.fee = fee
+
+            def assert_valid(self) -> None:
+                super().assert_valid()
+                assert self.fee is not None
+
+            @property
+            def payee_name(self) -> str:
+                return super().__str__() if self.payee is None else self.payee
+
+        CompactMyLine = statement.make_compact(MyLine)
+        line = CompactMyLine("1", Decimal("0.5"))
+        self.assertEqual(CompactMyLine.trntype, "DEBIT")
+        self.assertIn("ID: 1", line.payee_name)
+
+        self.assertEqual(
+            (line.id, line.fee, line.trntype), ("1", Decimal("0.5"), "DEBIT")
+        )
+        line.assert_valid()
+        line.fee = None
+        with self.assertRaises(AssertionError):
+            line.assert_valid()
+        self.assertIsInstance(line, statement.CompactStatementLine)
+        self.assertFalse(hasattr(line, "__dict__"))
+        self.assertIn("'fee': None", repr(line))
+        self.assertIs(statement.make_compact(MyLine), CompactMyLine)
+
+    def test_line_list_aggregates(self) -> None:
+        # GIVEN
+        usd = statement.Currency("USD")
+        lines = statement.LineList(
+            [
+                statement.StatementLine("1", datetime(2020, 3, 1), amount=Decimal(10)),
+                statement.StatementLine("2", datetime(2020, 3, 5), amount=Decimal(-3)),
+            ]
+        )
+        foreign = statement.StatementLine("3", datetime(2020, 3, 9), amount=Decimal(5))
+        foreign.currency = usd
+
+        # WHEN
+        lines.append(foreign)
+        lines += [statement.StatementLine("4", None, amount=Decimal("0.5"))]
+
+        # THEN
+        self.assertEqual(lines.total_amount(), Decimal("12.5"))
+        self.assertEqual(
+            lines.currency_totals(), {None: Decimal("7.5"), "USD": Decimal(5)}
+        )
+        self.assertEqual(lines.min_date(), datetime(2020, 3, 1))
+        self.assertEqual(lines.max_date(), datetime(2020, 3, 9))
+
+        # Removing the latest line updates date range
+        self.assertIs(lines.pop(2), foreign)
+        self.assertEqual(lines.total_amount(), Decimal("7.5"))
+        self.assertEqual(lines.currency_totals()["USD"], Decimal(0))
+        self.assertEqual(lines.max_date(), datetime(2020, 3, 5))
+
+        del lines[0]
+        lines[0] = statement.StatementLine("5", datetime(2020, 4, 1), amount=Decimal(1))
+        self.assertEqual(lines.total_amount(), Decimal("1.5"))
+        self.assertEqual(lines.min_date(), datetime(2020, 4, 1))
+
+        # In-place changes are picked up by refresh()
+        lines[0].amount = Decimal(2)
+        lines.refresh()
+        self.assertEqual(lines.total_amount(), Decimal("2.5"))
+
+        del lines[:]
+        self.assertEqual(lines.total_amount(), Decimal(0))
+        self.assertIsNone(lines.min_date())
+
+    def test_line_list_statement(self) -> None:
+        stmt = statement.Statement("BANK", "ACCOUNT", "EUR")
+        stmt.lines = statement.LineList()
+        stmt.lines.append(
+            statement.StatementLine("1", datetime(2020, 3, 1), amount=Decimal(10))
+        )
+        stmt.lines.append(
+            statement.StatementLine("2", datetime(2020, 3, 5), amount=Decimal(-3))
+        )
+
+        statement.recalculate_balance(stmt)
+        self.assertEqual(stmt.end_balance, Decimal(7))
+        self.assertEqual(stmt.end_date, datetime(2020, 3, 5))
+        stmt.assert_valid()
+
+        stmt.lines.pop()
+        with self.assertRaises(exceptions.ValidationError):
+            stmt.assert_valid()
+
+        # Aggregates survive copying
+        copied = pickle.loads(pickle.dumps(stmt.lines))
+        self.assertIsInstance(copied, statement.LineList)
+        self.assertEqual(copied.total_amount(), Decimal(10))
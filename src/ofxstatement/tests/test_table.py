@@ -0,0 +1,170 @@
+from typing import List
+import copy
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from ofxstatement import ofx, table
+from ofxstatement.exceptions import ValidationError
+from ofxstatement.statement import (
+    BankAccount,
+    Statement,
+    StatementLine,
+    recalculate_balance,
+)
+
+
+def make_lines() -> List[StatementLine]:
+    lines = [
+        StatementLine("1", datetime(2020, 3, 25), "Groceries", Decimal("-12.43")),
+        StatementLine("2", datetime(2020, 3, 1, 10, 30), "Salary", Decimal("1000")),
+        StatementLine("3", None, "Undated", Decimal("0.5")),
+        StatementLine("4", datetime(2020, 3, 10), "Unknown amount", None),
+    ]
+    lines[0].payee = "Shop"
+    lines[1].trntype = "DIRECTDEP"
+    lines[1].bank_account_to = BankAccount("BANK", "ACCOUNT")
+    return lines
+
+
+class StatementTableTests(unittest.TestCase):
+    def test_rows(self) -> None:
+        lines = make_lines()
+        tbl = table.StatementTable(lines)
+
+        self.assertEqual(len(tbl), 4)
+        for line, row in zip(lines, tbl):
+            self.assertEqual(row.id, line.id)
+            self.assertEqual(row.date, line.date)
+            self.assertEqual(str(row.amount), str(line.amount))
+            self.assertEqual(row.payee, line.payee)
+            self.assertEqual(row.trntype, line.trntype)
+            self.assertIs(row.bank_account_to, line.bank_account_to)
+            self.assertIsNone(row.check_no)
+        self.assertEqual(tbl[-1].id, "4")
+
+        # rows can be modified in place
+        tbl[0].amount = Decimal("-2.5")
+        tbl[0].check_no = "101"
+        self.assertEqual(tbl[0].amount, Decimal("-2.5"))
+        self.assertEqual(tbl[0].to_line().check_no, "101")
+        tbl[0].assert_valid()
+
+    def test_copy_row(self) -> None:
+        tbl = table.StatementTable(make_lines())
+        row = copy.copy(tbl[1])
+        self.assertEqual((row.table, row.index), (tbl, 1))
+        self.assertEqual(row.memo, "Salary")
+        self.assertEqual(copy.deepcopy(tbl[0]).memo, "Groceries")
+
+    def test_list_operations(self) -> None:
+        tbl = table.StatementTable(make_lines())
+
+        self.assertEqual([row.id for row in tbl[1:3]], ["2", "3"])
+        self.assertEqual([row.id for row in tbl[::-2]], ["4", "2"])
+        self.assertEqual(tbl[1:].total_amount(), Decimal("1000.5"))
+        extra = StatementLine("5", datetime(2020, 3, 2), "Extra", Decimal(1))
+        self.assertEqual([row.id for row in tbl + [extra]], list("12345"))
+        self.assertEqual([line.id for line in [extra] + tbl], list("51234"))
+        self.assertEqual(len(tbl), 4)
+
+        line = tbl.pop(1)
+        self.assertEqual((line.id, line.memo), ("2", "Salary"))
+        assert line.bank_account_to is not None
+        self.assertEqual(line.bank_account_to.acct_id, "ACCOUNT")
+        tbl.remove(tbl[-1])
+        self.assertEqual([row.id for row in tbl], ["1", "3"])
+        self.assertEqual(tbl.total_amount(), Decimal("-11.93"))
+        self.assertEqual(tbl.min_date(), datetime(2020, 3, 25))
+        self.assertIsNone(tbl.sparse["bank_account_to"].get(0))
+        with self.assertRaises(ValueError):
+            tbl.remove(make_lines()[0])
+
+        del tbl[0]
+        self.assertEqual(tbl.min_date(), None)
+        tbl.clear()
+        self.assertEqual(len(tbl), 0)
+        self.assertEqual(tbl.total_amount(), Decimal(0))
+
+    def test_add_invalid(self) -> None:
+        tbl = table.StatementTable()
+        tbl.add("1", None)
+        # Rejected rows don't change any column
+        with self.assertRaises(ValueError):
+            tbl.add("2", datetime(2020, 3, 25), amount=Decimal("1e200"))
+        with self.assertRaises(TypeError):
+            tbl.add("2", datetime(2020, 3, 25), unknown="value")
+        self.assertEqual(len(tbl), 1)
+        self.assertEqual(len(tbl.dates), 1)
+        self.assertEqual(len(tbl.amount_coefs), 1)
+        self.assertEqual(tbl.max_date(), None)
+
+        tz = timezone(timedelta(hours=2))
+        tbl.add("2", datetime(2020, 3, 25, tzinfo=tz))
+        self.assertEqual(tbl.tzinfo, tz)
+
+    def test_aggregates(self) -> None:
+        tbl = table.StatementTable(make_lines())
+        for numpy in (table.numpy, None):
+            with mock.patch.object(table, "numpy", numpy):
+                self.assertEqual(tbl.total_amount(), Decimal("988.07"))
+                self.assertEqual(tbl.min_date(), datetime(2020, 3, 1, 10, 30))
+                self.assertEqual(tbl.max_date(), datetime(2020, 3, 25))
+
+                march = tbl.between(datetime(2020, 3, 2), datetime(2020, 3, 25))
+                self.assertEqual([row.id for row in march], ["4"])
+                self.assertEqual(march.total_amount(), Decimal(0))
+
+    def test_total_amount_overflow(self) -> None:
+        tbl = table.StatementTable()
+        for id in "123":
+            tbl.add(id, datetime(2020, 3, 25), amount=Decimal(5 * 10**18))
+        tbl.add("4", datetime(2020, 3, 25), amount=Decimal("0.5"))
+        for numpy in (table.numpy, None):
+            with mock.patch.object(table, "numpy", numpy):
+                self.assertEqual(tbl.total_amount(), Decimal("15000000000000000000.5"))
+
+    def test_timezones(self) -> None:
+        tz = timezone(timedelta(hours=2))
+        tbl = table.StatementTable()
+        tbl.append(StatementLine("1", datetime(2020, 3, 25, tzinfo=tz)))
+        self.assertEqual(tbl[0].date.utcoffset(), timedelta(hours=2))
+
+        with self.assertRaises(ValueError):
+            tbl.append(StatementLine("2", datetime(2020, 3, 25)))
+
+        # tzinfo is taken from the first dated row
+        tbl = table.StatementTable()
+        tbl.add("1", None)
+        tbl.add("2", datetime(2020, 3, 25, tzinfo=tz))
+        tbl.add("3", datetime(2020, 3, 26, tzinfo=tz))
+        self.assertEqual(tbl.tzinfo, tz)
+        tbl = table.StatementTable()
+        tbl.add("1", None)
+        tbl[0].date = datetime(2020, 3, 25, tzinfo=tz)
+        self.assertEqual(tbl[0].date, datetime(2020, 3, 25, tzinfo=tz))
+
+    def test_statement(self) -> None:
+        stmt = Statement("BANK", "ACCOUNT", "EUR")
+        stmt.lines = table.StatementTable(make_lines())  # type: ignore
+        stmt.start_balance = Decimal(10)
+        stmt.end_balance = Decimal(10)
+        with self.assertRaises(ValidationError):
+            stmt.assert_valid()
+
+        recalculate_balance(stmt)
+        self.assertEqual(stmt.end_balance, Decimal("998.07"))
+        self.assertEqual(stmt.start_date, datetime(2020, 3, 1, 10, 30))
+        stmt.assert_valid()
+
+        # Table rows are written the same way as regular lines
+        writer = ofx.OfxWriter(stmt)
+        writer.genTime = datetime(2020, 4, 1)
+        expected = Statement("BANK", "ACCOUNT", "EUR")
+        expected.lines = make_lines()
+        expected.start_balance = Decimal(10)
+        recalculate_balance(expected)
+        expected_writer = ofx.OfxWriter(expected)
+        expected_writer.genTime = datetime(2020, 4, 1)
+        self.assertEqual(writer.toxml(), expected_writer.toxml())
@@ -1,22 +1,45 @@
 import os
 import platform
+import pstats
 import unittest
 import tempfile
 import io
 import logging
 import logging.handlers
 import shutil
-from typing import Dict
+from typing import Dict, Iterator
 from unittest import mock
-
-from ofxstatement import tool, statement, configuration, parser, exceptions
+from datetime import datetime
+from decimal import Decimal
+
+from ofxstatement import (
+    cache,
+    tool,
+    statement,
+    configuration,
+    parser,
+    exceptions,
+    ofx,
+    plugin,
+    txnstore,
+)
 
 
 class ToolTests(unittest.TestCase):
     def test_convert_configured(self) -> None:
         inputfname = os.path.join(self.tmpdir, "input")
         outputfname = os.path.join(self.tmpdir, "output")
-        args = mock.Mock(type="test", input=inputfname, output=outputfname)
+        args = mock.Mock(
+            type="test",
+            input=inputfname,
+            output=outputfname,
+            only_new=False,
+            no_cache=True,
+            profile=None,
+            metrics=None,
+            mem_report=False,
+            mem_budget=None,
+        )
 
         config = {"test": {"plugin": "sample"}}
 
@@ -44,7 +67,17 @@ class ToolTests(unittest.TestCase):
     def test_convert_noconf(self) -> None:
         inputfname = os.path.join(self.tmpdir, "input")
         outputfname = os.path.join(self.tmpdir, "output")
-        args = mock.Mock(type="test", input=inputfname, output=outputfname)
+        args = mock.Mock(
+            type="test",
+            input=inputfname,
+            output=outputfname,
+            only_new=False,
+            no_cache=True,
+            profile=None,
+            metrics=None,
+            mem_report=False,
+            mem_budget=None,
+        )
 
         parser = mock.Mock()
         parser.parse.return_value = statement.Statement()
@@ -93,13 +126,340 @@ class ToolTests(unittest.TestCase):
             ["ERROR: Parse error on line 23: Catastrophic error"],
         )
 
+    def test_convert_only_new(self) -> None:
+        inputfname = os.path.join(self.tmpdir, "input")
+        outputfname = os.path.join(self.tmpdir, "output")
+        storefname = os.path.join(self.tmpdir, "data", "transactions.sqlite")
+
+        def make_statement(ids):
+            stmt = statement.Statement("BANK", "ACCOUNT")
+            for id in ids:
+                stmt.lines.append(
+                    statement.StatementLine(id, datetime(2021, 1, 1), "", Decimal(1))
+                )
+            stmt.start_balance = Decimal(10)
+            stmt.end_balance = Decimal(10 + len(ids))
+            return stmt
+
+        sample_plugin = mock.Mock()
+        noconfigpatch = mock.patch("ofxstatement.configuration.read", return_value=None)
+        pluginpatch = mock.patch(
+            "ofxstatement.plugin.get_plugin", return_value=sample_plugin
+        )
+        storepatch = mock.patch.object(
+            txnstore, "get_default_location", return_value=storefname
+        )
+        argv = ["convert", "-t", "test", "--only-new", inputfname, outputfname]
+
+        with noconfigpatch, pluginpatch, storepatch:
+            sample_plugin.get_parser().parse.return_value = make_statement(["1", "2"])
+            self.assertEqual(tool.run(argv), 0)
+            sample_plugin.get_parser().parse.return_value = make_statement(
+                ["1", "2", "3"]
+            )
+            self.assertEqual(tool.run(argv), 0)
+
+        with open(outputfname) as f:
+            output = f.read()
+        self.assertNotIn("<FITID>1</FITID>", output)
+        self.assertIn("<FITID>3</FITID>", output)
+        self.assertIn("<BALAMT>13.00</BALAMT>", output)
+        self.assertEqual(
+            self.log.getvalue().splitlines()[-2:],
+            [
+                "INFO: Skipping 2 already exported transactions",
+                "INFO: Conversion completed: (1 line, 0 invest-lines) %s" % inputfname,
+            ],
+        )
+
+    def test_convert_only_new_write_failed(self) -> None:
+        inputfname = os.path.join(self.tmpdir, "input")
+        outputfname = os.path.join(self.tmpdir, "missing", "output")
+        storefname = os.path.join(self.tmpdir, "transactions.sqlite")
+
+        stmt = statement.Statement("BANK", "ACCOUNT")
+        stmt.lines.append(
+            statement.StatementLine("1", datetime(2021, 1, 1), "", Decimal(1))
+        )
+        sample_plugin = mock.Mock()
+        sample_plugin.get_parser().parse.return_value = stmt
+        close = mock.Mock(side_effect=txnstore.TransactionStore.close)
+        noconfigpatch = mock.patch("ofxstatement.configuration.read", return_value=None)
+        pluginpatch = mock.patch(
+            "ofxstatement.plugin.get_plugin", return_value=sample_plugin
+        )
+        storepatch = mock.patch.object(
+            txnstore, "get_default_location", return_value=storefname
+        )
+        closepatch = mock.patch.object(
+            txnstore.TransactionStore, "close", lambda self: close(self)
+        )
+        argv = ["convert", "-t", "test", "--only-new", inputfname, outputfname]
+
+        with noconfigpatch, pluginpatch, storepatch, closepatch:
+            with self.assertRaises(FileNotFoundError):
+                tool.run(argv)
+
+        # Store is closed and the transaction is not marked as exported
+        close.assert_called_once()
+        with txnstore.TransactionStore(storefname) as store:
+            self.assertEqual(store.seen("BANK//ACCOUNT", ["1"]), set())
+
+    def test_convert_cached(self) -> None:
+        inputfname = os.path.join(self.tmpdir, "input")
+        outputfname = os.path.join(self.tmpdir, "output")
+        with open(inputfname, "w") as f:
+            f.write("input")
+
+        stmt = statement.Statement("BANK", "ACCOUNT")
+        stmt.lines.append(
+            statement.StatementLine("1", datetime(2021, 1, 1), "", Decimal(1))
+        )
+        sample_plugin = mock.Mock()
+        sample_plugin.get_parser().parse.return_value = stmt
+        noconfigpatch = mock.patch("ofxstatement.configuration.read", return_value=None)
+        get_plugin = mock.Mock(return_value=sample_plugin)
+        pluginpatch = mock.patch("ofxstatement.plugin.get_plugin", get_plugin)
+        argv = ["convert", "-t", "test", inputfname, outputfname]
+
+        with noconfigpatch, pluginpatch:
+            self.assertEqual(tool.run(argv), 0)
+            with open(outputfname) as f:
+                output = f.read()
+            os.remove(outputfname)
+
+            # The same input is not converted again
+            self.assertEqual(tool.run(argv), 0)
+            self.assertEqual(get_plugin.call_count, 1)
+            with open(outputfname) as f:
+                self.assertEqual(f.read(), output)
+
+            # unless requested explicitly or the input changes
+            self.assertEqual(tool.run(argv[:1] + ["--no-cache"] + argv[1:]), 0)
+            self.assertEqual(get_plugin.call_count, 2)
+            with open(inputfname, "w") as f:
+                f.write("changed input")
+            self.assertEqual(tool.run(argv), 0)
+            self.assertEqual(get_plugin.call_count, 3)
+
+        self.assertEqual(
+            self.log.getvalue().splitlines(),
+            ["INFO: Conversion completed: (1 line, 0 invest-lines) %s" % inputfname]
+            * 4,
+        )
+
+    def test_convert_cache_failure(self) -> None:
+        inputfname = os.path.join(self.tmpdir, "input")
+        outputfname = os.path.join(self.tmpdir, "output")
+        with open(inputfname, "w") as f:
+            f.write("input")
+
+        sample_plugin = mock.Mock()
+        sample_plugin.get_parser().parse.return_value = statement.Statement()
+        noconfigpatch = mock.patch("ofxstatement.configuration.read", return_value=None)
+        pluginpatch = mock.patch(
+            "ofxstatement.plugin.get_plugin", return_value=sample_plugin
+        )
+        # Cache location can't be created
+        cachepatch = mock.patch.object(
+            cache, "get_default_location", return_value=os.path.join(inputfname, "x")
+        )
+
+        with noconfigpatch, pluginpatch, cachepatch:
+            self.assertEqual(
+                tool.run(["convert", "-t", "test", inputfname, outputfname]), 0
+            )
+
+        self.assertTrue(os.path.exists(outputfname))
+
+    def test_cache_evict_concurrently(self) -> None:
+        outputcache = cache.OutputCache(os.path.join(self.tmpdir, "cache"), max_size=0)
+        os.makedirs(outputcache.location)
+        for key in ["a", "b"]:
+            for fname in outputcache._paths(key):
+                with open(fname, "w") as f:
+                    f.write("data")
+
+        entries = list(os.scandir(outputcache.location))
+        # Entry is removed by another process after the directory is listed
+        os.remove(os.path.join(outputcache.location, "a.ofx"))
+        with mock.patch("os.scandir") as scandir:
+            scandir.return_value.__enter__.return_value = entries
+            outputcache.evict()
+
+        self.assertEqual(os.listdir(outputcache.location), ["a.json"])
+
+    def test_convert_profile(self) -> None:
+        inputfname = os.path.join(self.tmpdir, "input")
+        outputfname = os.path.join(self.tmpdir, "output")
+        proffname = os.path.join(self.tmpdir, "out.prof")
+        with open(inputfname, "w") as f:
+            f.write("input")
+
+        sample_plugin = mock.Mock()
+        sample_plugin.get_parser().parse.return_value = statement.Statement()
+        noconfigpatch = mock.patch("ofxstatement.configuration.read", return_value=None)
+        pluginpatch = mock.patch(
+            "ofxstatement.plugin.get_plugin", return_value=sample_plugin
+        )
+        stderr = io.StringIO()
+        argv = ["convert", "-t", "test", "--profile", proffname, inputfname]
+
+        with noconfigpatch, pluginpatch:
+            with mock.patch("sys.stderr", stderr):
+                self.assertEqual(tool.run(argv + [outputfname]), 0)
+            with mock.patch("sys.stderr", stderr):
+                argv.insert(1, "--profile-stages")
+                self.assertEqual(tool.run(argv + [outputfname]), 0)
+
+        stages = ["config", "plugin", "parse", "validate", "serialize", "write"]
+        self.assertGreater(pstats.Stats(proffname).total_calls, 0)  # type: ignore
+        for stage in stages:
+            pstats.Stats(os.path.join(self.tmpdir, "out.%s.prof" % stage))
+        summary = stderr.getvalue().splitlines()
+        self.assertEqual(
+            [line.split(":")[0] for line in summary if not line.startswith(" ")],
+            ["Conversion profile (cumulative time, own time, calls, function)"]
+            + stages
+            + ["Conversion profile (cumulative time, own time, calls, function)"]
+            + stages,
+        )
+        # Profiled conversion doesn't use cache
+        self.assertEqual(
+            self.log.getvalue().splitlines()[-1],
+            "INFO: Conversion completed: (0 lines, 0 invest-lines) %s" % inputfname,
+        )
+        self.assertEqual(sample_plugin.get_parser().parse.call_count, 2)
+
+    def test_convert_mem_report(self) -> None:
+        inputfname = os.path.join(self.tmpdir, "input")
+        outputfname = os.path.join(self.tmpdir, "output")
+        with open(inputfname, "w") as f:
+            f.write("input")
+
+        def parse() -> statement.Statement:
+            stmt = statement.Statement()
+            stmt.lines = [
+                statement.StatementLine(str(i), datetime(2024, 1, 1), "", Decimal(1))
+                for i in range(1000)
+            ]
+            return stmt
+
+        sample_plugin = mock.Mock()
+        sample_plugin.get_parser().parse.side_effect = parse
+        noconfigpatch = mock.patch("ofxstatement.configuration.read", return_value=None)
+        pluginpatch = mock.patch(
+            "ofxstatement.plugin.get_plugin", return_value=sample_plugin
+        )
+        stderr = io.StringIO()
+        argv = ["convert", "-t", "test", "--mem-report", inputfname, outputfname]
+
+        with noconfigpatch, pluginpatch, mock.patch("sys.stderr", stderr):
+            self.assertEqual(tool.run(argv), 0)
+
+        summary = stderr.getvalue().splitlines()
+        headers = [line.split(":")[0] for line in summary if not line.startswith(" ")]
+        self.assertEqual(
+            headers[:-1],
+            [
+                "Conversion memory (peak traced memory by stage)",
+                "config",
+                "plugin",
+                "parse",
+                "validate",
+                "serialize",
+                "write",
+            ],
+        )
+        self.assertTrue(headers[-1].startswith("Top allocation sites"))
+        # Statement lines, allocated by the parser, are among the top sites
+        self.assertTrue(any("test_tool.py" in line for line in summary[-10:]))
+
+    def test_convert_mem_budget(self) -> None:
+        inputfname = os.path.join(self.tmpdir, "input")
+        with open(inputfname, "w") as f:
+            f.write("input")
+
+        blocks = []
+
+        def parse() -> statement.Statement:
+            blocks.append(bytearray(20 * 2**20))
+            return statement.Statement()
+
+        sample_plugin = mock.Mock()
+        sample_plugin.get_parser().parse.side_effect = parse
+        noconfigpatch = mock.patch("ofxstatement.configuration.read", return_value=None)
+        pluginpatch = mock.patch(
+            "ofxstatement.plugin.get_plugin", return_value=sample_plugin
+        )
+        argv = ["convert", "-t", "test", "--mem-budget", "10M", inputfname, "-"]
+
+        with noconfigpatch, pluginpatch:
+            self.assertEqual(tool.run(argv), 3)
+
+        self.assertEqual(
+            self.log.getvalue().splitlines(),
+            ["ERROR: Memory budget of 10.0 MiB exceeded in parse stage"],
+        )
+
+    def test_convert_mem_budget_write(self) -> None:
+        inputfname = os.path.join(self.tmpdir, "input")
+        outputfname = os.path.join(self.tmpdir, "output")
+        with open(inputfname, "w") as f:
+            f.write("input")
+
+        blocks = []
+
+        def iter_chunks(pretty: bool, encoding: str) -> Iterator[str]:
+            yield "<OFX>"
+            blocks.append(bytearray(20 * 2**20))
+            yield "</OFX>"
+
+        sample_plugin = mock.Mock()
+        sample_plugin.get_parser().parse.return_value = statement.Statement()
+        noconfigpatch = mock.patch("ofxstatement.configuration.read", return_value=None)
+        pluginpatch = mock.patch(
+            "ofxstatement.plugin.get_plugin", return_value=sample_plugin
+        )
+        chunkspatch = mock.patch.object(
+            ofx.OfxWriter, "iter_chunks", side_effect=iter_chunks
+        )
+        argv = ["convert", "-t", "test", "--mem-budget", "10M", inputfname]
+
+        with noconfigpatch, pluginpatch, chunkspatch:
+            self.assertEqual(tool.run(argv + [outputfname]), 3)
+
+        self.assertEqual(
+            self.log.getvalue().splitlines(),
+            ["ERROR: Memory budget of 10.0 MiB exceeded in serialize stage"],
+        )
+        # Partially written output is removed
+        self.assertFalse(os.path.exists(outputfname))
+
+    def test_convert_mem_budget_invalid(self) -> None:
+        stderr = io.StringIO()
+        argv = ["convert", "-t", "test", "--mem-budget", "lots", "in", "out"]
+
+        with mock.patch("sys.stderr", stderr), self.assertRaises(SystemExit):
+            tool.run(argv)
+
+        self.assertIn("Invalid size: LOTS", stderr.getvalue())
+
+    def test_version(self) -> None:
+        outpatch = mock.patch("sys.stdout", self.log)
+        versionpatch = mock.patch.object(tool, "get_version", return_value="1.2.3")
+
+        with outpatch, versionpatch, self.assertRaises(SystemExit) as cm:
+            tool.run(["--version"])
+
+        self.assertEqual(cm.exception.code, 0)
+        self.assertTrue(self.log.getvalue().endswith(" 1.2.3\n"))
+
     def test_list_plugins_plugins(self) -> None:
-        pl1 = mock.Mock(__doc__="Plugin one")
-        pl2 = mock.Mock()
-        plugins = [("pl1", pl1), ("pl2", pl2)]
+        plugins = [("pl1", "Plugin one"), ("pl2", "")]
 
         pluginpatch = mock.patch(
-            "ofxstatement.plugin.list_plugins", return_value=plugins
+            "ofxstatement.plugin.list_plugin_titles", return_value=plugins
         )
         outpatch = mock.patch("sys.stdout", self.log)
 
@@ -117,7 +477,9 @@ class ToolTests(unittest.TestCase):
         )
 
     def test_list_plugins_noplugins(self) -> None:
-        pluginpatch = mock.patch("ofxstatement.plugin.list_plugins", return_value=[])
+        pluginpatch = mock.patch(
+            "ofxstatement.plugin.list_plugin_titles", return_value=[]
+        )
         outpatch = mock.patch("sys.stdout", self.log)
         with pluginpatch, outpatch:
             tool.run(["list-plugins"])
@@ -175,8 +537,22 @@ class ToolTests(unittest.TestCase):
     def setUp(self) -> None:
         self.tmpdir = tempfile.mkdtemp(suffix="ofxstatement")
         self.setUpLogging()
+        self.cachepatch = mock.patch.object(
+            cache,
+            "get_default_location",
+            return_value=os.path.join(self.tmpdir, "cache"),
+        )
+        self.cachepatch.start()
+        self.registrypatch = mock.patch.object(
+            plugin,
+            "get_registry_location",
+            return_value=os.path.join(self.tmpdir, "plugins.json"),
+        )
+        self.registrypatch.start()
 
     def tearDown(self) -> None:
+        self.registrypatch.stop()
+        self.cachepatch.stop()
         self.tearDownLogging()
         shutil.rmtree(self.tmpdir)
 
@@ -0,0 +1,123 @@
+from typing import Any, List
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+from ofxstatement import table, txnstore
+from ofxstatement.statement import (
+    InvestStatementLine,
+    LineList,
+    Statement,
+    StatementLine,
+    generate_transaction_id,
+)
+
+
+class TransactionStoreTests(unittest.TestCase):
+    def test_seen(self) -> None:
+        with txnstore.TransactionStore(self.location) as store:
+            store.add("bank/acc1", ["1", "2"])
+            store.add("bank/acc2", ["3"])
+            # Adding the same ids again is fine
+            store.add("bank/acc1", ["2"])
+
+        # Ids persist between sessions
+        with txnstore.TransactionStore(self.location) as store:
+            self.assertEqual(store.seen("bank/acc1", ["1", "2", "3"]), {"1", "2"})
+            self.assertEqual(store.seen("bank/acc2", ["1", "2", "3"]), {"3"})
+            self.assertEqual(store.seen("bank/acc3", ["1"]), set())
+
+            # Lookups are split into batches
+            ids = [str(n) for n in range(txnstore.BATCH_SIZE * 2 + 1)]
+            store.add("bank/acc3", ids[::2])
+            self.assertEqual(store.seen("bank/acc3", ids), set(ids[::2]))
+
+    def test_remove_exported(self) -> None:
+        stmt = Statement("BANK", "ACCOUNT")
+        stmt.lines = [
+            StatementLine("1", datetime(2021, 1, 1), "", Decimal(1)),
+            StatementLine(None, datetime(2021, 1, 2), "No id", Decimal(2)),
+            StatementLine("3", datetime(2021, 1, 3), "", Decimal(4)),
+        ]
+        stmt.start_balance = Decimal(10)
+        stmt.end_balance = Decimal(17)
+        account = txnstore.get_account_key(stmt)
+        self.assertEqual(account, "BANK//ACCOUNT")
+
+        with txnstore.TransactionStore(self.location) as store:
+            store.add(account, ["1", generate_transaction_id(stmt.lines[1])])
+            new_keys = txnstore.remove_exported(stmt, store)
+
+        self.assertEqual(new_keys, ["3"])
+        self.assertEqual([line.id for line in stmt.lines], ["3"])
+        self.assertEqual(stmt.start_balance, Decimal(13))
+        stmt.assert_valid()
+
+    def test_remove_exported_repeated(self) -> None:
+        # Identical lines without id are different transactions
+        def make_statement(count: int) -> Statement:
+            stmt = Statement("BANK", "ACCOUNT")
+            stmt.lines = [
+                StatementLine(None, datetime(2021, 1, 2), "Coffee", Decimal(-2))
+                for _ in range(count)
+            ]
+            return stmt
+
+        account = "BANK//ACCOUNT"
+        with txnstore.TransactionStore(self.location) as store:
+            stmt = make_statement(2)
+            keys = txnstore.remove_exported(stmt, store)
+            self.assertEqual(len(set(keys)), 2)
+            store.add(account, keys)
+
+            # Only the third coffee of the day is new
+            stmt = make_statement(3)
+            new_keys = txnstore.remove_exported(stmt, store)
+
+        self.assertEqual(len(stmt.lines), 1)
+        self.assertEqual(len(new_keys), 1)
+        self.assertNotIn(new_keys[0], keys)
+
+    def test_remove_exported_containers(self) -> None:
+        def make_lines() -> List[StatementLine]:
+            return [
+                StatementLine(str(n), datetime(2021, 1, n), "", Decimal(n))
+                for n in range(1, 7)
+            ]
+
+        account = "BANK//ACCOUNT"
+        with txnstore.TransactionStore(self.location) as store:
+            store.add(account, ["1", "2", "4", "6", "i1"])
+            containers: List[Any] = [
+                LineList(make_lines()),
+                table.StatementTable(make_lines()),
+            ]
+            for lines in containers:
+                stmt = Statement("BANK", "ACCOUNT")
+                stmt.lines = lines
+                stmt.invest_lines = [
+                    InvestStatementLine("i1", datetime(2021, 1, 1)),
+                    InvestStatementLine("i2", datetime(2021, 1, 2)),
+                ]
+                stmt.start_balance = Decimal(0)
+                stmt.end_balance = Decimal(21)
+
+                new_keys = txnstore.remove_exported(stmt, store)
+
+                self.assertEqual(new_keys, ["3", "5", "i2"])
+                self.assertIs(stmt.lines, lines)
+                self.assertEqual([line.id for line in stmt.lines], ["3", "5"])
+                self.assertEqual(lines.total_amount(), Decimal(8))
+                self.assertEqual(lines.min_date(), datetime(2021, 1, 3))
+                self.assertEqual([line.id for line in stmt.invest_lines], ["i2"])
+                self.assertEqual(stmt.start_balance, Decimal(13))
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.mkdtemp(suffix="ofxstatement")
+        self.location = os.path.join(self.tmpdir, "transactions.sqlite")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.tmpdir)
@@ -1,51 +1,51 @@
-"""Command line tool for converting statements to OFX format"""
+"""Command line tool for converting statements to OFX format
+
+Modules, that are needed only by some of the commands, are imported in the
+command functions, to keep the startup fast.
+"""
 
 import os
 import argparse
-import shlex
-import subprocess
 import logging
-import platform
 import sys
+import time
 import contextlib
 
-if sys.version_info < (3, 10):
-    from importlib_metadata import version
-else:
-    from importlib.metadata import version
-
-
-from ofxstatement import ui, configuration, plugin, ofx, exceptions
-from typing import Optional, TextIO, Generator
+from typing import Any, List, Optional, Tuple
 
+# Helpers, that used to be defined here
+from ofxstatement.util import get_version, smart_open  # noqa: F401
 
 log = logging.getLogger(__name__)
 
 
-@contextlib.contextmanager
-def smart_open(
-    filename: Optional[str] = None, encoding: Optional[str] = None
-) -> Generator[TextIO, None, None]:
-    """See https://stackoverflow.com/questions/17602878/how-to-handle-both-with-open-and-sys-stdout-nicely"""  # noqa
-    fh: TextIO
-
-    if filename and filename != "-":
-        # encoding is required in cases when OS defaults to encoding which
-        # doesn't support unicode characters, for example Windows defaults to
-        # 'cp1252'
-        fh = open(filename, "w", encoding=encoding)
-    else:
-        fh = sys.stdout
-
-    try:
-        yield fh
-    finally:
-        if fh is not sys.stdout:
-            fh.close()
-
+class VersionAction(argparse.Action):
+    """Show version, reading it from package metadata only when requested"""
+
+    def __init__(
+        self,
+        option_strings: List[str],
+        dest: str = argparse.SUPPRESS,
+        default: str = argparse.SUPPRESS,
+        help: Optional[str] = None,
+    ) -> None:
+        super().__init__(
+            option_strings=option_strings,
+            dest=dest,
+            default=default,
+            nargs=0,
+            help=help,
+        )
 
-def get_version() -> str:
-    return version("ofxstatement")
+    def __call__(
+        self,
+        parser: argparse.ArgumentParser,
+        namespace: argparse.Namespace,
+        values: Any,
+        option_string: Optional[str] = None,
+    ) -> None:
+        print("%s %s" % (parser.prog, get_version()))
+        parser.exit()
 
 
 def configure_logging(args: argparse.Namespace) -> None:
@@ -54,14 +54,22 @@ def configure_logging(args: argparse.Namespace) -> None:
     logging.basicConfig(format=format, level=arg_level)
 
 
+def memory_size(value: str) -> int:
+    from ofxstatement import profiling
+
+    try:
+        return profiling.parse_size(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
 def make_args_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Tool to convert proprietary bank statement " + "to OFX format."
     )
     parser.add_argument(
         "--version",
-        action="version",
-        version="%%(prog)s %s" % get_version(),
+        action=VersionAction,
         help="show current version",
     )
     parser.add_argument(
@@ -101,6 +109,92 @@ def make_args_parser() -> argparse.ArgumentParser:
         default=False,
         help="produce pretty xml with nested tags properly indented.",
     )
+    parser_convert.add_argument(
+        "--only-new",
+        action="store_true",
+        default=False,
+        help=(
+            "skip transactions, that were exported by previous runs with "
+            "this option, and remember the new ones."
+        ),
+    )
+    parser_convert.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=False,
+        help="convert the input even if it was converted before.",
+    )
+    parser_convert.add_argument(
+        "--profile",
+        metavar="FILE",
+        default=None,
+        help=(
+            "profile conversion stages, save pstats file and print summary to "
+            "standard error. Converted files are not taken from cache."
+        ),
+    )
+    parser_convert.add_argument(
+        "--profile-stages",
+        action="store_true",
+        default=False,
+        help=(
+            "save profile of each stage to a separate file, e.g. "
+            "FILE.parse.prof for FILE.prof"
+        ),
+    )
+    parser_convert.add_argument(
+        "--profile-top",
+        metavar="N",
+        type=int,
+        default=10,
+        help="number of functions to show for each stage (default: %(default)s)",
+    )
+    parser_convert.add_argument(
+        "--mem-report",
+        action="store_true",
+        default=False,
+        help=(
+            "trace memory allocations and print peak memory of conversion "
+            "stages and top allocation sites to standard error. Conversion "
+            "gets considerably slower"
+        ),
+    )
+    parser_convert.add_argument(
+        "--mem-budget",
+        metavar="SIZE",
+        type=memory_size,
+        default=None,
+        help=(
+            "stop conversion with exit status 3, when memory, allocated by "
+            "conversion, exceeds the size, e.g. 512M or 2G. Memory is traced "
+            "as with --mem-report"
+        ),
+    )
+    parser_convert.add_argument(
+        "--mem-top",
+        metavar="N",
+        type=int,
+        default=10,
+        help="number of allocation sites to show (default: %(default)s)",
+    )
+    parser_convert.add_argument(
+        "--metrics",
+        choices=["json", "prometheus"],
+        default=None,
+        help=(
+            "report time of conversion stages, throughput and sizes of the "
+            "files in the format"
+        ),
+    )
+    parser_convert.add_argument(
+        "--metrics-file",
+        metavar="FILE",
+        default=None,
+        help=(
+            "write metrics to the file instead of standard error. The file is "
+            "replaced atomically, as Prometheus textfile collector requires"
+        ),
+    )
     parser_convert.add_argument("input", help="input file to process")
     parser_convert.add_argument(
         "output",
@@ -111,6 +205,135 @@ def make_args_parser() -> argparse.ArgumentParser:
     )
     parser_convert.set_defaults(func=convert)
 
+    # convert-batch
+    parser_batch = subparsers.add_parser(
+        "convert-batch", help="convert many files to OFX"
+    )
+    parser_batch.add_argument(
+        "-c",
+        "--config",
+        metavar="myconfig.ini",
+        default=None,
+        help="custom config file to use",
+    )
+    parser_batch.add_argument(
+        "-t",
+        "--type",
+        required=True,
+        help="input files type, the same as for convert",
+    )
+    parser_batch.add_argument(
+        "-p",
+        "--pretty",
+        action="store_true",
+        default=False,
+        help="produce pretty xml with nested tags properly indented.",
+    )
+    parser_batch.add_argument(
+        "--no-cache",
+        action="store_true",
+        default=False,
+        help="convert the inputs even if they were converted before.",
+    )
+    parser_batch.add_argument(
+        "-o",
+        "--output",
+        metavar="TEMPLATE",
+        default=None,
+        help=(
+            "output file name template, where {dir}, {name} and {stem} are "
+            "replaced with input file directory, name and name without "
+            "extension (default: %s)" % os.path.join("{dir}", "{stem}.ofx")
+        ),
+    )
+    parser_batch.add_argument(
+        "-m",
+        "--manifest",
+        metavar="FILE",
+        default=None,
+        help=(
+            "file with input file names, one per line, optionally followed "
+            "by a tab and output file name"
+        ),
+    )
+    parser_batch.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="number of processes to use (default: number of CPUs)",
+    )
+    parser_batch.add_argument(
+        "--metrics",
+        choices=["json", "prometheus"],
+        default=None,
+        help=(
+            "report time of conversion stages, throughput and sizes of the "
+            "files, summed over all files, in the format"
+        ),
+    )
+    parser_batch.add_argument(
+        "--metrics-file",
+        metavar="FILE",
+        default=None,
+        help=(
+            "write metrics to the file instead of standard error. The file is "
+            "replaced atomically, as Prometheus textfile collector requires"
+        ),
+    )
+    parser_batch.add_argument(
+        "input", nargs="*", help="input files or glob patterns to process"
+    )
+    parser_batch.set_defaults(func=convert_batch)
+
+    # serve
+    parser_serve = subparsers.add_parser(
+        "serve", help="convert statements, posted over HTTP"
+    )
+    parser_serve.add_argument(
+        "-c",
+        "--config",
+        metavar="myconfig.ini",
+        default=None,
+        help="custom config file to use",
+    )
+    parser_serve.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="address to listen on (default: %(default)s)",
+    )
+    parser_serve.add_argument(
+        "--port",
+        type=int,
+        default=8765,
+        help="TCP port to listen on (default: %(default)s)",
+    )
+    parser_serve.add_argument(
+        "--socket",
+        metavar="PATH",
+        default=None,
+        help="listen on Unix domain socket instead of TCP port",
+    )
+    parser_serve.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="number of conversions to run at the same time",
+    )
+    parser_serve.add_argument(
+        "--allow-files",
+        action="store_true",
+        default=False,
+        help=(
+            "accept 'path' and 'only_new' parameters on TCP port. Any local "
+            "user could then convert files, readable by you, and update your "
+            "store of exported transactions. They are always accepted on "
+            "Unix socket"
+        ),
+    )
+    parser_serve.set_defaults(func=serve)
+
     # list-plugins
     parser_list = subparsers.add_parser("list-plugins", help="list available plugins")
     parser_list.set_defaults(func=list_plugins)
@@ -125,7 +348,9 @@ def make_args_parser() -> argparse.ArgumentParser:
 
 
 def list_plugins(args: argparse.Namespace) -> None:
-    available_plugins = plugin.list_plugins()
+    from ofxstatement import plugin
+
+    available_plugins = plugin.list_plugin_titles()
     if not available_plugins:
         print("No plugins available. Install plugin eggs or create your own.")
         print("See https://github.com/kedder/ofxstatement for more info.")
@@ -133,15 +358,16 @@ def list_plugins(args: argparse.Namespace) -> None:
     else:
         print("The following plugins are available: ")
         print("")
-        for name, plclass in available_plugins:
-            if plclass.__doc__:
-                title = plclass.__doc__.splitlines()[0]
-            else:
-                title = ""
+        for name, title in available_plugins:
             print("  %-16s %s" % (name, title))
 
 
 def edit_config(args: argparse.Namespace) -> None:
+    import platform
+    import shlex
+    import subprocess
+    from ofxstatement import configuration
+
     editors = {"Linux": "vim", "Darwin": "vi", "Windows": "notepad"}
     editor = os.environ.get("EDITOR", editors[platform.system()])
     configfname = configuration.get_default_location()
@@ -154,59 +380,162 @@ def edit_config(args: argparse.Namespace) -> None:
 
 
 def convert(args: argparse.Namespace) -> int:
-    appui = ui.UI()
-    config = configuration.read(args.config)
+    from ofxstatement import conversion, exceptions
 
-    if config is None:
-        # No configuration mode
-        settings = {}
-        pname = args.type
-    else:
-        # Configuration is loaded
-        if args.type not in config:
-            log.error("No section '%s' in config file." % args.type)
-            log.error(
-                "Edit configuration using ofxstatement edit-config and "
-                "add section [%s]." % args.type
-            )
-            return 1  # error
+    observers: List[Any] = []
+    profiler = None
+    if args.profile:
+        from ofxstatement import profiling
 
-        settings = dict(config[args.type])
+        profiler = profiling.StageProfiler()
+        observers.append(profiler)
+    timer = None
+    if args.metrics:
+        from ofxstatement import metrics
 
-        pname = settings.get("plugin", None)
-        if not pname:
-            log.error("Specify 'plugin' setting for section [%s]" % args.type)
-            return 1  # error
+        timer = metrics.StageTimer()
+        observers.append(timer)
 
-    # pick and configure plugin
-    try:
-        p = plugin.get_plugin(pname, appui, settings)
-    except plugin.PluginNotRegistered:
-        log.error("No plugin named '%s' is found" % pname)
-        return 1  # error
+    tracker = None
+    if args.mem_report or args.mem_budget:
+        from ofxstatement import profiling
+
+        tracker = profiling.MemoryTracker(args.mem_budget)
+        observers.append(tracker)
 
-    # process the input and produce output
-    parser = p.get_parser(args.input)
+    start = time.perf_counter()
+    converter = None
+    result = None
+    code = 0
     try:
-        statement = parser.parse()
-    except exceptions.ParseError as e:
-        log.error("Parse error on line %s: %s" % (e.lineno, e.message))
-        return 2  # parse error
+        with tracker or contextlib.nullcontext():
+            converter = conversion.Converter(args.config, observers=observers)
+            result = converter.convert(
+                args.type,
+                args.input,
+                args.output,
+                pretty=args.pretty,
+                only_new=args.only_new,
+                use_cache=(
+                    not args.no_cache and profiler is None and not args.mem_report
+                ),
+            )
+    except exceptions.ConvertError as e:
+        for message in e.messages:
+            log.error(message)
+        code = e.code
+    finally:
+        if profiler is not None:
+            save_profile(profiler, args)
+        if tracker is not None and args.mem_report:
+            tracker.print_summary(sys.stderr, limit=args.mem_top)
+
+    if timer is not None:
+        seconds = time.perf_counter() - start
+        file_metrics = metrics.ConversionMetrics(
+            args.input,
+            args.output,
+            code,
+            seconds,
+            timer.pop(),
+            result,
+            *metrics.get_plugin_info(converter, args.type),
+        )
+        save_metrics(metrics.MetricsReport(args.type, [file_metrics], seconds), args)
+
+    if result is None:
+        return code
+    log_completion(args.input, result.lines, result.invest_lines)
+    return 0  # success
+
+
+def convert_batch(args: argparse.Namespace) -> int:
+    from ofxstatement import batch, exceptions
+
+    files: List[Tuple[str, Optional[str]]] = []
+    if args.manifest:
+        files.extend(batch.read_manifest(args.manifest))
+    files.extend((input, None) for input in batch.expand_inputs(args.input))
+    if not files:
+        log.error("No input files to convert")
+        return 1
 
-    # Validate the statement
     try:
-        statement.assert_valid()
-    except exceptions.ValidationError as e:
-        log.error("Statement validation error: %s" % (e.message))
-        return 2  # Validation error
-
-    encoding = settings.get("encoding", "utf-8")
-    with smart_open(args.output, encoding) as out:
-        writer = ofx.OfxWriter(statement)
-        out.write(writer.toxml(pretty=args.pretty, encoding=encoding))
-
-    n_lines = len(statement.lines)
-    n_invest_lines = len(statement.invest_lines)
+        jobs = batch.plan(files, args.output or batch.DEFAULT_OUTPUT_TEMPLATE)
+    except exceptions.ConvertError as e:
+        for message in e.messages:
+            log.error(message)
+        return e.code
+
+    start = time.perf_counter()
+    results = batch.convert_batch(
+        args.type,
+        jobs,
+        args.config,
+        workers=args.jobs,
+        metrics=bool(args.metrics),
+        pretty=args.pretty,
+        use_cache=not args.no_cache,
+    )
+    failed = 0
+    status = 0
+    file_metrics = []
+    for result in results:
+        if result.metrics is not None:
+            file_metrics.append(result.metrics)
+        if result.code:
+            failed += 1
+            status = max(status, result.code)
+            for message in result.messages:
+                log.error("%s: %s" % (result.input, message))
+        else:
+            log_completion(result.input, result.lines, result.invest_lines)
+
+    log.info("Converted %d of %d files" % (len(jobs) - failed, len(jobs)))
+    if args.metrics:
+        from ofxstatement import metrics
+
+        seconds = time.perf_counter() - start
+        save_metrics(metrics.MetricsReport(args.type, file_metrics, seconds), args)
+    return status
+
+
+def serve(args: argparse.Namespace) -> int:
+    from ofxstatement import conversion, server
+
+    converter = conversion.Converter(args.config)
+    try:
+        server.serve(
+            converter,
+            host=args.host,
+            port=args.port,
+            socket_path=args.socket,
+            workers=args.workers,
+            allow_files=args.allow_files,
+        )
+    except OSError as e:
+        log.error(str(e))
+        return 1
+    return 0
+
+
+def save_profile(profiler: Any, args: argparse.Namespace) -> None:
+    profiler.print_summary(sys.stderr, limit=args.profile_top)
+    for fname in profiler.dump(args.profile, per_stage=args.profile_stages):
+        log.info("Profile saved to %s" % fname)
+
+
+def save_metrics(report: Any, args: argparse.Namespace) -> None:
+    text = report.format(args.metrics)
+    if args.metrics_file:
+        from ofxstatement import metrics
+
+        metrics.write_atomic(args.metrics_file, text)
+    else:
+        sys.stderr.write(text)
+
+
+def log_completion(input: str, n_lines: int, n_invest_lines: int) -> None:
     log.info(
         "Conversion completed: (%d line%s, %d invest-line%s) %s"
         % (
@@ -214,10 +543,9 @@ def convert(args: argparse.Namespace) -> int:
             "s" if n_lines != 1 else "",
             n_invest_lines,
             "s" if n_invest_lines != 1 else "",
-            args.input,
+            input,
         )
     )
-    return 0  # success
 
 
 def run(argv=None) -> int:
@@ -0,0 +1,154 @@
+"""Store of transactions, that were already exported"""
+
+from typing import Any, Dict, Iterable, List, Optional, Set
+import itertools
+import os
+import sqlite3
+
+import platformdirs
+
+from ofxstatement.configuration import APP_NAME, APP_AUTHOR
+from ofxstatement.statement import (
+    Statement,
+    _total_amount,
+    generate_transaction_id,
+)
+
+# Number of ids looked up with a single query, well below SQLite limit of
+# host parameters
+BATCH_SIZE = 500
+
+
+def get_default_location() -> str:
+    ddir = platformdirs.user_data_dir(APP_NAME, APP_AUTHOR)
+    return os.path.join(ddir, "transactions.sqlite")
+
+
+def get_account_key(statement: Statement) -> str:
+    """Return key, identifying the statement account in the store"""
+    bank_id = statement.bank_id or statement.broker_id or ""
+    return "%s/%s/%s" % (bank_id, statement.branch_id or "", statement.account_id)
+
+
+def get_transaction_keys(lines: Iterable[Any]) -> List[str]:
+    """Return transaction FITIDs, or hashes of their data for lines without id
+
+    Repeated hashes of identical lines are numbered in order, like
+    assign_transaction_ids() does, so each of them has its own key.
+    """
+    keys = []
+    counters: Dict[str, int] = {}
+    for line in lines:
+        if line.id:
+            keys.append(line.id)
+            continue
+        h = generate_transaction_id(line)
+        counter = counters.get(h, 0)
+        counters[h] = counter + 1
+        keys.append(h if counter == 0 else "%s%d-%d" % (h, counter, counter))
+    return keys
+
+
+class TransactionStore:
+    """SQLite database of exported transaction ids, grouped by account
+
+    Ids are kept in a table with (account, id) primary key without rowid, so
+    lookups stay fast with millions of stored ids.
+    """
+
+    def __init__(self, location: Optional[str] = None) -> None:
+        if not location:
+            location = get_default_location()
+        ddir = os.path.dirname(location)
+        if ddir and not os.path.exists(ddir):
+            os.makedirs(ddir, mode=0o700)
+
+        self.location = location
+        self.conn = sqlite3.connect(location)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS txn ("
+                "account TEXT NOT NULL, "
+                "id TEXT NOT NULL, "
+                "PRIMARY KEY (account, id)"
+                ") WITHOUT ROWID"
+            )
+
+    def __enter__(self) -> "TransactionStore":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def seen(self, account: str, ids: Iterable[str]) -> Set[str]:
+        """Return those of given ids, that are stored for the account"""
+        found: Set[str] = set()
+        batch: List[str] = []
+        for id in ids:
+            batch.append(id)
+            if len(batch) == BATCH_SIZE:
+                found.update(self._seen(account, batch))
+                batch = []
+        if batch:
+            found.update(self._seen(account, batch))
+        return found
+
+    def add(self, account: str, ids: Iterable[str]) -> None:
+        """Store given ids for the account"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO txn (account, id) VALUES (?, ?)",
+                ((account, id) for id in ids),
+            )
+
+    def _seen(self, account: str, ids: List[str]) -> Iterable[str]:
+        query = "SELECT id FROM txn WHERE account = ? AND id IN (%s)" % ", ".join(
+            "?" * len(ids)
+        )
+        return (id for (id,) in self.conn.execute(query, [account] + ids))
+
+
+def remove_exported(statement: Statement, store: TransactionStore) -> List[str]:
+    """Remove lines, that are already in the store, from the statement
+
+    Lines are removed in place, so line containers like LineList or
+    StatementTable keep their type. Start balance is adjusted to the
+    remaining lines. Return keys of the remaining transactions, that should
+    be added to the store once the statement is exported.
+    """
+    account = get_account_key(statement)
+    n_lines = len(statement.lines)
+    keys = get_transaction_keys(
+        itertools.chain(statement.lines, statement.invest_lines)
+    )
+    seen = store.seen(account, keys)
+    if not seen:
+        return keys
+
+    removed = [n for n, key in enumerate(keys) if key in seen]
+    _remove_lines(statement.lines, [n for n in removed if n < n_lines])
+    _remove_lines(
+        statement.invest_lines, [n - n_lines for n in removed if n >= n_lines]
+    )
+    if statement.end_balance is not None and statement.start_balance is not None:
+        statement.start_balance = statement.end_balance - _total_amount(statement.lines)
+    return [key for key in keys if key not in seen]
+
+
+def _remove_lines(lines: Any, indices: List[int]) -> None:
+    """Delete lines with given ascending indices
+
+    Runs of adjacent lines are deleted with a single slice, as that costs
+    about the same as deleting one line.
+    """
+    runs: List[List[int]] = []
+    for index in indices:
+        if runs and runs[-1][1] == index:
+            runs[-1][1] += 1
+        else:
+            runs.append([index, index + 1])
+    for start, stop in reversed(runs):
+        del lines[start:stop]
@@ -0,0 +1,36 @@
+"""Helpers shared by the command line tool and the library modules"""
+
+from typing import Generator, Optional, TextIO
+import contextlib
+import sys
+
+
+@contextlib.contextmanager
+def smart_open(
+    filename: Optional[str] = None, encoding: Optional[str] = None
+) -> Generator[TextIO, None, None]:
+    """See https://stackoverflow.com/questions/17602878/how-to-handle-both-with-open-and-sys-stdout-nicely"""  # noqa
+    fh: TextIO
+
+    if filename and filename != "-":
+        # encoding is required in cases when OS defaults to encoding which
+        # doesn't support unicode characters, for example Windows defaults to
+        # 'cp1252'
+        fh = open(filename, "w", encoding=encoding)
+    else:
+        fh = sys.stdout
+
+    try:
+        yield fh
+    finally:
+        if fh is not sys.stdout:
+            fh.close()
+
+
+def get_version() -> str:
+    if sys.version_info < (3, 10):
+        from importlib_metadata import version
+    else:
+        from importlib.metadata import version
+
+    return version("ofxstatement")